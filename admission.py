@@ -0,0 +1,100 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Admission Control for the Prediction Endpoint ---
+# Under a burst, every request would otherwise wait for the models, and a prediction that
+# arrives seconds late is worthless to the client. Requests can carry a time budget in the
+# DEADLINE_HEADER header (milliseconds, relative, so client and server clocks don't need to
+# agree). At most MAX_IN_FLIGHT requests run the models at once; a request is shed (and the
+# caller answers it with the cheap rule engine instead) when
+#   - its remaining budget is smaller than the typical service time (EWMA), or
+#   - no slot frees up while there is still enough budget left to run the models.
+# Requests without a (valid, finite) deadline wait at most DEFAULT_BUDGET_MS; larger budgets are
+# capped at MAX_DEADLINE_MS.
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+MAX_IN_FLIGHT = 4
+DEFAULT_BUDGET_MS = 2000
+MAX_DEADLINE_MS = 30_000
+EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    """Bounded in-flight slots with deadline-aware admission and queue metrics."""
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, default_budget_ms=DEFAULT_BUDGET_MS):
+        self.max_in_flight = max_in_flight
+        self.default_budget_ms = default_budget_ms
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.service_time = None  # EWMA of the time spent holding a slot, in seconds
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {'admitted': 0, 'shed_deadline': 0, 'shed_overload': 0, 'max_waiting': 0}
+
+    def deadline(self, header_value):
+        """Absolute (monotonic) deadline for a request from its header value."""
+        try:
+            budget_ms = float(header_value) if header_value is not None else self.default_budget_ms
+        except ValueError:
+            budget_ms = self.default_budget_ms
+        if not math.isfinite(budget_ms):
+            budget_ms = self.default_budget_ms
+        return time.monotonic() + min(max(budget_ms, 0), MAX_DEADLINE_MS) / 1000
+
+    def _shed(self, reason):
+        with self._lock:
+            self.stats[f'shed_{reason}'] += 1
+        return reason
+
+    @contextmanager
+    def admit(self, deadline):
+        """
+        Yields None if the request may run the models, otherwise the reason it was shed
+        ('deadline' or 'overload'). The slot is released when the block exits.
+        """
+        expected = self.service_time or 0.0
+        if deadline - time.monotonic() < expected:
+            yield self._shed('deadline')
+            return
+
+        with self._lock:
+            self.waiting += 1
+            self.stats['max_waiting'] = max(self.stats['max_waiting'], self.waiting)
+        try:
+            # Wait only as long as the models can still finish before the deadline
+            acquired = self._slots.acquire(timeout=max(deadline - time.monotonic() - expected, 0))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            yield self._shed('overload')
+            return
+
+        with self._lock:
+            self.in_flight += 1
+            self.stats['admitted'] += 1
+        start = time.monotonic()
+        try:
+            yield None
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.in_flight -= 1
+                if self.service_time is None:
+                    self.service_time = elapsed
+                else:
+                    self.service_time += EWMA_ALPHA * (elapsed - self.service_time)
+            self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                in_flight=self.in_flight,
+                waiting=self.waiting,
+                max_in_flight=self.max_in_flight,
+                service_time_ms=None if self.service_time is None else round(self.service_time * 1000, 2),
+            )
@@ -1,138 +1,263 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, after_this_request
 from flask_cors import CORS
 import joblib
 import pandas as pd
 import os
 import json
+import time
 import numpy as np
-from scipy.stats import entropy
+from feature_engineering import engineer_features_df, load_feature_manifest, FEATURE_MANIFEST_FILE
+import rule_engine
+from title_suggester import load_suggester, decisive_tokens
+from suggestion_cache import PrefixSuggestionCache
+from admission import AdmissionController, DEADLINE_HEADER
+from drift_monitor import DriftMonitor
+from shadow import ShadowEvaluator
+from model_registry import ModelSet, WorkspaceModelCache, WORKSPACE_HEADER
+from task_store import TaskStore, DEFAULT_WORKSPACE
+from wire_format import JSON_MIMETYPE, COMPACT_MIMETYPE, MSGPACK_MIMETYPE, supported_mimetypes, decode_request, encode_response
 
 # --- Configuration ---
 app = Flask(__name__)
-CORS(app) 
+# The frontend reads the ETag of /predict responses to send it back as If-None-Match
+CORS(app, expose_headers=["ETag"])
 
 MODEL_DIR = "models"
 
-# NEW: Define the exact feature order the model was trained on.
-# This is the 'final_column_order' from your training script, minus the target variables.
-MODEL_FEATURE_ORDER = [
-    #'number_of_tasks',
-    'overdue_tasks',
-    #'pct_overdue',
-    #'number_of_statuses_used',
-    'status_entropy',
-    #'wip_load',
-    'pct_critical_open',
-    'pct_high_open',
-    'pct_medium_open',
-    'pct_low_open',
-    'pct_pending_status',
-    'pct_todo_status',
-    'pct_in_progress_status',
-    'pct_done_status',
-    'pct_blocked_status',
-    #'health_score',
-    #'crisis_index',
-    #'backlog_pressure',
-    #'last_task_created_label',
-    #'last_task_created_priority',
-    #'last_task_created_status',
-    #'last_action_critical_bug'
-]
+# Which variant of the trained models to serve:
+# 'forest'    - the RandomForest pipelines from train_model.py
+# 'compact'   - the pruned, reduced-precision copies from train_model.py (model_compression.py)
+# 'distilled' - single decision trees distilled from the forests (distill_model.py)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "forest")
+MODEL_FILE_SUFFIXES = {'forest': '', 'compact': '_compact', 'distilled': '_distilled'}
 
+# Boards with fewer tasks are always 'list' without filters (same rule as the data generator prompts),
+# so the models are not evaluated at all for them.
+MIN_TASKS_FOR_MODEL = 5
+# Predictions whose top class probability is below this threshold fall back to the rule engine.
+CONFIDENCE_THRESHOLD = 0.5
+# Set to True to print the preprocessor input/output for every request.
+DEBUG_PIPELINE = False
+# At most this many requests run the models at once; the rest wait within their deadline
+# (see admission.py) or are answered by the rule engine.
+MAX_IN_FLIGHT_PREDICTIONS = 4
+# Longest title /suggest accepts (the task dialog's limit, see taskDialogSchema.ts); the prefix
+# cache's work per lookup grows with the square of the title length.
+MAX_TITLE_LENGTH = 100
+# Training data the live feature/prediction distributions are compared with (see drift_monitor.py)
+DRIFT_REFERENCE_FILE = "training_data_llm_v11.csv"
+# A candidate model set in this directory (same backend suffix) is shadow-evaluated on this share
+# of the model-served requests before it's promoted (see shadow.py).
+SHADOW_MODEL_DIR = os.path.join(MODEL_DIR, "candidate")
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.1"))
+# SQLite database of the /tasks API; its materialized board counts feed /tasks/predict (see task_store.py)
+TASK_DB_FILE = os.environ.get("TASK_DB_FILE", "tasks.db")
 
 # --- 1. Load the Trained Models on Startup ---
-print("Loading trained models...")
+print(f"Loading trained models (backend: {MODEL_BACKEND})...")
 try:
-    model_view = joblib.load(os.path.join(MODEL_DIR, "model_predicted_view.pkl"))
-    model_status = joblib.load(os.path.join(MODEL_DIR, "model_predicted_status_filter.pkl"))
-    model_priority = joblib.load(os.path.join(MODEL_DIR, "model_predicted_priority_filter.pkl"))
+    suffix = MODEL_FILE_SUFFIXES[MODEL_BACKEND]
+    model_view = joblib.load(os.path.join(MODEL_DIR, f"model_predicted_view{suffix}.pkl"))
+    model_status = joblib.load(os.path.join(MODEL_DIR, f"model_predicted_status_filter{suffix}.pkl"))
+    model_priority = joblib.load(os.path.join(MODEL_DIR, f"model_predicted_priority_filter{suffix}.pkl"))
     print("Models loaded successfully.")
 except FileNotFoundError as e:
     print(f"ERROR: Could not load models. Make sure the 'models' directory exists and contains the .pkl files.")
     print(f"Details: {e}")
     exit()
 
-def engineer_features(data):
-    """Takes the raw input dict and engineers all the features the model expects."""
+# The title suggester is optional: without it, /suggest answers 503 and the frontend keeps its own rules.
+title_suggester = load_suggester(MODEL_DIR)
+if title_suggester is None:
+    print("Title suggester not found (run title_suggester.py). /suggest is disabled.")
+suggestion_cache = PrefixSuggestionCache(decisive_tokens)
+admission = AdmissionController(MAX_IN_FLIGHT_PREDICTIONS)
+
+TARGET_MODELS = {
+    'predicted_view': model_view,
+    'predicted_status_filter': model_status,
+    'predicted_priority_filter': model_priority,
+}
+
+# The feature order the models were trained on. It comes from the feature manifest written by
+# feature_selection.py (or from the models themselves if there is none) and must match every
+# model, otherwise the server refuses to start instead of predicting from shuffled columns.
+MODEL_FEATURE_ORDER = load_feature_manifest(MODEL_DIR) or list(model_view.feature_names_in_)
+for target, model in TARGET_MODELS.items():
+    model_features = getattr(model, 'feature_names_in_', None)
+    if model_features is not None and list(model_features) != MODEL_FEATURE_ORDER:
+        print(f"ERROR: The model for '{target}' was trained on {list(model_features)}, "
+              f"but '{FEATURE_MANIFEST_FILE}' lists {MODEL_FEATURE_ORDER}. Retrain the models (train_model.py).")
+        exit()
+print(f"Serving {len(MODEL_FEATURE_ORDER)} features: {MODEL_FEATURE_ORDER}")
+
+# Workspaces with their own models in models/workspaces/<id> are served those (selected by the
+# X-Workspace-Id header, see model_registry.py); everyone else gets the global models above.
+workspace_models = WorkspaceModelCache(ModelSet('global', TARGET_MODELS, MODEL_FEATURE_ORDER), suffix)
+
+# The drift monitor is optional: without the reference data, /drift answers 503.
+# Trivial boards are answered by rules and never observed, so they are left out of the reference too
+drift_monitor = DriftMonitor.from_training_data(DRIFT_REFERENCE_FILE, MODEL_FEATURE_ORDER, list(TARGET_MODELS),
+                                                min_tasks=MIN_TASKS_FOR_MODEL)
+if drift_monitor is None:
+    print(f"Drift reference '{DRIFT_REFERENCE_FILE}' not found or missing features. /drift is disabled.")
+
+# Shadow evaluation is optional: without candidate models, /shadow answers 503.
+shadow = ShadowEvaluator.from_model_dir(SHADOW_MODEL_DIR, suffix, sample_rate=SHADOW_SAMPLE_RATE)
+if shadow is None:
+    print(f"No candidate models in '{SHADOW_MODEL_DIR}'. /shadow is disabled.")
+else:
+    print(f"Shadow-evaluating the candidate models in '{SHADOW_MODEL_DIR}' on {SHADOW_SAMPLE_RATE:.0%} of requests.")
+
+# The task store is optional: if the database can't be opened, /tasks answers 503 and the
+# frontend keeps its tasks in localStorage.
+task_store = TaskStore.open(TASK_DB_FILE)
+if task_store is None:
+    print(f"Task database '{TASK_DB_FILE}' not available. /tasks is disabled.")
+
+def engineer_features(data, features):
+    """Takes the raw input dict and engineers the features a model set expects, in its order."""
     # Create DataFrame from the input dictionary
     df = pd.DataFrame(data, index=[0])
-    
-    # --- Feature Engineering Logic (from before) ---
-    num_tasks = df['number_of_tasks']
-    num_open_tasks = df['number_of_tasks'] - df['num_done']
-    num_open_tasks_safe = num_open_tasks.replace(0, 1)
-    df['pct_critical_open'] = (df['num_critical_open'] / num_open_tasks_safe).fillna(0)
-    df['pct_high_open'] = (df['num_high_open'] / num_open_tasks_safe).fillna(0)
-    df['pct_medium_open'] = (df['num_medium_open'] / num_open_tasks_safe).fillna(0)
-    df['pct_low_open'] = (df['num_low_open'] / num_open_tasks_safe).fillna(0)
-    df['pct_pending_status'] = (df['num_pending'] / num_tasks).fillna(0)
-    df['pct_todo_status'] = (df['num_todo'] / num_tasks).fillna(0)
-    df['pct_in_progress_status'] = (df['num_inprogress'] / num_tasks).fillna(0)
-    df['pct_done_status'] = (df['num_done'] / num_tasks).fillna(0)
-    df['pct_blocked_status'] = (df['num_blocked'] / num_tasks).fillna(0)
-    df['pct_overdue'] = (df['overdue_tasks'] / num_tasks).round(4).fillna(0)
-    df['crisis_index'] = df['pct_overdue'] * df['pct_critical_open']
-    df['backlog_pressure'] = df['pct_todo_status'] * df['pct_low_open']
-    df['wip_load'] = (df['num_inprogress'] / num_open_tasks_safe).fillna(0)
-    df['health_score'] = (0.5 * df['pct_overdue']) + (0.3 * df['pct_blocked_status']) + (0.2 * df['pct_critical_open'])
-    status_counts_cols = ['num_pending', 'num_todo', 'num_inprogress', 'num_done', 'num_blocked']
-    status_pct_cols = ['pct_pending_status', 'pct_todo_status', 'pct_in_progress_status', 'pct_done_status', 'pct_blocked_status']
-    df['status_entropy'] = df[status_pct_cols].apply(lambda x: entropy(x[x>0]), axis=1).fillna(0)
-    df['number_of_statuses_used'] = (df[status_counts_cols] > 0).sum(axis=1)
-    df['last_action_critical_bug'] = ((df['last_task_created_label'] == 'Bug') & (df['last_task_created_priority'] == 'Kritisch')).astype(int)
+    # Only the features in the manifest (and what they are computed from) are calculated
+    engineer_features_df(df, features)
 
     # MODIFIED: Enforce the column order to match the training data
-    return df[MODEL_FEATURE_ORDER]
+    return df[features]
+
+def rule_based_response(input_data, shed_reason):
+    """Response for a request that can't be served by the models in time."""
+    decision = rule_engine.decide(input_data)
+    response = {target: decision[target] for target in TARGET_MODELS}
+    response['source'] = {target: 'rules' for target in TARGET_MODELS}
+    response['rule'] = decision['rule']
+    response['shed'] = shed_reason
+    return response
+
+def prediction_response(response):
+    """
+    Encodes a /predict response in the format the client accepts (see wire_format.py), with an
+    ETag of the body. If the client already has this exact response (If-None-Match), only a
+    304 without a body is sent. Responses the compact format can't encode fall back to JSON
+    (406 if the client doesn't accept JSON).
+    """
+    mimetype = request.accept_mimetypes.best_match(supported_mimetypes(), default=JSON_MIMETYPE)
+    try:
+        body = encode_response(response, mimetype)
+    except ValueError as e:
+        # A label the compact code tables don't cover: send JSON if the client takes it
+        if not request.accept_mimetypes[JSON_MIMETYPE]:
+            return jsonify({"error": f"The response can't be encoded as {mimetype}: {e}"}), 406
+        print(f"WARNING: Sending JSON instead of {mimetype}. Details: {e}")
+        mimetype = JSON_MIMETYPE
+        body = encode_response(response, mimetype)
+    flask_response = Response(body, mimetype=mimetype)
+    flask_response.add_etag()
+    flask_response.vary.add('Accept')
+    etag, _ = flask_response.get_etag()
+    if request.if_none_match.contains(etag):
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        not_modified.vary.add('Accept')
+        return not_modified
+    return flask_response
 
 # --- 2. The Prediction API Endpoint ---
 @app.route('/predict', methods=['POST'])
 def predict():
-    input_data = request.get_json()
+    if request.mimetype in (COMPACT_MIMETYPE, MSGPACK_MIMETYPE):
+        if request.mimetype not in supported_mimetypes():
+            return jsonify({"error": "MessagePack is not available on this server (pip install msgpack)"}), 415
+        try:
+            input_data = decode_request(request.mimetype, request.get_data())
+        except ValueError as e:
+            return jsonify({"error": f"Malformed payload: {e}"}), 400
+    else:
+        input_data = request.get_json()
     
     print("\n--- Received Raw Payload from Frontend ---")
     print(json.dumps(input_data, indent=2))
     
     if not input_data:
         return jsonify({"error": "No input data provided"}), 400
+    return predict_payload(input_data)
 
+def predict_payload(input_data):
+    """Prediction response for a dict of raw board counts (the /predict payload)."""
     try:
-        processed_df = engineer_features(input_data)
-
-        # --- DECONSTRUCT THE PIPELINE FOR DEBUGGING ---
-        print("\n--- DEBUGGING model_view PIPELINE ---")
-        
-        # 1. Isolate the preprocessor and classifier steps
-        preprocessor = model_view.named_steps['preprocessor']
-        classifier = model_view.named_steps['classifier']
-        
-        # 2. Manually transform the data using the preprocessor
-        print("Data BEFORE preprocessing (shape, dtypes):\n", processed_df.shape)
-        print(processed_df.info()) # Check data types
-        
-        transformed_data = preprocessor.transform(processed_df)
-        
-        # 3. Inspect the data AFTER preprocessing
-        print("\nData AFTER preprocessing (shape, content):\n", transformed_data.shape)
-        print(transformed_data)
-        # --- END DEBUGGING BLOCK ---
-
-        # Make Predictions using the other models as usual
-        view_prediction = model_view.predict(processed_df)[0]
-        status_prediction = model_status.predict(processed_df)[0]
-        priority_prediction = model_priority.predict(processed_df)[0]
-        
-        if view_prediction == 'kanban':
-            status_prediction = 'none'
-            priority_prediction = 'none'
-
-        response = {
-            'predicted_view': view_prediction,
-            'predicted_status_filter': status_prediction,
-            'predicted_priority_filter': priority_prediction
-        }
-        
-        return jsonify(response)
+        if input_data.get('number_of_tasks', 0) < MIN_TASKS_FOR_MODEL:
+            return prediction_response({
+                'predicted_view': 'list',
+                'predicted_status_filter': 'none',
+                'predicted_priority_filter': 'none',
+                'source': {target: 'trivial' for target in TARGET_MODELS},
+            })
+
+        deadline = admission.deadline(request.headers.get(DEADLINE_HEADER))
+        # The workspace's models are pinned (not evicted) until the response is built
+        with workspace_models.acquire(request.headers.get(WORKSPACE_HEADER)) as model_set, \
+                admission.admit(deadline) as shed_reason:
+            if shed_reason is not None:
+                print(f"Request shed ({shed_reason}); answering with the rule engine.")
+                return prediction_response(rule_based_response(input_data, shed_reason))
+
+            processed_df = engineer_features(input_data, model_set.features)
+
+            if DEBUG_PIPELINE:
+                # --- DECONSTRUCT THE PIPELINE FOR DEBUGGING ---
+                print("\n--- DEBUGGING model_view PIPELINE ---")
+                view_model = model_set.models['predicted_view']
+                preprocessor = view_model.named_steps['preprocessor'] if MODEL_BACKEND == 'forest' else view_model.preprocessor
+                print("Data BEFORE preprocessing (shape, dtypes):\n", processed_df.shape)
+                print(processed_df.info())
+                transformed_data = preprocessor.transform(processed_df)
+                print("\nData AFTER preprocessing (shape, content):\n", transformed_data.shape)
+                print(transformed_data)
+
+            # One forest pass per model: the label is the argmax of the class probabilities,
+            # which is exactly what RandomForestClassifier.predict computes internally.
+            response = {'probabilities': {}, 'confidence': {}, 'source': {}, 'model_set': model_set.name}
+            rule_decision = None
+            model_start = time.perf_counter()
+            for target, model in model_set.models.items():
+                probabilities = model.predict_proba(processed_df)[0]
+                best = int(np.argmax(probabilities))
+                confidence = float(probabilities[best])
+
+                response['probabilities'][target] = {
+                    str(cls): float(p) for cls, p in zip(model.classes_, probabilities)
+                }
+                response['confidence'][target] = confidence
+
+                if confidence >= CONFIDENCE_THRESHOLD:
+                    response[target] = str(model.classes_[best])
+                    response['source'][target] = 'model'
+                else:
+                    if rule_decision is None:
+                        rule_decision = rule_engine.decide(input_data)
+                        response['rule'] = rule_decision['rule']
+                    response[target] = rule_decision[target]
+                    response['source'][target] = 'rules'
+
+                # Filters are always 'none' in kanban view, so the filter models are not evaluated
+                if response['predicted_view'] == 'kanban':
+                    response['predicted_status_filter'] = 'none'
+                    response['predicted_priority_filter'] = 'none'
+                    break
+
+            model_ms = (time.perf_counter() - model_start) * 1000
+
+            # Drift and the shadow candidate are measured against the global models only
+            is_global = model_set is workspace_models.global_set
+            if drift_monitor is not None and is_global:
+                drift_monitor.observe(processed_df.iloc[0].to_numpy(), response)
+            if shadow is not None and is_global and shadow.should_sample():
+                # Handed to the candidate only once the response has been sent to the client
+                @after_this_request
+                def submit_to_shadow(flask_response):
+                    flask_response.call_on_close(lambda: shadow.submit(input_data, response, model_ms))
+                    return flask_response
+            return prediction_response(response)
 
     except Exception as e:
         print("\n--- ERROR DURING PREDICTION ---")
@@ -145,6 +270,131 @@ def predict():
         print("-----------------------------\n")
         return jsonify({"error": "An internal error occurred. Check the backend logs for details.", "details": str(e)}), 500
 
-# --- 3. Run the Server ---
+@app.route('/drift', methods=['GET'])
+def drift():
+    """Divergence of the recent live traffic from the training distribution (PSI per feature and target)."""
+    if drift_monitor is None:
+        return jsonify({"error": "Drift monitoring is not available"}), 503
+    return jsonify(drift_monitor.snapshot())
+
+@app.route('/shadow', methods=['GET'])
+def shadow_stats():
+    """Agreement and latency of the candidate models compared with the primary models, per target."""
+    if shadow is None:
+        return jsonify({"error": "No candidate models are being shadow-evaluated"}), 503
+    return jsonify(shadow.snapshot())
+
+# --- 3. The Title Suggestion API Endpoint ---
+@app.route('/suggest', methods=['POST'])
+def suggest():
+    input_data = request.get_json(silent=True) or {}
+    title = input_data.get('title', '')
+
+    if not isinstance(title, str) or not title.strip():
+        return jsonify({"error": "No title provided"}), 400
+    if len(title) > MAX_TITLE_LENGTH:
+        return jsonify({"error": f"Titles can be at most {MAX_TITLE_LENGTH} characters long"}), 400
+    if title_suggester is None:
+        return jsonify({"error": "Title suggester is not available"}), 503
+
+    return jsonify(title_suggester.suggest(title, cache=suggestion_cache))
+
+@app.route('/predict/stats', methods=['GET'])
+def predict_stats():
+    """Admission metrics: in-flight and waiting requests, service time and shed counts."""
+    return jsonify(admission.snapshot())
+
+@app.route('/models/stats', methods=['GET'])
+def model_stats():
+    """Per-workspace model cache: cached sets, their size and use, loads, evictions and fallbacks."""
+    return jsonify(workspace_models.snapshot())
+
+@app.route('/suggest/stats', methods=['GET'])
+def suggest_stats():
+    return jsonify(suggestion_cache.snapshot())
+
+# --- 4. The Task Store API ---
+# Single-task changes are persisted one by one; the board counts are maintained by the store.
+def task_workspace():
+    return request.headers.get(WORKSPACE_HEADER) or DEFAULT_WORKSPACE
+
+def task_store_unavailable():
+    return jsonify({"error": "The task store is not available"}), 503
+
+@app.route('/tasks', methods=['GET', 'POST', 'PUT'])
+def tasks():
+    """GET: all tasks in list order. POST: add one task. PUT: replace all tasks (import, reset)."""
+    if task_store is None:
+        return task_store_unavailable()
+    if request.method == 'GET':
+        return jsonify(task_store.list_tasks(task_workspace()))
+    data = request.get_json(silent=True)
+    try:
+        if request.method == 'POST':
+            return jsonify(task_store.add_task(task_workspace(), data)), 201
+        if not isinstance(data, list):
+            raise ValueError("Expected a list of tasks")
+        task_store.replace_tasks(task_workspace(), data)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid task: {e}"}), 400
+    return '', 204
+
+@app.route('/tasks/<task_id>', methods=['PATCH', 'DELETE'])
+def single_task(task_id):
+    """PATCH: update some fields of a task. DELETE: delete it."""
+    if task_store is None:
+        return task_store_unavailable()
+    if request.method == 'DELETE':
+        if not task_store.delete_task(task_workspace(), task_id):
+            return jsonify({"error": f"Unknown task '{task_id}'"}), 404
+        return '', 204
+    updates = request.get_json(silent=True)
+    if not isinstance(updates, dict):
+        return jsonify({"error": "Expected an object with the changed fields"}), 400
+    try:
+        task = task_store.update_task(task_workspace(), task_id, updates)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid task: {e}"}), 400
+    if task is None:
+        return jsonify({"error": f"Unknown task '{task_id}'"}), 404
+    return jsonify(task)
+
+@app.route('/tasks/batch', methods=['POST'])
+def task_batch():
+    """Several changes in one transaction: {"upsert": [task, ...], "delete": [taskId, ...]}."""
+    if task_store is None:
+        return task_store_unavailable()
+    data = request.get_json(silent=True) or {}
+    upserts, deletes = data.get('upsert', []), data.get('delete', [])
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        return jsonify({"error": "'upsert' and 'delete' must be lists"}), 400
+    try:
+        task_store.apply_changes(task_workspace(), upserts, deletes)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid task: {e}"}), 400
+    return '', 204
+
+@app.route('/tasks/counts', methods=['GET'])
+def task_counts():
+    """The /predict payload of the stored board (tz_offset: the client's getTimezoneOffset())."""
+    if task_store is None:
+        return task_store_unavailable()
+    try:
+        return jsonify(task_store.board_payload(task_workspace(), tz_offset_minutes=request.args.get('tz_offset', 0, type=int)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/tasks/predict', methods=['GET'])
+def task_predict():
+    """Prediction for the stored board, from its materialized counts instead of a client payload."""
+    if task_store is None:
+        return task_store_unavailable()
+    try:
+        input_data = task_store.board_payload(task_workspace(), tz_offset_minutes=request.args.get('tz_offset', 0, type=int))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return predict_payload(input_data)
+
+# --- 5. Run the Server ---
 if __name__ == '__main__':
     app.run(port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import math
+from collections import Counter
+import numpy as np
+from scipy.optimize import linprog
+
+# --- Joint-Quota Batch Scheduling for Balanced Generation ---
+# Instead of always infilling the single most-lacking class, every round plans the mix of
+# prompts (the master prompt and one infill prompt per goal class) that fills the class quotas
+# (target share * num_rows) of ALL targets at once with the rows that are still to generate:
+# - Yield model: for every prompt, the expected number of accepted rows of every
+#   (target, class) per requested row. It starts from a prior (an infill prompt mostly yields
+#   its goal class, the master prompt yields the target distribution) and is updated with the
+#   observed label counts of every finished batch.
+# - Plan: a linear program over the rows x_k to request from each prompt k,
+#       minimize   SLACK_PENALTY * sum_i s_i + sum_k x_k
+#       subject to counts_i + (Y x)_i + s_i >= p_i * num_rows   for every class i
+#                  total + a.x <= num_rows
+#   where Y is the yield matrix, a the acceptance rate of each prompt, p_i the target share of
+#   class i and s_i the shortfall of its quota. Each row counts towards one class of every
+#   target, so prompts that fill several lacking classes at once are preferred, and rows of
+#   classes that are already full are avoided.
+# - Dispatch: the planned rows are cut into batches, and up to MAX_CONCURRENT_BATCHES of
+#   the largest planned amounts are sent at once; the plan is recomputed after every round.
+
+MASTER_PROMPT = 'master'
+MAX_CONCURRENT_BATCHES = 4
+PRIOR_ROWS = 20             # Weight of the prior yield, in requested rows
+PRIOR_ACCEPTANCE = 0.8      # Expected share of requested rows that pass validation and dedup
+PRIOR_GOAL_SHARE = 0.7      # Expected share of an infill prompt's rows that have its goal class
+SLACK_PENALTY = 1000.0      # Cost of a missed row of a class, relative to one requested row
+
+
+class JointQuotaScheduler:
+    """Plans the prompt mix of each round from observed per-prompt class yields."""
+
+    def __init__(self, target_distributions, goal_classes, num_rows):
+        """goal_classes: the classes with an infill prompt; prompts are named after their goal class."""
+        self.target_distributions = target_distributions
+        self.num_rows = num_rows
+        self.prompts = [MASTER_PROMPT] + list(goal_classes)
+        self.classes = [(target, class_name) for target, shares in target_distributions.items() for class_name in shares]
+        self.shares = np.array([target_distributions[target][class_name] for target, class_name in self.classes])
+        self._view_rows = np.array([target == 'predicted_view' for target, _ in self.classes])
+
+        # Prior pseudo-counts: accepted rows per class for PRIOR_ROWS requested rows
+        self._prior = np.zeros((len(self.classes), len(self.prompts)))
+        for k, goal in enumerate(self.prompts):
+            goal_target = next((t for t, shares in target_distributions.items() if goal in shares), None)
+            for i, (target, class_name) in enumerate(self.classes):
+                share = target_distributions[target][class_name]
+                if target == goal_target:
+                    share = PRIOR_GOAL_SHARE if class_name == goal else (1 - PRIOR_GOAL_SHARE) * share / (1 - target_distributions[target][goal])
+                self._prior[i, k] = PRIOR_ROWS * PRIOR_ACCEPTANCE * share
+        self._observed = np.zeros_like(self._prior)
+        self._requested = np.zeros(len(self.prompts))
+        self.calls = Counter()
+
+    def yields(self):
+        """Expected accepted rows per class (rows) per requested row of each prompt (columns)."""
+        return (self._prior + self._observed) / (PRIOR_ROWS + self._requested)
+
+    def record(self, prompt, rows_requested, label_counts):
+        """Updates the yield model with a finished batch; label_counts: target -> Counter of accepted classes."""
+        k = self.prompts.index(prompt)
+        self.calls[prompt] += 1
+        self._requested[k] += rows_requested
+        for i, (target, class_name) in enumerate(self.classes):
+            self._observed[i, k] += label_counts[target][class_name]
+
+    def plan(self, counts, total):
+        """Rows to request per prompt so the class counts (target -> Counter, as ClassBalance.counts) reach their quotas."""
+        Y = self.yields()
+        acceptance = Y[self._view_rows].sum(axis=0)  # Every accepted row has exactly one view
+        current = np.array([counts[target][class_name] for target, class_name in self.classes], dtype=np.float64)
+        n_prompts, n_classes = len(self.prompts), len(self.classes)
+
+        # linprog takes A_ub @ z <= b_ub with z = [x, s]
+        quota_rows = np.hstack([-Y, -np.eye(n_classes)])
+        quota_bounds = current - self.shares * self.num_rows
+        total_row = np.r_[acceptance, np.zeros(n_classes)]
+        result = linprog(
+            c=np.r_[np.ones(n_prompts), np.full(n_classes, SLACK_PENALTY)],
+            A_ub=np.vstack([quota_rows, total_row]),
+            b_ub=np.r_[quota_bounds, max(self.num_rows - total, 0)],
+            bounds=(0, None), method='highs',
+        )
+        if not result.success:
+            return {MASTER_PROMPT: max(self.num_rows - total, 0)}
+        return {prompt: float(rows) for prompt, rows in zip(self.prompts, result.x[:n_prompts]) if rows > 0.5}
+
+    def next_round(self, counts, total, batch_size, max_batches=MAX_CONCURRENT_BATCHES):
+        """Prompts of the next round of concurrent batches (one entry per batch)."""
+        remaining = self.plan(counts, total)
+        if not remaining:
+            return [MASTER_PROMPT]
+        # No more batches than the planned rows fill, so the last rounds don't overshoot
+        max_batches = min(max_batches, math.ceil(sum(remaining.values()) / batch_size))
+        round_prompts = []
+        while len(round_prompts) < max_batches and remaining:
+            prompt = max(remaining, key=remaining.get)
+            round_prompts.append(prompt)
+            remaining[prompt] -= batch_size
+            if remaining[prompt] <= 0:
+                del remaining[prompt]
+        return round_prompts
+
+    def quota_reached(self, counts, goal_class):
+        """Whether the quota of an infill prompt's goal class is filled (counts as in plan())."""
+        return all(counts[target][class_name] >= share * self.num_rows
+                   for (target, class_name), share in zip(self.classes, self.shares) if class_name == goal_class)
+
+    def print_report(self):
+        Y = self.yields()
+        print("\n--- Batch Scheduler Report ---")
+        print(f"{sum(self.calls.values())} batches in total.")
+        print(f"{'prompt':<20}{'batches':>8}{'rows req.':>10}{'accepted/row':>13}  top classes (accepted/row)")
+        for k, prompt in enumerate(self.prompts):
+            acceptance = Y[self._view_rows, k].sum()
+            top = sorted(((Y[i, k], key) for i, key in enumerate(self.classes) if key[0] != 'predicted_view'), reverse=True)[:3]
+            top_text = ", ".join(f"{target.split('_')[1]}={class_name} {value:.2f}" for value, (target, class_name) in top)
+            print(f"{prompt:<20}{self.calls[prompt]:>8}{int(self._requested[k]):>10}{acceptance:>13.2f}  {top_text}")
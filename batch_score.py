@@ -0,0 +1,176 @@
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+import rule_engine
+from feature_engineering import engineer_features_df, load_feature_manifest
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for Parquet input/output
+    pa = pq = None
+
+# --- Offline Batch Scoring ---
+# Scores a CSV/Parquet file of board snapshots (the raw counts a /predict payload contains)
+# with the same decisions as app.py, without going through the server row by row:
+# - the input is read in chunks of CHUNK_SIZE rows and every chunk is scored by a worker of a
+#   process pool; each worker loads the models once (pool initializer),
+# - at most MAX_CHUNKS_PER_WORKER chunks per worker are in flight, and results are written
+#   in input order as soon as the oldest chunk is done, so memory stays bounded,
+# - per row: trivial boards (< MIN_TASKS_FOR_MODEL tasks) are 'list' without filters,
+#   predictions below CONFIDENCE_THRESHOLD fall back to the rule engine, and filters are
+#   'none' in kanban view.
+# Usage: python batch_score.py boards.csv predictions.csv [--probabilities] [--keep-columns id]
+
+MODEL_DIR = "models"
+TARGET_COLUMNS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+MODEL_FILE_SUFFIXES = {'forest': '', 'compact': '_compact', 'distilled': '_distilled'}
+# Same decision rules as app.py
+MIN_TASKS_FOR_MODEL = 5
+CONFIDENCE_THRESHOLD = 0.5
+
+CHUNK_SIZE = 50_000
+WORKERS = os.cpu_count() or 1
+MAX_CHUNKS_PER_WORKER = 2
+
+# Per-process state, set by _init_worker
+_worker_state = {}
+
+
+def _init_worker(model_dir, suffix):
+    models = {target: joblib.load(os.path.join(model_dir, f"model_{target}{suffix}.pkl")) for target in TARGET_COLUMNS}
+    _worker_state['models'] = models
+    _worker_state['features'] = load_feature_manifest(model_dir) or list(models['predicted_view'].feature_names_in_)
+
+
+def score_chunk(chunk, probabilities=False):
+    """Predictions (and optionally class probabilities) for a DataFrame of raw board counts."""
+    models, features = _worker_state['models'], _worker_state['features']
+    X = engineer_features_df(chunk.copy(), features)[features]
+    rules = rule_engine.evaluate_rules(chunk)
+    trivial = chunk['number_of_tasks'].to_numpy() < MIN_TASKS_FOR_MODEL
+
+    result = {}
+    for target, model in models.items():
+        proba = model.predict_proba(X)
+        best = proba.argmax(axis=1)
+        confident = proba[np.arange(len(proba)), best] >= CONFIDENCE_THRESHOLD
+        result[target] = np.where(confident, model.classes_.astype(str)[best], rules[target])
+        result[f'source_{target}'] = np.where(confident, 'model', 'rules')
+        if probabilities:
+            for index, class_name in enumerate(model.classes_):
+                result[f'proba_{target}_{class_name}'] = proba[:, index]
+
+    kanban = result['predicted_view'] == 'kanban'
+    for target in TARGET_COLUMNS[1:]:
+        result[target] = np.where(kanban, 'none', result[target])
+    for target, trivial_value in zip(TARGET_COLUMNS, ['list', 'none', 'none']):
+        result[target] = np.where(trivial, trivial_value, result[target])
+        result[f'source_{target}'] = np.where(trivial, 'trivial', result[f'source_{target}'])
+    return pd.DataFrame(result, index=chunk.index)
+
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def _require_pyarrow(path):
+    if pq is None:
+        raise SystemExit(f"Reading/writing '{path}' needs pyarrow (pip install pyarrow).")
+
+
+def iter_input(path, chunk_size):
+    """Yields the input file as DataFrames of at most chunk_size rows."""
+    if _is_parquet(path):
+        _require_pyarrow(path)
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        if self.parquet:
+            _require_pyarrow(path)
+        self._writer = None
+        self._header = True
+
+    def write(self, df):
+        if self.parquet:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self._header else 'a', header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path, output_path, model_dir=MODEL_DIR, backend='forest', chunk_size=CHUNK_SIZE,
+               workers=WORKERS, probabilities=False, keep_columns=()):
+    """Scores input_path into output_path; returns the number of rows scored."""
+    suffix = MODEL_FILE_SUFFIXES[backend]
+    # Forked workers don't re-import this script; elsewhere the initializer loads the models
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    writer = ChunkWriter(output_path)
+    pending = deque()
+    rows = 0
+    start = time.perf_counter()
+
+    def write_oldest():
+        nonlocal rows
+        kept, future = pending.popleft()
+        scored = future.result()
+        writer.write(pd.concat([kept, scored], axis=1) if kept is not None else scored)
+        rows += len(scored)
+        elapsed = time.perf_counter() - start
+        print(f" ... {rows:,} rows scored ({rows / elapsed:,.0f} rows/s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(model_dir, suffix)) as pool:
+            for chunk in iter_input(input_path, chunk_size):
+                if len(pending) >= workers * MAX_CHUNKS_PER_WORKER:
+                    write_oldest()
+                kept = chunk[list(keep_columns)].reset_index(drop=True) if keep_columns else None
+                pending.append((kept, pool.submit(score_chunk, chunk.reset_index(drop=True), probabilities)))
+            while pending:
+                write_oldest()
+    finally:
+        writer.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of boards with the trained models.")
+    parser.add_argument("input", help="CSV or Parquet file with the raw count columns of a /predict payload")
+    parser.add_argument("output", help="CSV or Parquet file for the predictions (same row order as the input)")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--backend", choices=list(MODEL_FILE_SUFFIXES), default='forest', help="Model variant, as MODEL_BACKEND in app.py")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--probabilities", action="store_true", help="Also write the class probabilities of every model")
+    parser.add_argument("--keep-columns", nargs="+", default=[], metavar="COLUMN", help="Input columns copied to the output (e.g. an id)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scored_rows = score_file(args.input, args.output, args.model_dir, args.backend, args.chunk_size,
+                             args.workers, args.probabilities, args.keep_columns)
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {scored_rows:,} rows in {elapsed:.1f}s ({scored_rows / max(elapsed, 1e-9):,.0f} rows/s) "
+          f"with {args.workers} workers. Predictions saved to '{args.output}'.")
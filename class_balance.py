@@ -0,0 +1,38 @@
+from collections import Counter
+
+# --- Running Class Counts for Distribution Control ---
+# Keeps per-target class counters up to date as rows are accepted, so the deficit loop in the
+# generators doesn't recount the whole accumulated DataFrame before every batch.
+
+
+class ClassBalance:
+    """Class counts per target column, compared against the target proportions."""
+
+    def __init__(self, target_distributions):
+        self.target_distributions = target_distributions
+        self.counts = {target: Counter() for target in target_distributions}
+        self.total = 0
+
+    def add(self, df):
+        """Counts the accepted rows of a processed DataFrame."""
+        for target in self.target_distributions:
+            self.counts[target].update(df[target].astype(str))
+        self.total += len(df)
+
+    def proportion(self, target, class_name):
+        return self.counts[target][class_name] / self.total if self.total else 0.0
+
+    def deficits(self):
+        """Proportional deficit per class name for every class below its target share."""
+        deficits = {}
+        if not self.total:
+            return deficits
+        for target, targets in self.target_distributions.items():
+            for class_name, target_prop in targets.items():
+                current_prop = self.proportion(target, class_name)
+                if current_prop < target_prop:
+                    deficits[class_name] = target_prop - current_prop
+        return deficits
+
+    def has_deficit(self, class_name):
+        return class_name in self.deficits()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import rule_engine
+
+# --- Configuration ---
+DATA_FILE = "training_data_llm_v11.csv"
+MODEL_DIR = "models"
+TARGET_COLUMNS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+
+
+def load_models():
+    """Loads the three trained pipelines if they exist, otherwise returns None."""
+    models = {}
+    for target in TARGET_COLUMNS:
+        model_path = os.path.join(MODEL_DIR, f"model_{target}.pkl")
+        if not os.path.exists(model_path):
+            print(f"Model '{model_path}' not found. Comparing rules against the labels only.")
+            return None
+        models[target] = joblib.load(model_path)
+    return models
+
+
+def agreement(a, b):
+    """Share of rows where both label arrays agree."""
+    if len(a) == 0:
+        return float('nan')
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+def compare(df, models):
+    """Scores the rule engine against the dataset labels and, if available, the models."""
+    decisions = rule_engine.evaluate_rules(rule_engine.counts_from_features(df))
+
+    print("\n--- Rules fired ---")
+    print(pd.Series(decisions['rule']).value_counts())
+
+    model_predictions = {}
+    if models is not None:
+        for target, model in models.items():
+            model_predictions[target] = model.predict(df[list(model.feature_names_in_)])
+
+    # The filter models are only trained on list rows, so the filters are scored on those as well
+    list_rows = (df['predicted_view'] != 'kanban').to_numpy()
+
+    print("\n--- Agreement ---")
+    for target in TARGET_COLUMNS:
+        mask = np.ones(len(df), dtype=bool) if target == 'predicted_view' else list_rows
+        labels = df[target].to_numpy()[mask]
+        rules = decisions[target][mask]
+
+        print(f"\n{target} ({mask.sum()} rows)")
+        print(f"  rules vs. labels: {agreement(rules, labels):.3f}")
+        if target in model_predictions:
+            model = model_predictions[target][mask]
+            print(f"  model vs. labels: {agreement(model, labels):.3f}")
+            print(f"  rules vs. model:  {agreement(rules, model):.3f}")
+        print(pd.crosstab(pd.Series(labels, name='label'), pd.Series(rules, name='rules')))
+
+
+def benchmark(num_boards, seed=42):
+    """Times the vectorized rule cascade on randomly generated boards."""
+    rng = np.random.default_rng(seed)
+    num_tasks = rng.integers(0, 101, size=num_boards)
+    # Split the tasks into the five statuses with a random multinomial draw per board
+    statuses = rng.multinomial(num_tasks, [0.2] * 5)
+    num_open = num_tasks - statuses[:, 3]
+    counts = {
+        'number_of_tasks': num_tasks,
+        'num_pending': statuses[:, 0],
+        'num_todo': statuses[:, 1],
+        'num_inprogress': statuses[:, 2],
+        'num_done': statuses[:, 3],
+        'num_blocked': statuses[:, 4],
+        'num_critical_open': rng.binomial(num_open, 0.1),
+        'overdue_tasks': rng.binomial(num_open, 0.05),
+        'due_today': rng.binomial(num_open, 0.02),
+    }
+
+    start = time.perf_counter()
+    indices = rule_engine.evaluate_rule_indices(counts)
+    elapsed = time.perf_counter() - start
+    print(f"\nEvaluated {num_boards:,} boards in {elapsed:.3f}s ({num_boards / elapsed:,.0f} boards/s).")
+    print(pd.Series(np.asarray(rule_engine.RULE_NAMES)[indices]).value_counts())
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the rule engine with the ML models and dataset labels.")
+    parser.add_argument("--data", default=DATA_FILE, help="Training CSV with engineered features and labels.")
+    parser.add_argument("--benchmark", type=int, default=0, metavar="N",
+                        help="Additionally time the rule cascade on N random boards.")
+    args = parser.parse_args()
+
+    print(f"Loading '{args.data}'...")
+    df = pd.read_csv(args.data)
+    compare(df, load_models())
+
+    if args.benchmark:
+        benchmark(args.benchmark)
@@ -0,0 +1,88 @@
+import argparse
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.tree import DecisionTreeClassifier
+from feature_engineering import engineer_features_df, sample_boards
+from model_compression import compress_pipeline
+
+# --- Configuration ---
+MODEL_DIR = "models"
+DATA_FILE = "training_data_llm_v11.csv"
+TARGET_COLUMNS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+
+NUM_SYNTHETIC_BOARDS = 200_000  # Dense samples labeled by the forests
+STUDENT_MAX_DEPTH = 12
+STUDENT_MIN_SAMPLES_LEAF = 20
+HOLDOUT_FRACTION = 0.2
+RANDOM_STATE = 42
+
+
+def build_distillation_set(teacher, real_df, num_boards):
+    """Synthetic boards plus the real training rows, all labeled by the teacher forest."""
+    features = list(teacher.feature_names_in_)
+    synthetic = engineer_features_df(sample_boards(num_boards, seed=RANDOM_STATE), features)[features]
+    # The real rows cover regions the sampler can't produce (e.g. priority counts above the open tasks)
+    X = pd.concat([synthetic, real_df[features]], ignore_index=True)
+    is_real = np.r_[np.zeros(len(synthetic), dtype=bool), np.ones(len(real_df), dtype=bool)]
+    return X, teacher.predict(X), is_real
+
+
+def distill(target, teacher, real_df, num_boards, max_depth, min_samples_leaf):
+    """Trains a single decision tree that imitates the teacher and reports its fidelity."""
+    print(f"\n--- Distilling model for: {target} ---")
+    X, y_teacher, is_real = build_distillation_set(teacher, real_df, num_boards)
+
+    X_train, X_test, y_train, y_test, _, real_test = train_test_split(
+        X, y_teacher, is_real, test_size=HOLDOUT_FRACTION, random_state=RANDOM_STATE
+    )
+    student = Pipeline(steps=[
+        ('preprocessor', clone(teacher.named_steps['preprocessor'])),
+        ('classifier', DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=min_samples_leaf,
+                                              random_state=RANDOM_STATE))])
+    student.fit(X_train, y_train)
+    compact = compress_pipeline(student)
+
+    student_pred = compact.predict(X_test)
+    print(f"Student: {compact.n_nodes} nodes, depth {compact.max_depth}")
+    print(f"Fidelity on held-out synthetic boards: {np.mean(student_pred[~real_test] == y_test[~real_test]):.4f}")
+    if real_test.any():
+        print(f"Fidelity on held-out real rows:        {np.mean(student_pred[real_test] == y_test[real_test]):.4f}")
+
+    # Agreement with the dataset labels, on the rows the teacher was trained for
+    labeled = real_df if target == 'predicted_view' else real_df[real_df['predicted_view'] != 'kanban']
+    features = list(teacher.feature_names_in_)
+    print(f"Accuracy vs. labels (teacher / student): "
+          f"{np.mean(teacher.predict(labeled[features]) == labeled[target]):.4f} / "
+          f"{np.mean(compact.predict(labeled[features]) == labeled[target]):.4f}")
+
+    single_row = X_test.iloc[[0]]
+    start = time.perf_counter()
+    for _ in range(100):
+        compact.predict_proba(single_row)
+    print(f"Student latency: {(time.perf_counter() - start) * 10:.3f} ms per request")
+    return compact
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the RandomForest models into single decision trees.")
+    parser.add_argument("--samples", type=int, default=NUM_SYNTHETIC_BOARDS, help="Number of synthetic boards.")
+    parser.add_argument("--max-depth", type=int, default=STUDENT_MAX_DEPTH)
+    parser.add_argument("--min-samples-leaf", type=int, default=STUDENT_MIN_SAMPLES_LEAF)
+    args = parser.parse_args()
+
+    real_df = pd.read_csv(DATA_FILE)
+    for target in TARGET_COLUMNS:
+        teacher = joblib.load(os.path.join(MODEL_DIR, f"model_{target}.pkl"))
+        compact = distill(target, teacher, real_df, args.samples, args.max_depth, args.min_samples_leaf)
+        model_path = os.path.join(MODEL_DIR, f"model_{target}_distilled.pkl")
+        joblib.dump(compact, model_path)
+        print(f"Distilled model saved to '{model_path}'")
+
+    print("\nServe the distilled models with MODEL_BACKEND=distilled python app.py")
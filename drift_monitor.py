@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# --- Drift Monitoring of Live Prediction Traffic ---
+# Compares the feature values and predicted classes the server sees with the training data,
+# without logging payloads:
+# - every feature is cut into REFERENCE_BINS quantile bins of the training data, so each bin
+#   holds the same share of training rows; live values are only counted per bin,
+# - the counts cover a sliding window of the last WINDOW_BLOCKS * BLOCK_SIZE observations,
+#   kept as a ring of per-block counts (constant memory; the oldest block is reset on rotation),
+# - the divergence per feature / target is the population stability index (PSI) between the
+#   window and the training distribution.
+# The request path only puts the observation into a bounded queue (dropped if full); binning
+# and scoring run in a background thread, and /drift returns the last computed report.
+
+REFERENCE_BINS = 10
+BLOCK_SIZE = 100
+WINDOW_BLOCKS = 10
+MIN_OBSERVATIONS = 100      # Below this many observations in the window there's no score
+QUEUE_SIZE = 1000
+REPORT_INTERVAL_S = 5.0
+PSI_EPSILON = 1e-4          # Smoothing for empty bins
+# Common PSI reading: < 0.1 stable, 0.1 - 0.25 moderate shift, > 0.25 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+def population_stability_index(expected, actual):
+    """PSI between two distributions given as (unnormalized) counts or proportions."""
+    p = np.asarray(expected, dtype=np.float64)
+    q = np.asarray(actual, dtype=np.float64)
+    p = np.clip(p / p.sum(), PSI_EPSILON, None)
+    q = np.clip(q / q.sum(), PSI_EPSILON, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def _drift_status(psi):
+    if psi >= PSI_SIGNIFICANT:
+        return 'significant'
+    return 'moderate' if psi >= PSI_MODERATE else 'stable'
+
+
+class DriftMonitor:
+    """Sliding-window histograms of live features and predictions, scored in a background thread."""
+
+    def __init__(self, reference_df, features, targets, bins=REFERENCE_BINS):
+        self.features = list(features)
+        self.targets = list(targets)
+
+        # Quantile bin edges per feature; repeated quantiles (discrete features) are merged
+        self.edges = []
+        self.reference_features = []
+        for feature in self.features:
+            values = reference_df[feature].to_numpy(dtype=np.float64)
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+            self.edges.append(edges)
+            self.reference_features.append(np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1))
+        self.feature_offsets = np.cumsum([0] + [len(edges) + 1 for edges in self.edges])
+
+        # One extra slot per target for classes the training data doesn't contain
+        self.classes = {target: sorted(reference_df[target].astype(str).unique()) for target in self.targets}
+        self.class_index = {target: {name: i for i, name in enumerate(names)} for target, names in self.classes.items()}
+        self.reference_labels = {
+            target: np.r_[reference_df[target].astype(str).value_counts().reindex(self.classes[target]).to_numpy(), 0]
+            for target in self.targets
+        }
+        self.label_offsets = np.cumsum([0] + [len(self.classes[target]) + 1 for target in self.targets])
+
+        self._feature_counts = np.zeros((WINDOW_BLOCKS, self.feature_offsets[-1]), dtype=np.int64)
+        self._label_counts = np.zeros((WINDOW_BLOCKS, self.label_offsets[-1]), dtype=np.int64)
+        self._block = 0
+        self._block_fill = 0
+
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.dropped = 0
+        self._report = {'status': 'insufficient_data', 'observed': 0}
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_training_data(cls, path, features, targets, min_tasks=0):
+        """
+        Monitor with the training CSV as reference, or None if the file or a column is missing.
+        Only rows with at least min_tasks tasks are used, matching the requests that get observed.
+        """
+        columns = list(dict.fromkeys(list(features) + list(targets) + ['number_of_tasks']))
+        try:
+            reference_df = pd.read_csv(path, usecols=columns)
+        except (FileNotFoundError, ValueError):
+            return None
+        reference_df = reference_df[reference_df['number_of_tasks'] >= min_tasks]
+        if reference_df.empty:
+            return None
+        return cls(reference_df, features, targets)
+
+    # --- Request path ---
+    def observe(self, feature_values, predictions):
+        """Queues one observation (feature values in self.features order, dict of predicted labels)."""
+        try:
+            self._queue.put_nowait((np.asarray(feature_values, dtype=np.float64), predictions))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    # --- Background thread ---
+    def _add(self, feature_values, predictions):
+        if self._block_fill == BLOCK_SIZE:
+            self._block = (self._block + 1) % WINDOW_BLOCKS
+            self._feature_counts[self._block] = 0
+            self._label_counts[self._block] = 0
+            self._block_fill = 0
+
+        for i, edges in enumerate(self.edges):
+            self._feature_counts[self._block, self.feature_offsets[i] + np.searchsorted(edges, feature_values[i], side='right')] += 1
+        for i, target in enumerate(self.targets):
+            slot = self.class_index[target].get(str(predictions.get(target)), len(self.classes[target]))
+            self._label_counts[self._block, self.label_offsets[i] + slot] += 1
+        self._block_fill += 1
+        self.observed += 1
+
+    def _score(self):
+        feature_window = self._feature_counts.sum(axis=0)
+        label_window = self._label_counts.sum(axis=0)
+        window_size = int(label_window[:self.label_offsets[1]].sum())
+        report = {
+            'computed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'observed': self.observed,
+            'dropped': self.dropped,
+            'window_size': window_size,
+        }
+        if window_size < MIN_OBSERVATIONS:
+            report['status'] = 'insufficient_data'
+            return report
+
+        features = {}
+        for i, feature in enumerate(self.features):
+            psi = population_stability_index(self.reference_features[i], feature_window[self.feature_offsets[i]:self.feature_offsets[i + 1]])
+            features[feature] = {'psi': round(psi, 4), 'status': _drift_status(psi)}
+        predictions = {}
+        for i, target in enumerate(self.targets):
+            window = label_window[self.label_offsets[i]:self.label_offsets[i + 1]]
+            psi = population_stability_index(self.reference_labels[target], window)
+            names = self.classes[target] + ['<unseen>']
+            predictions[target] = {
+                'psi': round(psi, 4),
+                'status': _drift_status(psi),
+                'window_share': {name: round(count / window_size, 4) for name, count in zip(names, window) if count},
+            }
+
+        max_psi = max(entry['psi'] for entry in list(features.values()) + list(predictions.values()))
+        report.update({
+            'status': _drift_status(max_psi),
+            'max_psi': max_psi,
+            'retrain_recommended': max_psi >= PSI_SIGNIFICANT,
+            'features': features,
+            'predictions': predictions,
+        })
+        return report
+
+    def _run(self):
+        next_report = time.monotonic() + REPORT_INTERVAL_S
+        while True:
+            try:
+                feature_values, predictions = self._queue.get(timeout=max(next_report - time.monotonic(), 0.01))
+                self._add(feature_values, predictions)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_report:
+                report = self._score()
+                with self._lock:
+                    self._report = report
+                next_report = time.monotonic() + REPORT_INTERVAL_S
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._report, dropped=self.dropped, queued=self._queue.qsize())
@@ -0,0 +1,178 @@
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+
+# --- Model Evaluation with Bootstrap Confidence Intervals ---
+# One 80/20 split gives a single number per metric, which is too noisy to tell two model
+# variants apart. Here every metric also gets a bootstrap confidence interval:
+# - labels are encoded as integers and a confusion matrix is a single np.bincount over the
+#   encoded (true, predicted) pairs,
+# - a block of resamples is one bincount as well (the resample index is part of the code),
+#   and metrics are computed for all confusion matrices of a block at once,
+# - blocks are spread over a process pool when the work is large enough to pay for it.
+# The results are written as JSON so runs can be compared (python evaluation.py old new).
+
+N_BOOTSTRAP = 2000
+CONFIDENCE_LEVEL = 0.95
+RESAMPLES_PER_BLOCK = 250
+BOOTSTRAP_WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_WORK = 5_000_000 # Resampled rows below which the pool startup costs more than it saves
+REPORT_FILE = "evaluation_report.json"
+
+
+def encode_labels(y_true, y_pred):
+    """Class list (union of both label sets) and the integer codes of y_true and y_pred."""
+    y_true, y_pred = np.asarray(y_true).astype(str), np.asarray(y_pred).astype(str)
+    classes = np.unique(np.concatenate([y_true, y_pred]))
+    return classes, np.searchsorted(classes, y_true), np.searchsorted(classes, y_pred)
+
+
+def confusion_matrix(true_codes, pred_codes, n_classes):
+    """Rows are true classes, columns predicted classes."""
+    pair_codes = true_codes * n_classes + pred_codes
+    return np.bincount(pair_codes, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def metrics_from_confusion(cm):
+    """
+    Accuracy, macro/weighted F1 and per-class precision/recall/F1 for one confusion matrix
+    or a stack of them (shape (..., n, n)). Undefined precision/recall count as 0, as in
+    classification_report(zero_division=0); classes absent from both the labels and the
+    predictions of a resample are left out of its macro average.
+    """
+    cm = cm.astype(np.float64)
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        present = (support + predicted) > 0
+        total = support.sum(axis=-1)
+        return {
+            'accuracy': tp.sum(axis=-1) / total,
+            'macro_f1': np.where(present, f1, 0.0).sum(axis=-1) / present.sum(axis=-1),
+            'weighted_f1': (f1 * support).sum(axis=-1) / total,
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+        }
+
+
+def _bootstrap_block(pair_codes, n_classes, n_resamples, seed):
+    """Metrics of n_resamples bootstrap resamples, computed with one bincount."""
+    rng = np.random.default_rng(seed)
+    n_rows = len(pair_codes)
+    n_cells = n_classes * n_classes
+    indices = rng.integers(0, n_rows, size=(n_resamples, n_rows))
+    codes = pair_codes[indices] + (np.arange(n_resamples) * n_cells)[:, None]
+    cms = np.bincount(codes.ravel(), minlength=n_resamples * n_cells).reshape(n_resamples, n_classes, n_classes)
+    return metrics_from_confusion(cms)
+
+
+def _pool_context():
+    # Forked workers don't re-run the top-level code of the training script
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def bootstrap_metrics(pair_codes, n_classes, n_resamples=N_BOOTSTRAP, seed=42, workers=BOOTSTRAP_WORKERS):
+    """Metric arrays over all resamples (first axis = resample)."""
+    blocks = [min(RESAMPLES_PER_BLOCK, n_resamples - start) for start in range(0, n_resamples, RESAMPLES_PER_BLOCK)]
+    args = [(pair_codes, n_classes, size, (seed, index)) for index, size in enumerate(blocks)]
+    if workers > 1 and len(blocks) > 1 and n_resamples * len(pair_codes) >= PARALLEL_MIN_WORK:
+        with ProcessPoolExecutor(max_workers=min(workers, len(blocks)), mp_context=_pool_context()) as pool:
+            results = list(pool.map(_bootstrap_block, *zip(*args)))
+    else:
+        results = [_bootstrap_block(*block_args) for block_args in args]
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+
+def _interval(value, samples, confidence):
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(samples, [tail, 100 - tail])
+    return {'value': float(value), 'ci_low': float(low), 'ci_high': float(high)}
+
+
+def evaluate(y_true, y_pred, n_resamples=N_BOOTSTRAP, confidence=CONFIDENCE_LEVEL, seed=42, workers=BOOTSTRAP_WORKERS):
+    """JSON-serializable evaluation of one target: confusion matrix and metrics with bootstrap CIs."""
+    classes, true_codes, pred_codes = encode_labels(y_true, y_pred)
+    n_classes = len(classes)
+    cm = confusion_matrix(true_codes, pred_codes, n_classes)
+    point = metrics_from_confusion(cm)
+    samples = bootstrap_metrics(true_codes * n_classes + pred_codes, n_classes, n_resamples, seed, workers)
+
+    per_class = {}
+    for index, class_name in enumerate(classes):
+        per_class[str(class_name)] = {
+            name: _interval(point[name][index], samples[name][:, index], confidence)
+            for name in ('precision', 'recall', 'f1')
+        }
+        per_class[str(class_name)]['support'] = int(cm[index].sum())
+
+    return {
+        'classes': [str(class_name) for class_name in classes],
+        'n_test': int(len(true_codes)),
+        'confusion_matrix': cm.tolist(),
+        **{name: _interval(point[name], samples[name], confidence) for name in ('accuracy', 'macro_f1', 'weighted_f1')},
+        'per_class': per_class,
+    }
+
+
+def print_evaluation(report):
+    print(f"\nEvaluation Report ({CONFIDENCE_LEVEL:.0%} bootstrap CI):")
+    print(f"{'class':>18}{'precision':>20}{'recall':>20}{'f1':>20}{'support':>9}")
+
+    def fmt(metric):
+        return f"{metric['value']:.2f} [{metric['ci_low']:.2f}-{metric['ci_high']:.2f}]"
+
+    for class_name, metrics in report['per_class'].items():
+        print(f"{class_name:>18}{fmt(metrics['precision']):>20}{fmt(metrics['recall']):>20}{fmt(metrics['f1']):>20}{metrics['support']:>9}")
+    for name in ('accuracy', 'macro_f1', 'weighted_f1'):
+        print(f"{name:>18}{fmt(report[name]):>20}")
+
+
+def write_report(target_reports, path, **metadata):
+    """Writes the reports of all targets plus run metadata as one JSON file."""
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'n_resamples': N_BOOTSTRAP,
+        'confidence': CONFIDENCE_LEVEL,
+        **metadata,
+        'targets': target_reports,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def compare_reports(old, new):
+    """Prints headline metrics of two report files side by side."""
+    print(f"{'target':<28}{'metric':<13}{'old':>22}{'new':>22}{'delta':>8}")
+    for target, new_report in new['targets'].items():
+        old_report = old['targets'].get(target)
+        if old_report is None:
+            continue
+        for name in ('accuracy', 'macro_f1', 'weighted_f1'):
+            a, b = old_report[name], new_report[name]
+            # Non-overlapping intervals are a strong hint the difference isn't noise
+            marker = " *" if a['ci_high'] < b['ci_low'] or b['ci_high'] < a['ci_low'] else ""
+            print(f"{target:<28}{name:<13}"
+                  f"{a['value']:>8.4f} [{a['ci_low']:.3f}-{a['ci_high']:.3f}]"
+                  f"{b['value']:>8.4f} [{b['ci_low']:.3f}-{b['ci_high']:.3f}]"
+                  f"{b['value'] - a['value']:>+8.4f}{marker}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two evaluation reports written by train_model.py.")
+    parser.add_argument("old", help="Report of the baseline run")
+    parser.add_argument("new", help="Report of the run to compare")
+    args = parser.parse_args()
+    with open(args.old) as f_old, open(args.new) as f_new:
+        compare_reports(json.load(f_old), json.load(f_new))
@@ -0,0 +1,142 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# --- Feature Engineering from Raw Counts ---
+# Same features as validate_and_process_df in the data generators and engineer_features
+# in app.py, but computed for a whole DataFrame of boards at once (no row-wise apply).
+
+COUNT_COLUMNS = [
+    'number_of_tasks', 'num_critical_open', 'num_high_open', 'num_medium_open', 'num_low_open',
+    'num_pending', 'num_todo', 'num_inprogress', 'num_done', 'num_blocked',
+    'overdue_tasks',
+]
+STATUS_COUNT_COLUMNS = ['num_pending', 'num_todo', 'num_inprogress', 'num_done', 'num_blocked']
+STATUS_PCT_COLUMNS = ['pct_pending_status', 'pct_todo_status', 'pct_in_progress_status', 'pct_done_status', 'pct_blocked_status']
+
+
+def status_entropy(status_pct):
+    """Vectorized scipy.stats.entropy over the rows of a (n_boards, n_statuses) array, ignoring zeros."""
+    p = np.nan_to_num(np.asarray(status_pct, dtype=np.float64))
+    totals = p.sum(axis=1, keepdims=True)
+    p = np.divide(p, totals, out=np.zeros_like(p), where=totals > 0)
+    logs = np.log(p, out=np.zeros_like(p), where=p > 0)
+    return -(p * logs).sum(axis=1)
+
+
+# Engineered feature -> (engineered features it is computed from, function(df, num_open_tasks_safe)).
+# Listed in dependency order, so computing them top to bottom always works.
+FEATURE_DEFINITIONS = {
+    # Base Percentages
+    'pct_critical_open': ([], lambda df, open_safe: (df['num_critical_open'] / open_safe).fillna(0)),
+    'pct_high_open': ([], lambda df, open_safe: (df['num_high_open'] / open_safe).fillna(0)),
+    'pct_medium_open': ([], lambda df, open_safe: (df['num_medium_open'] / open_safe).fillna(0)),
+    'pct_low_open': ([], lambda df, open_safe: (df['num_low_open'] / open_safe).fillna(0)),
+    'pct_pending_status': ([], lambda df, open_safe: (df['num_pending'] / df['number_of_tasks']).fillna(0)),
+    'pct_todo_status': ([], lambda df, open_safe: (df['num_todo'] / df['number_of_tasks']).fillna(0)),
+    'pct_in_progress_status': ([], lambda df, open_safe: (df['num_inprogress'] / df['number_of_tasks']).fillna(0)),
+    'pct_done_status': ([], lambda df, open_safe: (df['num_done'] / df['number_of_tasks']).fillna(0)),
+    'pct_blocked_status': ([], lambda df, open_safe: (df['num_blocked'] / df['number_of_tasks']).fillna(0)),
+    'pct_overdue': ([], lambda df, open_safe: (df['overdue_tasks'] / df['number_of_tasks']).round(4).fillna(0)),
+
+    # Interaction and Composite Features
+    'crisis_index': (['pct_overdue', 'pct_critical_open'], lambda df, open_safe: df['pct_overdue'] * df['pct_critical_open']),
+    'backlog_pressure': (['pct_todo_status', 'pct_low_open'], lambda df, open_safe: df['pct_todo_status'] * df['pct_low_open']),
+    'wip_load': ([], lambda df, open_safe: (df['num_inprogress'] / open_safe).fillna(0)),
+    'health_score': (
+        ['pct_overdue', 'pct_blocked_status', 'pct_critical_open'],
+        lambda df, open_safe: (0.5 * df['pct_overdue']) + (0.3 * df['pct_blocked_status']) + (0.2 * df['pct_critical_open'])
+    ),
+
+    # Structural Features
+    'status_entropy': (STATUS_PCT_COLUMNS, lambda df, open_safe: status_entropy(df[STATUS_PCT_COLUMNS].to_numpy())),
+    'number_of_statuses_used': ([], lambda df, open_safe: (df[STATUS_COUNT_COLUMNS] > 0).sum(axis=1)),
+
+    # Event-Based Features
+    'last_action_critical_bug': (
+        [], lambda df, open_safe: ((df['last_task_created_label'] == 'Bug') & (df['last_task_created_priority'] == 'Kritisch')).astype(int)
+    ),
+}
+ENGINEERED_FEATURES = list(FEATURE_DEFINITIONS)
+
+
+def required_features(features):
+    """The requested engineered features plus everything they are computed from, in computation order."""
+    needed = set()
+    pending = [feature for feature in features if feature in FEATURE_DEFINITIONS]
+    while pending:
+        feature = pending.pop()
+        if feature not in needed:
+            needed.add(feature)
+            pending.extend(FEATURE_DEFINITIONS[feature][0])
+    return [feature for feature in ENGINEERED_FEATURES if feature in needed]
+
+
+def engineer_features_df(df, features=None):
+    """
+    Adds engineered features to a DataFrame with the raw count columns and returns it.
+
+    With `features`, only those (and the features they are computed from) are added;
+    names that aren't engineered features (e.g. raw counts) are ignored.
+    """
+    to_compute = ENGINEERED_FEATURES if features is None else required_features(features)
+    if 'last_action_critical_bug' in to_compute and not ('last_task_created_label' in df and 'last_task_created_priority' in df):
+        to_compute = [feature for feature in to_compute if feature != 'last_action_critical_bug']
+
+    num_open_tasks_safe = (df['number_of_tasks'] - df['num_done']).replace(0, 1)
+    for feature in to_compute:
+        df[feature] = FEATURE_DEFINITIONS[feature][1](df, num_open_tasks_safe)
+    return df
+
+
+# --- Feature Manifest ---
+# Written by feature_selection.py; the single list of model features that train_model.py
+# trains on and app.py computes per request.
+FEATURE_MANIFEST_FILE = "feature_manifest.json"
+
+
+def load_feature_manifest(model_dir):
+    """Feature list from the manifest in model_dir, or None if there is no manifest."""
+    path = os.path.join(model_dir, FEATURE_MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['features']
+
+
+def sample_boards(num_boards, seed=42, max_tasks=100):
+    """
+    Draws random but internally consistent boards (raw counts) for synthetic evaluation.
+
+    Status counts always sum to number_of_tasks, open priority counts sum to at most the
+    open tasks, and overdue tasks never exceed the open tasks. Each board gets its own
+    Dirichlet mix so skewed boards (crises, backlogs, nearly done) are covered as well.
+    """
+    rng = np.random.default_rng(seed)
+    num_tasks = rng.integers(1, max_tasks + 1, size=num_boards)
+
+    status_mix = rng.dirichlet(np.full(5, 0.7), size=num_boards)
+    statuses = rng.multinomial(num_tasks, status_mix)
+    num_open = num_tasks - statuses[:, 3]
+
+    # The fifth bucket collects open tasks without one of the four priorities
+    priority_mix = rng.dirichlet(np.full(5, 0.7), size=num_boards)
+    priorities = rng.multinomial(num_open, priority_mix)
+
+    overdue_rate = rng.beta(0.6, 3.0, size=num_boards)
+    overdue = rng.binomial(num_open, overdue_rate)
+
+    return pd.DataFrame({
+        'number_of_tasks': num_tasks,
+        'num_critical_open': priorities[:, 0],
+        'num_high_open': priorities[:, 1],
+        'num_medium_open': priorities[:, 2],
+        'num_low_open': priorities[:, 3],
+        'num_pending': statuses[:, 0],
+        'num_todo': statuses[:, 1],
+        'num_inprogress': statuses[:, 2],
+        'num_done': statuses[:, 3],
+        'num_blocked': statuses[:, 4],
+        'overdue_tasks': overdue,
+    })
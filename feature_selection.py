@@ -0,0 +1,193 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from feature_engineering import COUNT_COLUMNS, ENGINEERED_FEATURES, FEATURE_MANIFEST_FILE
+
+# --- Automated Feature Selection ---
+# Greedy backward elimination driven by permutation importance:
+#   1. Fit one forest per target and measure, for every remaining feature, how much held-out
+#      accuracy drops when that feature's column is shuffled (the largest drop over the
+#      three targets counts, since the feature vector is shared).
+#   2. Try to drop the least important features: a drop is accepted if the cross-validated
+#      accuracy of every target stays within TOLERANCE of the accuracy with all features.
+#   3. Repeat until no candidate can be dropped.
+# Importances and cross-validation folds are computed in a process pool. The result is
+# written to models/feature_manifest.json, which train_model.py trains on and app.py uses to
+# compute only the features the models need.
+
+MODEL_DIR = "models"
+DATA_FILES = ["training_data_llm_v11.csv", "training_data_llm_v8_noisy.csv"]
+TARGET_COLUMNS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+LIST_ONLY_TARGETS = ['predicted_status_filter', 'predicted_priority_filter']
+
+# Same forest as train_model.py, so importances describe the model that will be served
+FOREST_PARAMS = {'n_estimators': 70, 'max_depth': 14, 'random_state': 42}
+N_FOLDS = 5
+PERMUTATION_REPEATS = 5
+TOLERANCE = 0.005          # Accepted loss in cross-validated accuracy per target
+CANDIDATES_PER_STEP = 3    # Least important features tried per elimination step
+MIN_FEATURES = 3
+WORKERS = os.cpu_count() or 1
+RANDOM_STATE = 42
+
+# Per-process state, set by _init_worker so the data is sent to each worker only once
+_worker_state = {}
+
+
+def _init_worker(target_data, models=None, holdouts=None):
+    _worker_state['data'] = target_data
+    _worker_state['models'] = models
+    _worker_state['holdouts'] = holdouts
+
+
+def _fold_accuracy(features, target, fold):
+    """Accuracy of a forest on one cross-validation fold of a target."""
+    X, y, folds = _worker_state['data'][target]
+    train_idx, test_idx = folds[fold]
+    model = RandomForestClassifier(**FOREST_PARAMS).fit(X.iloc[train_idx][features], y.iloc[train_idx])
+    return float(np.mean(model.predict(X.iloc[test_idx][features]) == y.iloc[test_idx].to_numpy()))
+
+
+def _permutation_drop(target, feature):
+    """Mean held-out accuracy drop when `feature` is shuffled, over PERMUTATION_REPEATS shuffles."""
+    model = _worker_state['models'][target]
+    X_holdout, y_holdout = _worker_state['holdouts'][target]
+    y_true = y_holdout.to_numpy()
+    baseline = np.mean(model.predict(X_holdout) == y_true)
+    rng = np.random.default_rng(RANDOM_STATE)
+    drops = []
+    for _ in range(PERMUTATION_REPEATS):
+        shuffled = X_holdout.copy()
+        shuffled[feature] = rng.permutation(shuffled[feature].to_numpy())
+        drops.append(baseline - np.mean(model.predict(shuffled) == y_true))
+    return float(np.mean(drops))
+
+
+def _pool(initargs):
+    # Forked workers inherit the data instead of unpickling it, where the platform allows it
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=WORKERS, mp_context=context, initializer=_init_worker, initargs=initargs)
+
+
+def load_data(paths):
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    return df.sample(frac=1, random_state=RANDOM_STATE).reset_index(drop=True)
+
+
+def candidate_features(df):
+    """
+    Feature columns the server can compute: the raw counts of a /predict payload and the
+    engineered features. Other numeric columns (e.g. time_of_day, only in the noisy data) are
+    never candidates, since a manifest listing them couldn't be served.
+    """
+    return [column for column in df.columns
+            if column in COUNT_COLUMNS + ENGINEERED_FEATURES and pd.api.types.is_numeric_dtype(df[column])]
+
+
+def prepare_targets(df, features):
+    """Per target: (X, y, cross-validation folds) on the rows its model is trained on."""
+    target_data = {}
+    for target in TARGET_COLUMNS:
+        rows = df[df.predicted_view != 'kanban'] if target in LIST_ONLY_TARGETS else df
+        X, y = rows[features].reset_index(drop=True), rows[target].astype(str).reset_index(drop=True)
+        # Classes with fewer members than folds can't be stratified; they still count in training
+        n_folds = max(2, min(N_FOLDS, int(y.value_counts().min())))
+        folds = list(StratifiedKFold(n_folds, shuffle=True, random_state=RANDOM_STATE).split(X, y))
+        target_data[target] = (X, y, folds)
+    return target_data
+
+
+def cv_accuracies(pool, target_data, feature_sets):
+    """Mean cross-validated accuracy per target for every feature set, all folds in parallel."""
+    jobs = [(index, target, fold) for index in range(len(feature_sets))
+            for target, (_, _, folds) in target_data.items() for fold in range(len(folds))]
+    results = pool.map(_fold_accuracy, [feature_sets[index] for index, _, _ in jobs],
+                       [target for _, target, _ in jobs], [fold for _, _, fold in jobs])
+    scores = [{target: [] for target in target_data} for _ in feature_sets]
+    for (index, target, _), accuracy in zip(jobs, results):
+        scores[index][target].append(accuracy)
+    return [{target: float(np.mean(values)) for target, values in score.items()} for score in scores]
+
+
+def permutation_importances(target_data, features):
+    """Largest permutation importance of each feature over all targets."""
+    models, holdouts = {}, {}
+    for target, (X, y, _) in target_data.items():
+        stratify = y if y.value_counts().min() >= 2 else None
+        X_train, X_holdout, y_train, y_holdout = train_test_split(
+            X[features], y, test_size=0.2, random_state=RANDOM_STATE, stratify=stratify
+        )
+        models[target] = RandomForestClassifier(**FOREST_PARAMS).fit(X_train, y_train)
+        holdouts[target] = (X_holdout, y_holdout)
+
+    jobs = [(target, feature) for target in target_data for feature in features]
+    with _pool((None, models, holdouts)) as pool:
+        drops = list(pool.map(_permutation_drop, *zip(*jobs)))
+    importance = {feature: -np.inf for feature in features}
+    for (_, feature), drop in zip(jobs, drops):
+        importance[feature] = max(importance[feature], drop)
+    return importance
+
+
+def select_features(df, tolerance=TOLERANCE):
+    """Runs the greedy elimination; returns the manifest as a dict."""
+    candidates = candidate_features(df)
+    target_data = prepare_targets(df, candidates)
+    selected, dropped = list(candidates), []
+
+    with _pool((target_data,)) as pool:
+        reference = cv_accuracies(pool, target_data, [selected])[0]
+        print(f"All {len(candidates)} features: " + ", ".join(f"{t}={a:.4f}" for t, a in reference.items()))
+        current = reference
+
+        while len(selected) > MIN_FEATURES:
+            importance = permutation_importances(target_data, selected)
+            trial_features = sorted(selected, key=importance.get)[:CANDIDATES_PER_STEP]
+            trials = [[f for f in selected if f != feature] for feature in trial_features]
+            trial_scores = cv_accuracies(pool, target_data, trials)
+
+            for feature, trial, scores in zip(trial_features, trials, trial_scores):
+                if all(scores[target] >= reference[target] - tolerance for target in reference):
+                    selected, current = trial, scores
+                    dropped.append({'feature': feature, 'importance': importance[feature]})
+                    print(f" ... dropped '{feature}' (importance {importance[feature]:+.4f}); "
+                          + ", ".join(f"{t}={a:.4f}" for t, a in scores.items()))
+                    break
+            else:
+                print(f" ... stopping: dropping any of {trial_features} costs more than {tolerance} accuracy.")
+                break
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'features': selected,
+        'candidates': candidates,
+        'dropped': dropped,
+        'tolerance': tolerance,
+        'cv_accuracy': {'all_features': reference, 'selected': current},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select the model features and write the feature manifest.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Accepted accuracy loss per target")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = select_features(load_data(DATA_FILES), args.tolerance)
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    manifest_path = os.path.join(MODEL_DIR, FEATURE_MANIFEST_FILE)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"\nSelected {len(manifest['features'])} of {len(manifest['candidates'])} features "
+          f"in {time.perf_counter() - start:.0f}s: {manifest['features']}")
+    print(f"Manifest saved to '{manifest_path}'. Retrain the models (train_model.py) before serving them.")
@@ -6,17 +6,37 @@ from io import StringIO
 from dotenv import load_dotenv
 import numpy as np
 import re
-from scipy.stats import entropy
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from feature_engineering import status_entropy
+from llm_stream import stream_completion, parse_csv_row
+from class_balance import ClassBalance
+from row_dedup import RowDeduplicator
+from generation_budget import GenerationBudget, AdaptiveBatchSizer
+from batch_scheduler import JointQuotaScheduler, MASTER_PROMPT
 
 # --- Configuration ---
 load_dotenv()
 client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 NUM_ROWS_TO_GENERATE = 700 # Increased for better distribution
-BATCH_SIZE = 25
-OUTPUT_FILE = "training_data_llm_v11.csv"
+BATCH_SIZE = 25 # Starting batch size; adapted per prompt family if ADAPTIVE_BATCH_SIZE is set
+# pipeline.py writes to its stage cache instead
+OUTPUT_FILE = os.environ.get("GENERATE_OUTPUT_FILE", "training_data_llm_v11.csv")
 MODEL_NAME = "gpt-4o"
 API_TEMPERATURE = 0.4 # Lower temperature for more deterministic, logical output
+# Stream completions and parse/validate each row as soon as it arrives (see llm_stream.py)
+STREAM_RESPONSES = True
+# --- Token Budget ---
+# Prompt families to rotate through ('cot' = per-row reasoning, 'compact' = CSV lines only).
+# Listing both compares their cost and throughput in the report at the end of the run.
+PROMPT_VARIANTS_TO_USE = ["cot"]
+ADAPTIVE_BATCH_SIZE = True # Tune the batch size per prompt family (see generation_budget.py)
+BATCH_SIZE_OBJECTIVE = "tokens" # Maximize accepted rows per token ('tokens') or per second ('throughput')
+# Batches per round, sent concurrently; the prompt mix of each round is planned jointly for
+# all target distributions (see batch_scheduler.py)
+MAX_CONCURRENT_BATCHES = 4
 
 # --- Define Allowed Categorical Values ---
 ALLOWED_SORT_BY = ["Title", "Status", "Priority", "DueDate", "CreationDate", "none"]
@@ -104,34 +124,90 @@ Reasoning Step 3: Logical Label Assignment. The persona is for visual management
 Final CSV Output: 70,10,25,25,10,10,25,15,10,10,2,Feature,Hoch,Zu Erledigen,kanban,none,none
 """
 
-MASTER_PROMPT_V2 = f"""
-{BASE_GENERATION_INSTRUCTIONS}
----
+# --- Compact Prompt Family (no per-row reasoning) ---
+# The Chain-of-Thought prompt spends most of its output tokens on reasoning text that is thrown
+# away. This variant keeps the same rules and personas in condensed form and asks for the CSV
+# lines only, so a row costs a fraction of the tokens. Rows are still prefixed with
+# "Final CSV Output: " so both families go through the same parser and validation.
+COMPACT_GENERATION_INSTRUCTIONS = f"""
+You create synthetic rows describing task boards and the view/filters their user wants.
+Output ONLY CSV lines, each prefixed with "Final CSV Output: ". No header, no reasoning, no other text.
 
-Generate {BATCH_SIZE} rows of CSV data now, following the Chain-of-Thought process for EACH row.
+Columns (in order):
+number_of_tasks,num_critical_open,num_high_open,num_medium_open,num_low_open,num_pending,num_todo,num_inprogress,num_done,num_blocked,overdue_tasks,last_task_created_label,last_task_created_priority,last_task_created_status,predicted_view,predicted_status_filter,predicted_priority_filter
+
+Values: labels {ALLOWED_LABELS}; priorities {ALLOWED_PRIORITIES}; statuses {ALLOWED_STATUSES}; view 'list'/'kanban'; filters are a status/priority or 'none'.
+Rules: number_of_tasks spread evenly over 1-100; open priority counts sum <= number_of_tasks; status counts sum == number_of_tasks; overdue_tasks <= number_of_tasks; kanban => both filters 'none'; number_of_tasks < 5 => list, none, none.
+
+Personas (features -> view, status filter, priority filter); vary the persona from row to row:
+1. Major Fire: high overdue or critical -> list, Zu Erledigen, Kritisch
+2. Minor Fire: moderate overdue or many high -> list, In Bearbeitung, Hoch
+3. Blocker Analyst: many blocked -> list, Blockiert, Hoch
+4. Bug Hunter: last label Bug -> list, Zu Erledigen, priority of that bug
+5. Kick-off Manager: many pending -> list, Start ausstehend, none
+6. Backlog Groomer: many low, last priority Niedrig -> list, none, Niedrig
+7. Structured Planner: healthy, many done -> list, none, none
+8. Kanban Planner: 3+ statuses with similar counts (excluding done), few high/critical -> kanban, none, none
+9. Ambiguous Manager: mixed signals -> list, none, none
+
+Examples:
+Final CSV Output: 39,12,14,9,4,3,17,13,3,3,8,Bug,Kritisch,In Bearbeitung,list,Zu Erledigen,Kritisch
+Final CSV Output: 70,10,25,25,10,10,25,15,10,10,2,Feature,Hoch,Zu Erledigen,kanban,none,none
 """
 
+# Instruction block and closing request per prompt family
+PROMPT_VARIANTS = {
+    'cot': (BASE_GENERATION_INSTRUCTIONS, "Generate {batch_size} rows of CSV data now, following the Chain-of-Thought process for EACH row."),
+    'compact': (COMPACT_GENERATION_INSTRUCTIONS, "Generate {batch_size} rows now."),
+}
+
 # --- Pillar 3: Targeted Infill Prompts for Distribution Control ---
-# Each infill prompt now includes the FULL context from the base instructions.
-INFILL_PROMPTS = {
-    'kanban': f"Your primary goal is to generate data for 'The Kanban Planner' persona. `predicted_view` MUST be 'kanban'.\n\n{BASE_GENERATION_INSTRUCTIONS}\n---\nGenerate {BATCH_SIZE} rows now.",
-    'Blockiert': f"Your primary goal is to generate data for the 'Blocker Analyst' persona. `predicted_status_filter` MUST be 'Blockiert'.\n\n{BASE_GENERATION_INSTRUCTIONS}\n---\nGenerate {BATCH_SIZE} rows now.",
-    'Start ausstehend': f"Your primary goal is to generate data for 'The Kick-off Manager' persona. `predicted_status_filter` MUST be 'Start ausstehend'.\n\n{BASE_GENERATION_INSTRUCTIONS}\n---\nGenerate {BATCH_SIZE} rows now.",
-    'Niedrig': f"Your primary goal is to generate data for 'The Backlog Groomer' persona. `predicted_priority_filter` MUST be 'Niedrig'.\n\n{BASE_GENERATION_INSTRUCTIONS}\n---\nGenerate {BATCH_SIZE} rows now."
+# Each infill prompt prepends its goal to the FULL instructions of the chosen prompt family.
+# Every filter class has one, so the scheduler can target any class that falls behind.
+INFILL_GOALS = {
+    'kanban': "Your primary goal is to generate data for 'The Kanban Planner' persona. `predicted_view` MUST be 'kanban'.",
+    'Zu Erledigen': "Your primary goal is to generate data for the 'Crisis Manager: Major Fire' and 'Bug Hunter' personas. `predicted_status_filter` MUST be 'Zu Erledigen'.",
+    'In Bearbeitung': "Your primary goal is to generate data for the 'Crisis Manager: Minor Fire' persona. `predicted_status_filter` MUST be 'In Bearbeitung'.",
+    'Blockiert': "Your primary goal is to generate data for the 'Blocker Analyst' persona. `predicted_status_filter` MUST be 'Blockiert'.",
+    'Start ausstehend': "Your primary goal is to generate data for 'The Kick-off Manager' persona. `predicted_status_filter` MUST be 'Start ausstehend'.",
+    'Erledigt': "Your primary goal is to generate data for a user reviewing finished work: most tasks are done (num_done is the largest status count) and few are open. `predicted_view` MUST be 'list' and `predicted_status_filter` MUST be 'Erledigt'.",
+    'Kritisch': "Your primary goal is to generate data for the 'Crisis Manager: Major Fire' persona. `predicted_priority_filter` MUST be 'Kritisch'.",
+    'Hoch': "Your primary goal is to generate data for the 'Crisis Manager: Minor Fire' and 'Blocker Analyst' personas. `predicted_priority_filter` MUST be 'Hoch'.",
+    'Mittel': "Your primary goal is to generate data for a user working through routine tasks: many medium-priority open tasks and last_task_created_priority 'Mittel'. `predicted_view` MUST be 'list' and `predicted_priority_filter` MUST be 'Mittel'.",
+    'Niedrig': "Your primary goal is to generate data for 'The Backlog Groomer' persona. `predicted_priority_filter` MUST be 'Niedrig'."
 }
 
+def build_prompt(variant, batch_size, target_class=None):
+    """Master prompt (or the infill prompt for target_class) of a prompt family for batch_size rows."""
+    instructions, request = PROMPT_VARIANTS[variant]
+    request = request.format(batch_size=batch_size)
+    if target_class is not None:
+        return f"{INFILL_GOALS[target_class]}\n\n{instructions}\n---\n{request}"
+    return f"\n{instructions}\n---\n\n{request}\n"
+
+def build_messages(prompt):
+    return [
+        {"role": "system", "content": "You are a helpful assistant designed to output structured CSV data."},
+        {"role": "user", "content": prompt}
+    ]
+
 def generate_data_batch(prompt):
-    """Generates a batch of data using the specified prompt and temperature."""
+    """Generates a batch of data using the specified prompt and temperature; returns (text, usage)."""
     try:
         completion = client.chat.completions.create(
             model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant designed to output structured CSV data."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_messages(prompt),
             temperature=API_TEMPERATURE
         )
-        return completion.choices[0].message.content
+        return completion.choices[0].message.content, completion.usage
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None, None
+
+def generate_data_batch_streaming(prompt, on_row, should_stop):
+    """Streams a batch, passing every 'Final CSV Output:' row to on_row as soon as its line is complete."""
+    try:
+        return stream_completion(client, MODEL_NAME, build_messages(prompt), API_TEMPERATURE, on_row, should_stop)
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
@@ -197,7 +273,7 @@ def validate_and_process_df(df, column_names):
     
     # Structural Features
     status_pct_cols = ['pct_pending_status', 'pct_todo_status', 'pct_in_progress_status', 'pct_done_status', 'pct_blocked_status']
-    df['status_entropy'] = df[status_pct_cols].apply(lambda x: entropy(x[x>0]), axis=1).fillna(0)
+    df['status_entropy'] = status_entropy(df[status_pct_cols].to_numpy())
     df['number_of_statuses_used'] = (df[status_counts] > 0).sum(axis=1)
 
     # Event-Based Features
@@ -207,8 +283,6 @@ def validate_and_process_df(df, column_names):
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    all_data_df = pd.DataFrame()
-
     llm_column_names = [
         'number_of_tasks','num_critical_open','num_high_open','num_medium_open','num_low_open',
         'num_pending','num_todo','num_inprogress','num_done','num_blocked',
@@ -218,56 +292,133 @@ if __name__ == "__main__":
     ]
 
     print(f"Starting data generation for {NUM_ROWS_TO_GENERATE} rows with deterministic balancing...")
-    while len(all_data_df) < NUM_ROWS_TO_GENERATE:
-        
-        # --- Pillar 3: Deterministic Distribution Control Loop ---
-        prompt_to_use = MASTER_PROMPT_V2
-        prompt_reason = "default diverse persona prompt"
-        
-        if not all_data_df.empty:
-            deficits = {}
-            for target_col, targets in TARGET_DISTRIBUTIONS.items():
-                current_counts = all_data_df[target_col].value_counts(normalize=True)
-                for class_name, target_prop in targets.items():
-                    current_prop = current_counts.get(class_name, 0)
-                    if current_prop < target_prop:
-                        deficits[class_name] = target_prop - current_prop
-            
-            if deficits:
-                # Find the class with the largest proportional deficit
-                most_needed_class = max(deficits, key=deficits.get)
-                if most_needed_class in INFILL_PROMPTS:
-                    prompt_to_use = INFILL_PROMPTS[most_needed_class]
-                    prompt_reason = f"targeted infill for '{most_needed_class}'"
-
-        print(f"Current rows: {len(all_data_df)}/{NUM_ROWS_TO_GENERATE}. Requesting batch using: {prompt_reason}...")
-        raw_response = generate_data_batch(prompt_to_use)
-
-        if raw_response:
-            # Robust parsing for CoT output: find all "Final CSV Output:..." lines
-            csv_lines = re.findall(r"Final CSV Output:\s*(.*)", raw_response)
-            
-            if csv_lines:
-                valid_csv_data = "\n".join(csv_lines)
-                data_io = StringIO(valid_csv_data)
+    accepted_batches = []
+    balance = ClassBalance(TARGET_DISTRIBUTIONS)
+    dedup = RowDeduplicator()
+    budget = GenerationBudget()
+    batch_sizers = {variant: AdaptiveBatchSizer(BATCH_SIZE, BATCH_SIZE_OBJECTIVE) for variant in PROMPT_VARIANTS_TO_USE}
+    scheduler = JointQuotaScheduler(TARGET_DISTRIBUTIONS, INFILL_GOALS, NUM_ROWS_TO_GENERATE)
+    # Batches of a round run in threads; all shared state is updated under this lock
+    state_lock = threading.Lock()
+    batch_number = 0
+
+    def accept_rows(processed_df, prompt_key, batch_counts):
+        with state_lock:
+            processed_df = dedup.filter(processed_df, prompt_key)
+            if not processed_df.empty:
+                accepted_batches.append(processed_df)
+                balance.add(processed_df)
+                for target in TARGET_DISTRIBUTIONS:
+                    batch_counts[target].update(processed_df[target].astype(str))
+
+    def run_batch(variant, batch_size, target_class):
+        """Requests one batch and accepts its rows; returns (usage or None, accepted class counts per target)."""
+        prompt_to_use = build_prompt(variant, batch_size, target_class)
+        prompt_key = f"{variant}: {target_class or 'master'}"
+        batch_counts = {target: Counter() for target in TARGET_DISTRIBUTIONS}
+        usage = None
+        if STREAM_RESPONSES:
+            def accept_row(csv_text):
                 try:
-                    batch_df = pd.read_csv(data_io, header=None)
-                    if batch_df.shape[1] == len(llm_column_names):
-                        processed_df = validate_and_process_df(batch_df.copy(), llm_column_names)
-                        all_data_df = pd.concat([all_data_df, processed_df], ignore_index=True)
-                        print(f" ... successfully processed and added {len(processed_df)} rows.")
-                    else:
-                        print(f" ... ERROR: Batch has incorrect column count ({batch_df.shape[1]}). Discarding.")
+                    row_df = parse_csv_row(csv_text, llm_column_names)
+                    if row_df is None:
+                        print(" ... ERROR: Row has incorrect column count. Discarding.")
+                        return
+                    accept_rows(validate_and_process_df(row_df, llm_column_names), prompt_key, batch_counts)
                 except Exception as e:
-                    print(f" ... ERROR: Failed to parse or process batch. Error: {e}")
+                    print(f" ... ERROR: Failed to parse or process row. Error: {e}")
+
+            def batch_no_longer_needed():
+                # Stop once enough rows exist or the quota of the class this infill batch was for is filled
+                if balance.total >= NUM_ROWS_TO_GENERATE:
+                    return True
+                return target_class is not None and scheduler.quota_reached(balance.counts, target_class)
+
+            result = generate_data_batch_streaming(prompt_to_use, accept_row, batch_no_longer_needed)
+            if result:
+                stopped = " (stream stopped early)" if result['aborted'] else ""
+                accepted = sum(batch_counts['predicted_view'].values())
+                print(f" ... [{prompt_key}] added {accepted} of {result['rows_seen']} rows in {result['elapsed']:.1f}s{stopped}.")
+                usage = result
             else:
-                print(" ... ERROR: Could not find any 'Final CSV Output:' lines in the response.")
+                print(f" ... [{prompt_key}] batch generation failed.")
         else:
-            print(" ... batch generation failed.")
-
-        time.sleep(3) # Be kind to the API
-
-    all_data_df = all_data_df.head(NUM_ROWS_TO_GENERATE)
+            request_start = time.perf_counter()
+            raw_response, response_usage = generate_data_batch(prompt_to_use)
+
+            if raw_response:
+                # Robust parsing for CoT output: find all "Final CSV Output:..." lines
+                csv_lines = re.findall(r"Final CSV Output:\s*(.*)", raw_response)
+                usage = {
+                    'rows_seen': len(csv_lines),
+                    'elapsed': time.perf_counter() - request_start,
+                    'prompt_tokens': response_usage.prompt_tokens,
+                    'completion_tokens': response_usage.completion_tokens,
+                    'aborted': False,
+                }
+
+                if csv_lines:
+                    valid_csv_data = "\n".join(csv_lines)
+                    data_io = StringIO(valid_csv_data)
+                    try:
+                        batch_df = pd.read_csv(data_io, header=None)
+                        if batch_df.shape[1] == len(llm_column_names):
+                            processed_df = validate_and_process_df(batch_df.copy(), llm_column_names)
+                            accept_rows(processed_df, prompt_key, batch_counts)
+                            print(f" ... [{prompt_key}] successfully processed and added {sum(batch_counts['predicted_view'].values())} rows.")
+                        else:
+                            print(f" ... ERROR: Batch has incorrect column count ({batch_df.shape[1]}). Discarding.")
+                    except Exception as e:
+                        print(f" ... ERROR: Failed to parse or process batch. Error: {e}")
+                else:
+                    print(" ... ERROR: Could not find any 'Final CSV Output:' lines in the response.")
+            else:
+                print(f" ... [{prompt_key}] batch generation failed.")
+        return usage, batch_counts
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as pool:
+        while balance.total < NUM_ROWS_TO_GENERATE:
+
+            # --- Pillar 3: Joint distribution control, one round of concurrent batches ---
+            with state_lock:
+                variant = PROMPT_VARIANTS_TO_USE[batch_number % len(PROMPT_VARIANTS_TO_USE)]
+                planning_size = batch_sizers[variant].next_size() if ADAPTIVE_BATCH_SIZE else BATCH_SIZE
+                round_prompts = scheduler.next_round(balance.counts, balance.total, planning_size, MAX_CONCURRENT_BATCHES)
+
+            # --- Token Budget: prompt family and batch size per batch ---
+            batches = []
+            for prompt in round_prompts:
+                variant = PROMPT_VARIANTS_TO_USE[batch_number % len(PROMPT_VARIANTS_TO_USE)]
+                batch_number += 1
+                batch_size = batch_sizers[variant].next_size() if ADAPTIVE_BATCH_SIZE else BATCH_SIZE
+                target_class = None if prompt == MASTER_PROMPT else prompt
+                batches.append((prompt, variant, batch_size, pool.submit(run_batch, variant, batch_size, target_class)))
+
+            plan_text = ", ".join(f"{batch_size} '{variant}' rows for {prompt}" for prompt, variant, batch_size, _ in batches)
+            print(f"Current rows: {balance.total}/{NUM_ROWS_TO_GENERATE}. Requesting {plan_text}...")
+
+            for prompt, variant, batch_size, future in batches:
+                usage, batch_counts = future.result()
+                with state_lock:
+                    rows_accepted = sum(batch_counts['predicted_view'].values())
+                    if not usage:
+                        scheduler.record(prompt, 0, batch_counts)
+                        continue
+                    # Rows the stream was stopped before count as not requested
+                    scheduler.record(prompt, usage['rows_seen'] if usage['aborted'] else batch_size, batch_counts)
+                    tokens = (usage['prompt_tokens'], usage['completion_tokens'], usage['elapsed'])
+                    budget.record(variant, batch_size, usage['rows_seen'], rows_accepted, *tokens)
+                    batch_sizers[variant].record(batch_size, usage['rows_seen'], rows_accepted, *tokens)
+                print(f" ... [{prompt}] tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion"
+                      f"{' (estimated)' if usage.get('usage_estimated') else ''}.")
+
+            time.sleep(3) # Be kind to the API
+
+    scheduler.print_report()
+    budget.print_report()
+    dedup.print_report()
+
+    all_data_df = pd.concat(accepted_batches, ignore_index=True).head(NUM_ROWS_TO_GENERATE)
 
     # Define the final column order, now including the new engineered features
     final_column_order = [
@@ -6,7 +6,10 @@ from io import StringIO
 from dotenv import load_dotenv
 import numpy as np
 import re
-from scipy.stats import entropy
+from feature_engineering import status_entropy
+from llm_stream import stream_completion, parse_csv_row
+from class_balance import ClassBalance
+from row_dedup import RowDeduplicator
 
 # --- Configuration ---
 load_dotenv()
@@ -15,10 +18,12 @@ client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 NUM_ROWS_TO_GENERATE = 750
 BATCH_SIZE = 10
 # MODIFIED: New output file for the noisy data
-OUTPUT_FILE = "training_data_llm_v8_noisy.csv"
+OUTPUT_FILE = os.environ.get("GENERATE_OUTPUT_FILE", "training_data_llm_v8_noisy.csv")
 MODEL_NAME = "gpt-4o"
 # MODIFIED: Higher temperature for more variability
 API_TEMPERATURE = 0.7
+# Stream completions and parse/validate each row as soon as it arrives (see llm_stream.py)
+STREAM_RESPONSES = True
 
 # --- Define Allowed Categorical Values ---
 ALLOWED_SORT_BY = ["Title", "Status", "Priority", "DueDate", "CreationDate", "none"]
@@ -113,15 +118,18 @@ INFILL_PROMPTS = {
 }
 
 # The rest of the script (functions and main loop) remains the same as before.
+def build_messages(prompt):
+    return [
+        {"role": "system", "content": "You are a helpful assistant designed to output structured CSV data with realistic variations."},
+        {"role": "user", "content": prompt}
+    ]
+
 def generate_data_batch(prompt):
     """Generates a batch of data using the specified prompt and temperature."""
     try:
         completion = client.chat.completions.create(
             model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant designed to output structured CSV data with realistic variations."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_messages(prompt),
             temperature=API_TEMPERATURE
         )
         return completion.choices[0].message.content
@@ -129,6 +137,14 @@ def generate_data_batch(prompt):
         print(f"An error occurred: {e}")
         return None
 
+def generate_data_batch_streaming(prompt, on_row, should_stop):
+    """Streams a batch, passing every 'Final CSV Output:' row to on_row as soon as its line is complete."""
+    try:
+        return stream_completion(client, MODEL_NAME, build_messages(prompt), API_TEMPERATURE, on_row, should_stop)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
 def validate_and_process_df(df, column_names):
     """Performs validation, cleaning, and ADVANCED feature calculation."""
     df.columns = column_names
@@ -177,13 +193,12 @@ def validate_and_process_df(df, column_names):
     df['wip_load'] = (df['num_inprogress'] / num_open_tasks_safe).fillna(0)
     df['health_score'] = (0.5 * df['pct_overdue']) + (0.3 * df['pct_blocked_status']) + (0.2 * df['pct_critical_open'])
     status_pct_cols = ['pct_pending_status', 'pct_todo_status', 'pct_in_progress_status', 'pct_done_status', 'pct_blocked_status']
-    df['status_entropy'] = df[status_pct_cols].apply(lambda x: entropy(x[x>0]), axis=1).fillna(0)
+    df['status_entropy'] = status_entropy(df[status_pct_cols].to_numpy())
     df['number_of_statuses_used'] = (df[status_counts] > 0).sum(axis=1)
     df['last_action_critical_bug'] = ((df['last_task_created_label'] == 'Bug') & (df['last_task_created_priority'] == 'Kritisch')).astype(int)
     return df
 
 if __name__ == "__main__":
-    all_data_df = pd.DataFrame()
     llm_column_names = [
         'number_of_tasks','num_critical_open','num_high_open','num_medium_open','num_low_open',
         'num_pending','num_todo','num_inprogress','num_done','num_blocked',
@@ -192,45 +207,72 @@ if __name__ == "__main__":
         'predicted_view','predicted_status_filter','predicted_priority_filter'
     ]
     print(f"Starting NOISY data generation for {NUM_ROWS_TO_GENERATE} rows...")
-    while len(all_data_df) < NUM_ROWS_TO_GENERATE:
+    accepted_batches = []
+    balance = ClassBalance(TARGET_DISTRIBUTIONS)
+    dedup = RowDeduplicator()
+    def accept_rows(processed_df, prompt_key):
+        processed_df = dedup.filter(processed_df, prompt_key)
+        if not processed_df.empty:
+            accepted_batches.append(processed_df)
+            balance.add(processed_df)
+    while balance.total < NUM_ROWS_TO_GENERATE:
         prompt_to_use = MASTER_PROMPT_V2
         prompt_reason = "default diverse (noisy) persona prompt"
-        if not all_data_df.empty:
-            deficits = {}
-            for target_col, targets in TARGET_DISTRIBUTIONS.items():
-                current_counts = all_data_df[target_col].value_counts(normalize=True)
-                for class_name, target_prop in targets.items():
-                    current_prop = current_counts.get(class_name, 0)
-                    if current_prop < target_prop:
-                        deficits[class_name] = target_prop - current_prop
-            if deficits:
-                most_needed_class = max(deficits, key=deficits.get)
-                if most_needed_class in INFILL_PROMPTS:
-                    prompt_to_use = INFILL_PROMPTS[most_needed_class]
-                    prompt_reason = f"targeted infill for '{most_needed_class}'"
-        print(f"Current rows: {len(all_data_df)}/{NUM_ROWS_TO_GENERATE}. Requesting batch using: {prompt_reason}...")
-        raw_response = generate_data_batch(prompt_to_use)
-        if raw_response:
-            csv_lines = re.findall(r"Final CSV Output:\s*(.*)", raw_response)
-            if csv_lines:
-                valid_csv_data = "\n".join(csv_lines)
-                data_io = StringIO(valid_csv_data)
+        target_class = None
+        deficits = balance.deficits()
+        if deficits:
+            most_needed_class = max(deficits, key=deficits.get)
+            if most_needed_class in INFILL_PROMPTS:
+                prompt_to_use = INFILL_PROMPTS[most_needed_class]
+                prompt_reason = f"targeted infill for '{most_needed_class}'"
+                target_class = most_needed_class
+        print(f"Current rows: {balance.total}/{NUM_ROWS_TO_GENERATE}. Requesting batch using: {prompt_reason}...")
+        prompt_key = target_class or 'master'
+        rows_before = balance.total
+        if STREAM_RESPONSES:
+            def accept_row(csv_text):
                 try:
-                    batch_df = pd.read_csv(data_io, header=None)
-                    if batch_df.shape[1] == len(llm_column_names):
-                        processed_df = validate_and_process_df(batch_df.copy(), llm_column_names)
-                        all_data_df = pd.concat([all_data_df, processed_df], ignore_index=True)
-                        print(f" ... successfully processed and added {len(processed_df)} rows.")
-                    else:
-                        print(f" ... ERROR: Batch has incorrect column count ({batch_df.shape[1]}). Discarding.")
+                    row_df = parse_csv_row(csv_text, llm_column_names)
+                    if row_df is None:
+                        print(" ... ERROR: Row has incorrect column count. Discarding.")
+                        return
+                    accept_rows(validate_and_process_df(row_df, llm_column_names), prompt_key)
                 except Exception as e:
-                    print(f" ... ERROR: Failed to parse or process batch. Error: {e}")
+                    print(f" ... ERROR: Failed to parse or process row. Error: {e}")
+            def batch_no_longer_needed():
+                if balance.total >= NUM_ROWS_TO_GENERATE:
+                    return True
+                return target_class is not None and not balance.has_deficit(target_class)
+            result = generate_data_batch_streaming(prompt_to_use, accept_row, batch_no_longer_needed)
+            if result:
+                stopped = " (stream stopped early)" if result['aborted'] else ""
+                print(f" ... added {balance.total - rows_before} of {result['rows_seen']} rows in {result['elapsed']:.1f}s{stopped}.")
             else:
-                print(" ... ERROR: Could not find any 'Final CSV Output:' lines in the response.")
+                print(" ... batch generation failed.")
         else:
-            print(" ... batch generation failed.")
+            raw_response = generate_data_batch(prompt_to_use)
+            if raw_response:
+                csv_lines = re.findall(r"Final CSV Output:\s*(.*)", raw_response)
+                if csv_lines:
+                    valid_csv_data = "\n".join(csv_lines)
+                    data_io = StringIO(valid_csv_data)
+                    try:
+                        batch_df = pd.read_csv(data_io, header=None)
+                        if batch_df.shape[1] == len(llm_column_names):
+                            processed_df = validate_and_process_df(batch_df.copy(), llm_column_names)
+                            accept_rows(processed_df, prompt_key)
+                            print(f" ... successfully processed and added {balance.total - rows_before} rows.")
+                        else:
+                            print(f" ... ERROR: Batch has incorrect column count ({batch_df.shape[1]}). Discarding.")
+                    except Exception as e:
+                        print(f" ... ERROR: Failed to parse or process batch. Error: {e}")
+                else:
+                    print(" ... ERROR: Could not find any 'Final CSV Output:' lines in the response.")
+            else:
+                print(" ... batch generation failed.")
         time.sleep(3)
-    all_data_df = all_data_df.head(NUM_ROWS_TO_GENERATE)
+    dedup.print_report()
+    all_data_df = pd.concat(accepted_batches, ignore_index=True).head(NUM_ROWS_TO_GENERATE)
     final_column_order = [
         'number_of_tasks',
         'overdue_tasks', 'pct_overdue', 'due_today', 'time_of_day',
@@ -0,0 +1,159 @@
+import math
+from collections import defaultdict
+
+# --- Token Budget Accounting and Adaptive Batch Sizing ---
+# Every generation request pays for the full instruction block once plus a number of output
+# tokens per row, and only the rows that pass validation are worth anything. The tracker
+# below records prompt/completion tokens, wall time and accepted rows per prompt variant, so
+# variants can be compared by cost and throughput per thousand usable rows.
+#
+# The batch sizer picks the next batch size per variant: larger batches spread the prompt
+# over more rows, but long completions drift (more rejected rows, more rows generated after
+# the deficit was already filled) and must fit the model's output limit.
+
+# Prices in USD per 1M tokens (gpt-4o list prices); only used for the report
+PROMPT_TOKEN_PRICE = 2.50
+COMPLETION_TOKEN_PRICE = 10.00
+
+MAX_OUTPUT_TOKENS = 16384   # Output limit of the generation model
+OUTPUT_TOKEN_HEADROOM = 0.8 # Only plan batches up to this share of the output limit
+MIN_BATCH_SIZE = 5
+MAX_BATCH_SIZE = 100
+BATCH_SIZE_STEP = 1.5       # Factor between neighbouring batch sizes the sizer tries
+MIN_TRIALS_PER_SIZE = 2     # Batches per size before its measurements are trusted
+EWMA_ALPHA = 0.3            # Weight of the newest batch in the tokens-per-row estimate
+
+
+def batch_cost(prompt_tokens, completion_tokens):
+    """Cost in USD of a request with the given token usage."""
+    return (prompt_tokens * PROMPT_TOKEN_PRICE + completion_tokens * COMPLETION_TOKEN_PRICE) / 1_000_000
+
+
+class _Totals:
+    def __init__(self):
+        self.batches = 0
+        self.rows_requested = 0
+        self.rows_seen = 0
+        self.rows_accepted = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.elapsed = 0.0
+
+    def add(self, rows_requested, rows_seen, rows_accepted, prompt_tokens, completion_tokens, elapsed):
+        self.batches += 1
+        self.rows_requested += rows_requested
+        self.rows_seen += rows_seen
+        self.rows_accepted += rows_accepted
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.elapsed += elapsed
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def rows_per_token(self):
+        return self.rows_accepted / self.tokens if self.tokens else 0.0
+
+    def rows_per_second(self):
+        return self.rows_accepted / self.elapsed if self.elapsed else 0.0
+
+
+class GenerationBudget:
+    """Token, time and acceptance totals per prompt variant."""
+
+    def __init__(self):
+        self.variants = defaultdict(_Totals)
+
+    def record(self, variant, rows_requested, rows_seen, rows_accepted, prompt_tokens, completion_tokens, elapsed):
+        self.variants[variant].add(rows_requested, rows_seen, rows_accepted, prompt_tokens, completion_tokens, elapsed)
+
+    def report(self):
+        """Per-variant summary rows (dicts) with cost and throughput per 1000 accepted rows."""
+        rows = []
+        for variant, totals in sorted(self.variants.items()):
+            cost = batch_cost(totals.prompt_tokens, totals.completion_tokens)
+            accepted = totals.rows_accepted
+            rows.append({
+                'variant': variant,
+                'batches': totals.batches,
+                'rows_accepted': accepted,
+                'acceptance_rate': accepted / totals.rows_seen if totals.rows_seen else 0.0,
+                'prompt_tokens': totals.prompt_tokens,
+                'completion_tokens': totals.completion_tokens,
+                'tokens_per_row': totals.tokens / accepted if accepted else math.inf,
+                'rows_per_second': totals.rows_per_second(),
+                'cost_usd': cost,
+                'cost_per_1000_rows': 1000 * cost / accepted if accepted else math.inf,
+                'seconds_per_1000_rows': 1000 * totals.elapsed / accepted if accepted else math.inf,
+            })
+        return rows
+
+    def print_report(self):
+        print("\n--- Generation Cost and Throughput per Prompt Variant ---")
+        print(f"{'variant':<12}{'batches':>8}{'rows':>7}{'accept':>8}{'tok/row':>9}{'rows/s':>8}{'USD':>8}{'USD/1k':>8}{'s/1k':>8}")
+        for row in self.report():
+            print(f"{row['variant']:<12}{row['batches']:>8}{row['rows_accepted']:>7}{row['acceptance_rate']:>8.1%}"
+                  f"{row['tokens_per_row']:>9.0f}{row['rows_per_second']:>8.2f}{row['cost_usd']:>8.3f}"
+                  f"{row['cost_per_1000_rows']:>8.2f}{row['seconds_per_1000_rows']:>8.0f}")
+
+
+class AdaptiveBatchSizer:
+    """
+    Hill-climbing batch size for one prompt variant.
+
+    Sizes form a geometric grid between MIN_BATCH_SIZE and MAX_BATCH_SIZE. Each size keeps
+    its own totals; the score of a size is accepted rows per token, or per second with
+    objective='throughput'. The sizer stays on the best measured size and tries the next
+    larger (or smaller) neighbour until it has MIN_TRIALS_PER_SIZE batches of evidence.
+    Sizes whose expected completion would exceed the output limit are never proposed.
+    """
+
+    def __init__(self, initial_size, objective='tokens', max_output_tokens=MAX_OUTPUT_TOKENS):
+        if objective not in ('tokens', 'throughput'):
+            raise ValueError(f"Unknown batch size objective: {objective}")
+        self.objective = objective
+        self.max_output_tokens = max_output_tokens
+        self.sizes = [MIN_BATCH_SIZE]
+        while self.sizes[-1] < MAX_BATCH_SIZE:
+            self.sizes.append(min(MAX_BATCH_SIZE, max(self.sizes[-1] + 1, round(self.sizes[-1] * BATCH_SIZE_STEP))))
+        self.current = min(self.sizes, key=lambda size: abs(size - initial_size))
+        self.totals = defaultdict(_Totals)
+        self.completion_tokens_per_row = None
+
+    def _score(self, size):
+        totals = self.totals[size]
+        return totals.rows_per_token() if self.objective == 'tokens' else totals.rows_per_second()
+
+    def max_size(self):
+        """Largest batch whose expected completion fits into the usable output budget."""
+        if not self.completion_tokens_per_row:
+            return MAX_BATCH_SIZE
+        return max(MIN_BATCH_SIZE, int(self.max_output_tokens * OUTPUT_TOKEN_HEADROOM / self.completion_tokens_per_row))
+
+    def record(self, batch_size, rows_seen, rows_accepted, prompt_tokens, completion_tokens, elapsed):
+        if rows_seen:
+            per_row = completion_tokens / rows_seen
+            if self.completion_tokens_per_row is None:
+                self.completion_tokens_per_row = per_row
+            else:
+                self.completion_tokens_per_row += EWMA_ALPHA * (per_row - self.completion_tokens_per_row)
+        self.totals[batch_size].add(batch_size, rows_seen, rows_accepted, prompt_tokens, completion_tokens, elapsed)
+
+    def next_size(self):
+        allowed = [size for size in self.sizes if size <= self.max_size()]
+        if self.current not in allowed:
+            self.current = allowed[-1]
+        if self.totals[self.current].batches < MIN_TRIALS_PER_SIZE:
+            return self.current
+
+        measured = [size for size in allowed if self.totals[size].batches >= MIN_TRIALS_PER_SIZE]
+        best = max(measured, key=self._score)
+        index = allowed.index(best)
+        # Explore the untried neighbours of the best size, larger first (it amortizes the prompt)
+        for neighbour in allowed[index + 1:index + 2] + allowed[max(0, index - 1):index]:
+            if self.totals[neighbour].batches < MIN_TRIALS_PER_SIZE:
+                self.current = neighbour
+                return neighbour
+        self.current = best
+        return best
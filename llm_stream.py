@@ -0,0 +1,110 @@
+import re
+import time
+from io import StringIO
+import pandas as pd
+
+# --- Streaming Parser for Chain-of-Thought Generations ---
+# The generators ask for reasoning text followed by one "Final CSV Output: ..." line per row.
+# Instead of waiting for the whole completion, the response is streamed and every CSV row is
+# parsed and validated as soon as its line is complete, so counters update while the model is
+# still writing and a stream can be aborted once the rows it was asked for are no longer needed.
+#
+# The OpenAI client honours OPENAI_BASE_URL, so the streaming path can be exercised against a
+# local fake server that replays a canned completion as server-sent events.
+
+FINAL_CSV_PATTERN = re.compile(r"Final CSV Output:\s*(.*)")
+CHARS_PER_TOKEN = 4  # Rough estimate used when the API doesn't report usage (aborted streams)
+
+
+class FinalCsvLineParser:
+    """Incremental line splitter that calls on_row(csv_text) for every completed 'Final CSV Output:' line."""
+
+    def __init__(self, on_row):
+        self.on_row = on_row
+        self._buffer = ""
+        self.rows_seen = 0
+
+    def _handle_line(self, line):
+        match = FINAL_CSV_PATTERN.search(line)
+        if match and match.group(1).strip():
+            self.rows_seen += 1
+            self.on_row(match.group(1).strip())
+
+    def feed(self, text):
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._handle_line(line)
+
+    def close(self):
+        """Handles a last line that wasn't terminated by a newline."""
+        if self._buffer:
+            self._handle_line(self._buffer)
+            self._buffer = ""
+
+
+def parse_csv_row(csv_text, column_names):
+    """Parses a single CSV line into a one-row DataFrame, or returns None if the column count is wrong."""
+    row_df = pd.read_csv(StringIO(csv_text), header=None, skipinitialspace=True)
+    if row_df.shape[1] != len(column_names):
+        return None
+    return row_df
+
+
+def stream_completion(client, model, messages, temperature, on_row, should_stop=None):
+    """
+    Streams a chat completion, passing every 'Final CSV Output:' row to on_row(csv_text).
+
+    should_stop() is checked after every completed row; when it returns True the stream is
+    closed early. Returns a dict with rows_seen, aborted, elapsed seconds and token usage
+    (prompt_tokens, completion_tokens; usage_estimated is True if the stream ended before
+    the API reported usage).
+    """
+    start = time.perf_counter()
+    stop_requested = False
+    usage = None
+    completion_chars = 0
+
+    def handle_row(csv_text):
+        nonlocal stop_requested
+        on_row(csv_text)
+        if should_stop is not None and should_stop():
+            stop_requested = True
+
+    parser = FinalCsvLineParser(handle_row)
+    stream = client.chat.completions.create(
+        model=model, messages=messages, temperature=temperature, stream=True,
+        stream_options={"include_usage": True}
+    )
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                completion_chars += len(delta)
+                parser.feed(delta)
+            if stop_requested:
+                break
+        else:
+            parser.close()
+    finally:
+        # Closing the response stops token generation (and billing) on the server side
+        stream.close()
+
+    if usage is not None:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+    else:
+        prompt_chars = sum(len(message['content']) for message in messages)
+        prompt_tokens, completion_tokens = prompt_chars // CHARS_PER_TOKEN, completion_chars // CHARS_PER_TOKEN
+
+    return {
+        'rows_seen': parser.rows_seen,
+        'aborted': stop_requested,
+        'elapsed': time.perf_counter() - start,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'usage_estimated': usage is None,
+    }
@@ -0,0 +1,224 @@
+import pickle
+import time
+import numpy as np
+
+# --- Post-training compression of the RandomForest pipelines ---
+# Every tree of a fitted forest is pruned and flattened into a few small numpy arrays:
+# - subtrees whose leaves all have the same class distribution are merged into one leaf
+#   (this keeps predict_proba unchanged up to float32 rounding),
+# - splits supported by fewer than `min_node_samples` training samples are collapsed into a
+#   leaf with the node's class distribution. This is what actually removes nodes (sklearn
+#   doesn't split pure nodes, so equal-distribution subtrees are rare) and it can change
+#   predictions; see compression_report and COMPRESSION_MIN_NODE_SAMPLES in train_model.py,
+# - thresholds are stored as float32, features and child indices in the smallest int type
+#   that fits (int16 for the forests we train today),
+# - only leaves keep a class distribution.
+# Prediction walks all trees for all samples at once, one tree level per numpy step.
+
+
+def _smallest_int_dtype(max_value):
+    """Smallest signed integer dtype that can hold values up to max_value."""
+    for dtype in (np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _float32_floor(thresholds):
+    """
+    Rounds float64 thresholds down to float32.
+
+    sklearn compares float32 inputs against float64 thresholds, so rounding down keeps
+    `x <= threshold` exactly equivalent for every float32 x.
+    """
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def _prune_tree(tree, min_node_samples=0):
+    """
+    Merges subtrees whose leaves all have the same class distribution and, if
+    min_node_samples is set, collapses nodes trained on fewer samples.
+
+    Returns the kept node ids in depth-first order and, for each of them, whether it
+    is a leaf in the pruned tree.
+    """
+    left, right = tree.children_left, tree.children_right
+    distribution = tree.value[:, 0, :] / tree.value[:, 0, :].sum(axis=1, keepdims=True)
+    collapsible = np.zeros(tree.node_count, dtype=bool)
+
+    # Children always have larger ids than their parent, so a reverse scan is post-order
+    for node in range(tree.node_count - 1, -1, -1):
+        if left[node] == -1 or tree.n_node_samples[node] < min_node_samples:
+            collapsible[node] = True
+        else:
+            collapsible[node] = (
+                collapsible[left[node]] and collapsible[right[node]]
+                and np.allclose(distribution[left[node]], distribution[node], rtol=0, atol=1e-9)
+                and np.allclose(distribution[right[node]], distribution[node], rtol=0, atol=1e-9)
+            )
+
+    kept, is_leaf = [], []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        kept.append(node)
+        leaf = bool(collapsible[node])
+        is_leaf.append(leaf)
+        if not leaf:
+            stack.append(right[node])
+            stack.append(left[node])
+    return np.asarray(kept), np.asarray(is_leaf)
+
+
+def _passthrough_columns(preprocessor):
+    """
+    Column list if the fitted ColumnTransformer only passes numerical columns through
+    (the case as long as no categorical features are selected), otherwise None.
+    """
+    if preprocessor.remainder != 'drop':
+        return None
+    columns = []
+    # The fitted transformers_ replace 'passthrough' with a FunctionTransformer, so check the spec
+    for _, transformer, transformer_columns in preprocessor.transformers:
+        if len(transformer_columns) == 0 or (isinstance(transformer, str) and transformer == 'drop'):
+            continue
+        if not (isinstance(transformer, str) and transformer == 'passthrough'):
+            return None
+        columns.extend(transformer_columns)
+    return columns
+
+
+class CompactForest:
+    """
+    A pruned, flattened copy of a fitted Pipeline(preprocessor, RandomForestClassifier).
+    A pipeline with a single DecisionTreeClassifier is treated as a forest of one tree.
+
+    Offers the parts of the pipeline API the server uses: predict, predict_proba,
+    classes_ and feature_names_in_.
+    """
+
+    def __init__(self, pipeline, merge_leaves=True, min_node_samples=0):
+        self.preprocessor = pipeline.named_steps['preprocessor']
+        self.passthrough_columns = _passthrough_columns(self.preprocessor)
+        forest = pipeline.named_steps['classifier']
+        self.classes_ = forest.classes_
+        self.feature_names_in_ = getattr(pipeline, 'feature_names_in_', None)
+        estimators = getattr(forest, 'estimators_', [forest])
+        self.n_trees = len(estimators)
+
+        features, thresholds, lefts, rights, leaf_slots, leaf_values, roots = [], [], [], [], [], [], []
+        offset, n_leaves, max_depth = 0, 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            if merge_leaves:
+                kept, is_leaf = _prune_tree(tree, min_node_samples)
+            else:
+                kept = np.arange(tree.node_count)
+                is_leaf = tree.children_left == -1
+
+            # Re-number the kept nodes; leaves point to themselves so traversal is branch-free
+            new_id = np.full(tree.node_count, -1, dtype=np.int64)
+            new_id[kept] = np.arange(len(kept)) + offset
+            own_id = new_id[kept]
+            left = np.where(is_leaf, own_id, new_id[tree.children_left[kept]])
+            right = np.where(is_leaf, own_id, new_id[tree.children_right[kept]])
+
+            slot = np.full(len(kept), -1, dtype=np.int64)
+            slot[is_leaf] = np.arange(is_leaf.sum()) + n_leaves
+            values = tree.value[kept[is_leaf], 0, :]
+            values = values / values.sum(axis=1, keepdims=True)
+
+            features.append(np.where(is_leaf, 0, tree.feature[kept]))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold[kept]))
+            lefts.append(left)
+            rights.append(right)
+            leaf_slots.append(slot)
+            leaf_values.append(values)
+            roots.append(offset)
+
+            offset += len(kept)
+            n_leaves += int(is_leaf.sum())
+            max_depth = max(max_depth, estimator.get_depth())
+
+        node_dtype = _smallest_int_dtype(offset)
+        self.feature = np.concatenate(features).astype(_smallest_int_dtype(forest.n_features_in_))
+        self.threshold = _float32_floor(np.concatenate(thresholds))
+        self.left = np.concatenate(lefts).astype(node_dtype)
+        self.right = np.concatenate(rights).astype(node_dtype)
+        self.leaf_slot = np.concatenate(leaf_slots).astype(_smallest_int_dtype(n_leaves))
+        self.leaf_value = np.concatenate(leaf_values).astype(np.float32)
+        self.roots = np.asarray(roots, dtype=node_dtype)
+        self.max_depth = max_depth
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def _transform(self, X):
+        if self.passthrough_columns is not None:
+            return np.asarray(X[self.passthrough_columns], dtype=np.float32)
+        return np.asarray(self.preprocessor.transform(X), dtype=np.float32)
+
+    def predict_proba(self, X):
+        """Average class distribution of the leaves reached in every tree."""
+        data = self._transform(X)
+        rows = np.arange(len(data))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(data), self.n_trees)).astype(np.int64)
+        for _ in range(self.max_depth):
+            go_left = data[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.leaf_value[self.leaf_slot[nodes]].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compress_pipeline(pipeline, merge_leaves=True, min_node_samples=0):
+    """Returns a CompactForest built from a fitted RandomForest pipeline."""
+    return CompactForest(pipeline, merge_leaves=merge_leaves, min_node_samples=min_node_samples)
+
+
+def _median_latency_ms(predict, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def compression_report(pipeline, compact, X_test, y_test, repeats=50):
+    """Compares size, inference latency and accuracy of the original and the compressed model."""
+    estimators = getattr(pipeline.named_steps['classifier'], 'estimators_', [pipeline.named_steps['classifier']])
+    single_row = X_test.iloc[[0]]
+    y_true = np.asarray(y_test)
+
+    original_pred = pipeline.predict(X_test)
+    compact_pred = compact.predict(X_test)
+    original_accuracy = float(np.mean(original_pred == y_true))
+    compact_accuracy = float(np.mean(compact_pred == y_true))
+
+    return {
+        'original_nodes': int(sum(est.tree_.node_count for est in estimators)),
+        'compact_nodes': compact.n_nodes,
+        'original_bytes': len(pickle.dumps(pipeline)),
+        'compact_bytes': len(pickle.dumps(compact)),
+        'original_latency_ms': _median_latency_ms(pipeline.predict_proba, single_row, repeats),
+        'compact_latency_ms': _median_latency_ms(compact.predict_proba, single_row, repeats),
+        'original_accuracy': original_accuracy,
+        'compact_accuracy': compact_accuracy,
+        'accuracy_delta': compact_accuracy - original_accuracy,
+        'prediction_agreement': float(np.mean(original_pred == compact_pred)),
+    }
+
+
+def print_compression_report(report):
+    print("\nCompression Report:")
+    print(f"  Nodes:     {report['original_nodes']} -> {report['compact_nodes']}")
+    print(f"  Size:      {report['original_bytes'] / 1024:.1f} KiB -> {report['compact_bytes'] / 1024:.1f} KiB")
+    print(f"  Latency:   {report['original_latency_ms']:.2f} ms -> {report['compact_latency_ms']:.2f} ms (single row)")
+    print(f"  Accuracy:  {report['original_accuracy']:.4f} -> {report['compact_accuracy']:.4f} "
+          f"(delta {report['accuracy_delta']:+.4f}, agreement {report['prediction_agreement']:.4f})")
@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import joblib
+from feature_engineering import load_feature_manifest
+
+# --- Per-Workspace Model Sets ---
+# Teams use the board differently, so a workspace can have its own models: a copy of the
+# train_model.py output (the three model files, optionally with a feature manifest) in
+# WORKSPACES_DIR/<workspace id>. Requests pick their workspace with WORKSPACE_HEADER;
+# without the header, for unknown workspaces or if a model set can't be loaded, the global
+# models are used.
+# - Model sets are loaded on first use and kept in an LRU cache bounded by MAX_CACHE_BYTES
+#   (estimated from the model file sizes).
+# - A set is reference-counted while requests use it and only evicted when unused; if every
+#   cached set is in use, the cache stays over its budget until they are released.
+# - Loading happens outside the cache lock, under a lock per workspace: concurrent requests
+#   for the same workspace wait for one load, requests for other workspaces don't wait at all.
+# - A workspace whose set failed to load gets the global models until LOAD_RETRY_S have passed
+#   or a file in its directory changes (new modification time); then loading is retried.
+
+WORKSPACE_HEADER = "X-Workspace-Id"
+WORKSPACES_DIR = os.path.join("models", "workspaces")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+LOAD_RETRY_S = 300
+TARGETS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+# Workspace ids are directory names; anything else (e.g. '../') is treated as unknown
+WORKSPACE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class ModelSet:
+    """The three target models of one workspace and the feature order they expect."""
+
+    def __init__(self, name, models, features, size_bytes=0):
+        self.name = name
+        self.models = models
+        self.features = features
+        self.size_bytes = size_bytes
+        self.refcount = 0
+
+
+def load_model_set(name, model_dir, suffix=''):
+    """Loads a model set from model_dir; ValueError if the models don't match the feature manifest."""
+    paths = {target: os.path.join(model_dir, f"model_{target}{suffix}.pkl") for target in TARGETS}
+    models = {target: joblib.load(path) for target, path in paths.items()}
+    features = load_feature_manifest(model_dir) or list(models['predicted_view'].feature_names_in_)
+    for target, model in models.items():
+        model_features = getattr(model, 'feature_names_in_', None)
+        if model_features is not None and list(model_features) != features:
+            raise ValueError(f"The model for '{target}' was trained on {list(model_features)}, expected {features}")
+    return ModelSet(name, models, features, sum(os.path.getsize(path) for path in paths.values()))
+
+
+def _file_mtimes(model_dir):
+    """Modification time of every file in model_dir (None if it can't be listed)."""
+    try:
+        return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(model_dir) if entry.is_file()}
+    except OSError:
+        return None
+
+
+class WorkspaceModelCache:
+    """LRU cache of per-workspace model sets with reference counting and a global fallback."""
+
+    def __init__(self, global_set, suffix='', root_dir=WORKSPACES_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.global_set = global_set
+        self.suffix = suffix
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # workspace id -> ModelSet, least recently used first
+        self._load_locks = {}
+        self._failed = {}              # Workspace id -> (failure time, file mtimes) of sets that couldn't be loaded
+        self._lock = threading.Lock()
+        self.cached_bytes = 0
+        self.stats = {'hits': 0, 'loads': 0, 'fallbacks': 0, 'evictions': 0, 'load_errors': 0}
+
+    def _workspace_dir(self, workspace_id):
+        if not workspace_id or not WORKSPACE_ID_PATTERN.fullmatch(workspace_id):
+            return None
+        model_dir = os.path.join(self.root_dir, workspace_id)
+        return model_dir if os.path.isdir(model_dir) else None
+
+    def _checkout(self, workspace_id):
+        """The cached set with its refcount increased, or None. Caller holds self._lock."""
+        model_set = self._entries.get(workspace_id)
+        if model_set is not None:
+            model_set.refcount += 1
+            self._entries.move_to_end(workspace_id)
+        return model_set
+
+    def _evict(self):
+        """Drops unused sets, least recently used first, until the cache fits. Caller holds self._lock."""
+        for workspace_id in list(self._entries):
+            if self.cached_bytes <= self.max_bytes:
+                break
+            model_set = self._entries[workspace_id]
+            if model_set.refcount == 0:
+                del self._entries[workspace_id]
+                self.cached_bytes -= model_set.size_bytes
+                self.stats['evictions'] += 1
+
+    def _should_skip(self, failure, model_dir):
+        """Whether a failed load is recent and the workspace's files haven't changed since."""
+        if failure is None:
+            return False
+        failed_at, mtimes = failure
+        return time.monotonic() - failed_at < LOAD_RETRY_S and _file_mtimes(model_dir) == mtimes
+
+    def _get(self, workspace_id):
+        with self._lock:
+            model_set = self._checkout(workspace_id)
+            if model_set is not None:
+                self.stats['hits'] += 1
+                return model_set
+            failure = self._failed.get(workspace_id)
+
+        model_dir = self._workspace_dir(workspace_id)
+        if model_dir is None or self._should_skip(failure, model_dir):
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            return None
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(workspace_id, threading.Lock())
+        with load_lock:
+            # Another request may have loaded the set while this one waited for the lock
+            with self._lock:
+                model_set = self._checkout(workspace_id)
+                if model_set is not None:
+                    self.stats['hits'] += 1
+                    return model_set
+                failure = self._failed.get(workspace_id)
+            # A load that failed while this request waited isn't retried right away
+            if self._should_skip(failure, model_dir):
+                with self._lock:
+                    self.stats['fallbacks'] += 1
+                return None
+            # Taken before loading, so a change during the load still triggers a retry
+            mtimes = _file_mtimes(model_dir)
+            try:
+                model_set = load_model_set(workspace_id, model_dir, self.suffix)
+            except Exception as e:
+                print(f"ERROR: Could not load the models of workspace '{workspace_id}', using the global models. Details: {e}")
+                with self._lock:
+                    self._failed[workspace_id] = (time.monotonic(), mtimes)
+                    self.stats['load_errors'] += 1
+                    self.stats['fallbacks'] += 1
+                return None
+            print(f"Loaded the models of workspace '{workspace_id}' ({model_set.size_bytes / 1e6:.1f} MB).")
+            with self._lock:
+                model_set.refcount = 1
+                self._failed.pop(workspace_id, None)
+                self._entries[workspace_id] = model_set
+                self.cached_bytes += model_set.size_bytes
+                self.stats['loads'] += 1
+                self._evict()
+            return model_set
+
+    def _release(self, model_set):
+        with self._lock:
+            model_set.refcount -= 1
+            self._evict()
+
+    @contextmanager
+    def acquire(self, workspace_id):
+        """Yields the model set for a workspace id (the global set as fallback), pinned while in use."""
+        model_set = self._get(workspace_id) if workspace_id else None
+        if model_set is None:
+            yield self.global_set
+            return
+        try:
+            yield model_set
+        finally:
+            self._release(model_set)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                cached_mb=round(self.cached_bytes / 1e6, 2),
+                max_mb=round(self.max_bytes / 1e6, 2),
+                workspaces={workspace_id: {'in_use': model_set.refcount, 'size_mb': round(model_set.size_bytes / 1e6, 2)}
+                            for workspace_id, model_set in self._entries.items()},
+                failed=sorted(self._failed),
+            )
@@ -0,0 +1,170 @@
+import math
+from collections import Counter
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+# --- Out-of-Core Training ---
+# For training sets that don't fit into memory. The data files are read in chunks of
+# CHUNK_SIZE rows, twice:
+#   1. Only the target columns are read. A reservoir per label combination keeps the row ids
+#      with the smallest random keys, which yields a stratified random test split without
+#      holding the data (at most MAX_TEST_ROWS ids and keys per label combination).
+#   2. Every chunk, minus its test rows, trains a small forest per target; the test rows are
+#      collected on the way. All chunk forests of a target are merged into one
+#      RandomForestClassifier, so the saved pipeline works everywhere the in-memory one does
+#      (app.py, compression, distillation).
+# Peak memory is one chunk plus the trees, independent of the number of rows. Chunks are
+# trained in file order, so rows should not be sorted by label within a file.
+
+CHUNK_SIZE = 100_000
+MAX_TEST_ROWS = 20_000
+
+
+def iter_chunks(paths, columns, chunk_size=CHUNK_SIZE):
+    """Yields (global row ids, DataFrame of the requested columns) for every chunk of every file."""
+    wanted = set(columns)
+    row_offset = 0
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=lambda column: column in wanted, chunksize=chunk_size):
+            yield np.arange(row_offset, row_offset + len(chunk)), chunk
+            row_offset += len(chunk)
+
+
+class StratifiedReservoir:
+    """
+    Uniform sample of row ids per stratum, in a single pass and bounded memory.
+
+    Every row gets a random key; each stratum keeps the max_rows ids with the smallest keys,
+    which is a uniform sample of that stratum. sample() then takes each stratum's share of
+    the test split from those.
+    """
+
+    def __init__(self, max_rows=MAX_TEST_ROWS, seed=42):
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(seed)
+        self.counts = Counter()
+        self.test_counts = Counter()
+        self._reservoirs = {}
+
+    def add(self, row_ids, labels):
+        """row_ids: array of ids; labels: DataFrame whose rows define the stratum of each id."""
+        keys = self.rng.random(len(row_ids))
+        for stratum, positions in labels.groupby(list(labels.columns), sort=False).indices.items():
+            self.counts[stratum] += len(positions)
+            old_keys, old_ids = self._reservoirs.get(stratum, (np.empty(0), np.empty(0, dtype=np.int64)))
+            stratum_keys = np.concatenate([old_keys, keys[positions]])
+            stratum_ids = np.concatenate([old_ids, row_ids[positions]])
+            if len(stratum_keys) > self.max_rows:
+                keep = np.argpartition(stratum_keys, self.max_rows)[:self.max_rows]
+                stratum_keys, stratum_ids = stratum_keys[keep], stratum_ids[keep]
+            self._reservoirs[stratum] = (stratum_keys, stratum_ids)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def sample(self, test_size):
+        """Sorted row ids of a stratified test split of test_size (capped at max_rows)."""
+        n_test = min(self.max_rows, round(self.total * test_size))
+        selected = []
+        for stratum, count in self.counts.items():
+            n = round(n_test * count / self.total)
+            # Like train_test_split(stratify=...): every class with 2+ rows is in both splits
+            n = min(max(n, 1), count - 1) if count >= 2 else 0
+            self.test_counts[stratum] = n
+            keys, ids = self._reservoirs[stratum]
+            selected.append(ids[np.argsort(keys)[:n]])
+        return np.sort(np.concatenate(selected))
+
+
+def merge_forests(forests):
+    """
+    One RandomForestClassifier with the trees of all given forests.
+
+    The forests must have been fitted on the same features and the same classes_ (see
+    _pad_missing_classes); every tree then votes with equal weight.
+    """
+    merged = clone(forests[0])
+    merged.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    merged.n_estimators = len(merged.estimators_)
+    for attribute in ('classes_', 'n_classes_', 'n_outputs_', 'n_features_in_'):
+        setattr(merged, attribute, getattr(forests[0], attribute))
+    return merged
+
+
+def _pad_missing_classes(X, y, classes):
+    """
+    Appends one zero-weight row per class missing from the chunk, so every chunk forest has
+    the same classes_ and its trees' leaf distributions line up with the merged forest.
+    """
+    missing = np.setdiff1d(classes, y)
+    weights = np.ones(len(y) + len(missing))
+    weights[len(y):] = 0.0
+    X = np.concatenate([X, np.repeat(X[:1], len(missing), axis=0)])
+    y = np.concatenate([np.asarray(y, dtype=object), missing.astype(object)])
+    return X, y, weights
+
+
+def train_chunked(paths, features, target_columns, list_only_targets, preprocessor, forest,
+                  chunk_size=CHUNK_SIZE, test_size=0.2, max_test_rows=MAX_TEST_ROWS, seed=42):
+    """
+    Trains one Pipeline(preprocessor, forest) per target from chunked data files.
+
+    `forest` is an unfitted RandomForestClassifier; its n_estimators is the total number of
+    trees per target, split across the chunks in proportion to their size. Targets in
+    list_only_targets are trained and tested on list-view rows only.
+    Returns {target: (pipeline, X_test, y_test)}.
+    """
+    # --- Pass 1: stratified test split ---
+    reservoir = StratifiedReservoir(max_test_rows, seed)
+    for row_ids, labels in iter_chunks(paths, target_columns, chunk_size):
+        reservoir.add(row_ids, labels[target_columns].astype(str))
+    test_ids = reservoir.sample(test_size)
+    n_train = reservoir.total - len(test_ids)
+    print(f"Out-of-core split: {n_train} train rows, {len(test_ids)} test rows, "
+          f"{len(reservoir.counts)} label combinations.")
+
+    view_index = target_columns.index('predicted_view')
+    classes, train_rows = {}, {}
+    for index, target in enumerate(target_columns):
+        strata = [stratum for stratum in reservoir.counts
+                  if target not in list_only_targets or stratum[view_index] != 'kanban']
+        classes[target] = np.array(sorted({stratum[index] for stratum in strata}), dtype=object)
+        train_rows[target] = sum(reservoir.counts[stratum] - reservoir.test_counts[stratum] for stratum in strata)
+
+    # --- Pass 2: one forest per chunk and target ---
+    fitted_preprocessor = None
+    chunk_forests = {target: [] for target in target_columns}
+    test_chunks = []
+    for chunk_index, (row_ids, chunk) in enumerate(iter_chunks(paths, features + target_columns, chunk_size)):
+        is_test = np.isin(row_ids, test_ids, assume_unique=True)
+        test_chunks.append(chunk[is_test])
+        train = chunk[~is_test]
+        if train.empty:
+            continue
+        if fitted_preprocessor is None:
+            fitted_preprocessor = clone(preprocessor).fit(train[features])
+
+        for target in target_columns:
+            rows = train[train['predicted_view'] != 'kanban'] if target in list_only_targets else train
+            if rows.empty:
+                continue
+            X, y, weights = _pad_missing_classes(
+                fitted_preprocessor.transform(rows[features]), rows[target].astype(str).to_numpy(), classes[target]
+            )
+            n_trees = max(1, math.ceil(forest.n_estimators * len(rows) / train_rows[target]))
+            chunk_forest = clone(forest).set_params(n_estimators=n_trees, random_state=seed + chunk_index)
+            chunk_forests[target].append(chunk_forest.fit(X, y, sample_weight=weights))
+        print(f" ... trained on chunk {chunk_index + 1} ({len(train)} rows).")
+
+    test_df = pd.concat(test_chunks, ignore_index=True)
+    results = {}
+    for target in target_columns:
+        pipeline = Pipeline(steps=[
+            ('preprocessor', fitted_preprocessor),
+            ('classifier', merge_forests(chunk_forests[target]))])
+        test_rows = test_df[test_df['predicted_view'] != 'kanban'] if target in list_only_targets else test_df
+        results[target] = (pipeline, test_rows[features], test_rows[target].astype(str))
+    return results
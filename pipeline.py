@@ -0,0 +1,384 @@
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import rule_engine
+from evaluation import write_report, REPORT_FILE
+from feature_engineering import engineer_features_df, FEATURE_MANIFEST_FILE, STATUS_COUNT_COLUMNS
+
+# --- Content-Hashed Stage Pipeline ---
+# Runs the generate -> validate -> train -> export workflow as stages. Each stage declares
+# - code: the script or function it runs plus the repo modules these import,
+# - params and env: everything else that changes its result,
+# - inputs: files (the feature manifest) and upstream stages.
+# The stage key is the sha256 of all of these, with upstream stages entering through the
+# content hash of their outputs. Outputs are stored in CACHE_DIR/<stage>/<key>, and a stage
+# whose key already has outputs is skipped, so a rerun only runs the stages a change affects:
+# - the generators don't depend on feature_engineering.py: the validate stages recompute every
+#   engineered feature from the raw counts, so changing or adding a feature only revalidates
+#   and retrains (the LLM calls are not repeated),
+# - a stage that reruns but produces the same outputs doesn't invalidate the stages after it.
+# Stages whose inputs are ready run in parallel (the two generators, the three training
+# targets), scripts in their own process with their output in LOG_FILE of the stage directory.
+# Finally the export stage's files (models and merged evaluation report) are copied to MODEL_DIR.
+# Usage: python pipeline.py [stage ...] [--force stage ...] [--dry-run]
+#        python pipeline.py --adopt generate_clean training_data_llm_v11.csv  (reuse existing data)
+
+CACHE_DIR = ".pipeline_cache"
+MODEL_DIR = "models"
+TARGET_COLUMNS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+WORKERS = os.cpu_count() or 1
+KEEP_VERSIONS = 3           # Cached outputs kept per stage; older ones are deleted
+GENERATED_FILE = "training_data.csv"
+DATASET_FILE = "dataset.csv"
+LOG_FILE = "log.txt"
+STAGE_FILE = "stage.json"
+
+# Values a validated row may have (as in the generators' validate_and_process_df)
+ALLOWED_VALUES = {
+    'last_task_created_label': ["Bug", "Feature", "Dokumentation"],
+    'last_task_created_priority': ["Kritisch", "Hoch", "Mittel", "Niedrig"],
+    'last_task_created_status': ["Start ausstehend", "Zu Erledigen", "In Bearbeitung", "Erledigt", "Blockiert"],
+    'predicted_view': ['list', 'kanban'],
+    'predicted_status_filter': ["Start ausstehend", "Zu Erledigen", "In Bearbeitung", "Erledigt", "Blockiert", 'none'],
+    'predicted_priority_filter': ["Kritisch", "Hoch", "Mittel", "Niedrig", 'none'],
+}
+
+
+# --- Hashing ---
+def file_hash(path):
+    """sha256 of a file's content, or None if it doesn't exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def local_imports(path, ignore=(), found=None):
+    """The repo modules (top-level .py files) a file imports, directly or indirectly."""
+    found = set() if found is None else found
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module_path = f"{name.split('.')[0]}.py"
+            if name not in ignore and module_path not in found and os.path.exists(module_path):
+                found.add(module_path)
+                local_imports(module_path, ignore, found)
+    return found
+
+
+# --- Stages ---
+class Stage:
+    """One pipeline step: a script run in a subprocess, or a function(out_dir, upstream_dirs)."""
+
+    def __init__(self, name, script=None, function=None, modules=(), ignore_modules=(), deps=(),
+                 input_files=(), params=None, env=None, outputs=()):
+        self.name = name
+        self.script = script
+        self.function = function
+        self.modules = list(modules)            # Repo modules a function stage uses
+        self.ignore_modules = ignore_modules    # Imports that don't change a script's result
+        self.deps = list(deps)
+        self.input_files = list(input_files)    # Copied into the stage directory if they exist
+        self.params = params or {}
+        self.env = env or {}                    # Formatted with {out} and the upstream stage dirs
+        self.outputs = list(outputs)            # Files the stage must produce
+
+    def code_hashes(self):
+        if self.script is not None:
+            files = {self.script} | local_imports(self.script, self.ignore_modules)
+            hashes = {}
+        else:
+            files = set()
+            for module in self.modules:
+                files |= {f"{module}.py"} | local_imports(f"{module}.py", self.ignore_modules)
+            source = inspect.getsource(self.function)
+            hashes = {self.function.__name__: hashlib.sha256(source.encode()).hexdigest()}
+        hashes.update({path: file_hash(path) for path in sorted(files)})
+        return hashes
+
+    def key(self, upstream_records):
+        """Cache key from code, params, env, input files and the output hashes of the upstream stages."""
+        description = {
+            'stage': self.name,
+            'code': self.code_hashes(),
+            'params': self.params,
+            'env': self.env,
+            'input_files': {path: file_hash(path) for path in self.input_files},
+            'upstream': {dep: upstream_records[dep]['outputs'] for dep in self.deps},
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def validate_dataset(out_dir, upstream_dirs):
+    """Drops inconsistent rows of a generated dataset and recomputes all engineered features from its raw counts."""
+    (source_dir,) = upstream_dirs.values()
+    df = pd.read_csv(os.path.join(source_dir, GENERATED_FILE))
+    # The generated CSVs only keep percentages; the counts are recovered exactly from them
+    counts = pd.DataFrame(rule_engine.counts_from_features(df), index=df.index)
+    valid = (
+        (counts[STATUS_COUNT_COLUMNS].sum(axis=1) == counts['number_of_tasks'])
+        & (counts['overdue_tasks'] <= counts['number_of_tasks'])
+    )
+    for column, allowed_values in ALLOWED_VALUES.items():
+        valid &= df[column].astype(str).isin(allowed_values)
+
+    dataset = df.copy()
+    for column, values in counts.items():
+        dataset[column] = values
+    dataset = engineer_features_df(dataset)[valid].dropna()
+    dataset.to_csv(os.path.join(out_dir, DATASET_FILE), index=False)
+    print(f"Validated '{source_dir}': kept {len(dataset)} of {len(df)} rows.")
+
+
+def export_models(out_dir, upstream_dirs):
+    """Collects the models of the per-target training stages and merges their evaluation reports."""
+    target_reports, metadata = {}, {}
+    for train_dir in upstream_dirs.values():
+        for file_name in os.listdir(train_dir):
+            if file_name.startswith("model_") and file_name.endswith(".pkl"):
+                shutil.copy2(os.path.join(train_dir, file_name), out_dir)
+        with open(os.path.join(train_dir, REPORT_FILE)) as f:
+            report = json.load(f)
+        target_reports.update(report['targets'])
+        metadata = {key: value for key, value in report.items() if key not in ('created', 'n_resamples', 'confidence', 'targets')}
+    write_report(target_reports, os.path.join(out_dir, REPORT_FILE), **metadata)
+
+
+def build_stages():
+    # The generators compute features with feature_engineering.status_entropy, but validate
+    # recomputes all features, so feature changes don't invalidate the (expensive) LLM data
+    llm_params = {'llm_base_url': os.environ.get("OPENAI_BASE_URL", "")}
+    stages = [
+        Stage('generate_clean', script="generate_llm_data.py", ignore_modules=['feature_engineering'],
+              params=llm_params, env={'GENERATE_OUTPUT_FILE': os.path.join("{out}", GENERATED_FILE)},
+              outputs=[GENERATED_FILE]),
+        Stage('generate_noisy', script="generate_noisy_data.py", ignore_modules=['feature_engineering'],
+              params=llm_params, env={'GENERATE_OUTPUT_FILE': os.path.join("{out}", GENERATED_FILE)},
+              outputs=[GENERATED_FILE]),
+        Stage('validate_clean', function=validate_dataset, modules=['rule_engine', 'feature_engineering'],
+              deps=['generate_clean'], outputs=[DATASET_FILE]),
+        Stage('validate_noisy', function=validate_dataset, modules=['rule_engine', 'feature_engineering'],
+              deps=['generate_noisy'], outputs=[DATASET_FILE]),
+    ]
+    for target in TARGET_COLUMNS:
+        stages.append(Stage(
+            f'train_{target}', script="train_model.py", deps=['validate_clean', 'validate_noisy'],
+            # train_model.py reads the manifest from its output directory
+            input_files=[os.path.join(MODEL_DIR, FEATURE_MANIFEST_FILE)],
+            env={
+                'MODEL_OUTPUT_DIR': "{out}",
+                'CLEAN_DATA_FILE': os.path.join("{validate_clean}", DATASET_FILE),
+                'NOISY_DATA_FILE': os.path.join("{validate_noisy}", DATASET_FILE),
+                'TRAIN_TARGETS': target,
+            },
+            outputs=[f"model_{target}.pkl", REPORT_FILE],
+        ))
+    stages.append(Stage('export', function=export_models, modules=['evaluation'],
+                        deps=[f'train_{target}' for target in TARGET_COLUMNS], outputs=[REPORT_FILE]))
+    return {stage.name: stage for stage in stages}
+
+
+# --- Stage Cache ---
+def stage_dir(stage_name, key):
+    return os.path.join(CACHE_DIR, stage_name, key[:16])
+
+
+def load_record(stage_name, key):
+    """The record of a finished stage with this key, or None."""
+    path = os.path.join(stage_dir(stage_name, key), STAGE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        record = json.load(f)
+    return record if record['key'] == key else None
+
+
+def finish_stage(stage, key, work_dir, seconds):
+    """Hashes the outputs of a finished run, writes its record and moves it to its cache directory."""
+    missing = [name for name in stage.outputs if not os.path.exists(os.path.join(work_dir, name))]
+    if missing:
+        raise RuntimeError(f"Stage '{stage.name}' did not produce {missing}")
+    inputs = {os.path.basename(path) for path in stage.input_files}
+    outputs = {name: file_hash(os.path.join(work_dir, name)) for name in sorted(os.listdir(work_dir))
+               if name not in inputs and name not in (LOG_FILE, STAGE_FILE)}
+    record = {'stage': stage.name, 'key': key, 'outputs': outputs, 'seconds': round(seconds, 1),
+              'finished': time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(os.path.join(work_dir, STAGE_FILE), 'w') as f:
+        json.dump(record, f, indent=2)
+    final_dir = stage_dir(stage.name, key)
+    if os.path.exists(final_dir):
+        shutil.rmtree(final_dir)
+    os.replace(work_dir, final_dir)
+    prune_cache(stage.name, keep=final_dir)
+    return record
+
+
+def prune_cache(stage_name, keep):
+    """Deletes all but the KEEP_VERSIONS most recent cached outputs of a stage."""
+    root = os.path.join(CACHE_DIR, stage_name)
+    versions = [os.path.join(root, name) for name in os.listdir(root)
+                if os.path.exists(os.path.join(root, name, STAGE_FILE))]
+    versions.sort(key=lambda path: os.path.getmtime(os.path.join(path, STAGE_FILE)), reverse=True)
+    for path in versions[KEEP_VERSIONS:]:
+        if path != keep:
+            shutil.rmtree(path)
+
+
+def run_stage(stage, key, upstream_dirs):
+    """Runs a stage in a fresh work directory and returns its record; raises on failure."""
+    work_dir = stage_dir(stage.name, key) + ".tmp"
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+    for path in stage.input_files:
+        if os.path.exists(path):
+            shutil.copy2(path, work_dir)
+
+    start = time.perf_counter()
+    if stage.script is not None:
+        paths = {name: os.path.abspath(path) for name, path in upstream_dirs.items()}
+        env = dict(os.environ, **{name: value.format(out=os.path.abspath(work_dir), **paths) for name, value in stage.env.items()})
+        with open(os.path.join(work_dir, LOG_FILE), 'w') as log:
+            result = subprocess.run([sys.executable, stage.script], env=env, stdout=log, stderr=subprocess.STDOUT)
+        if result.returncode != 0:
+            raise RuntimeError(f"'{stage.script}' exited with code {result.returncode}, see '{os.path.join(work_dir, LOG_FILE)}'")
+    else:
+        stage.function(work_dir, upstream_dirs)
+    return finish_stage(stage, key, work_dir, time.perf_counter() - start)
+
+
+def adopt_outputs(stage, files):
+    """Stores existing files as the outputs of a stage without dependencies (e.g. already generated data)."""
+    if stage.deps or len(files) != len(stage.outputs):
+        raise SystemExit(f"Can only adopt files for stages without upstream stages, one per output {stage.outputs}.")
+    key = stage.key({})
+    work_dir = stage_dir(stage.name, key) + ".tmp"
+    os.makedirs(work_dir, exist_ok=True)
+    for path, output_name in zip(files, stage.outputs):
+        shutil.copy2(path, os.path.join(work_dir, output_name))
+    finish_stage(stage, key, work_dir, 0.0)
+    print(f"Adopted {files} as the outputs of '{stage.name}' ({key[:16]}).")
+
+
+# --- Scheduling ---
+def upstream_closure(stages, names):
+    """The given stages and everything they depend on, in definition order."""
+    needed, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(stages[name].deps)
+    return [name for name in stages if name in needed]
+
+
+def run_pipeline(stages, targets, force=(), dry_run=False, workers=WORKERS):
+    """
+    Runs the target stages and their upstream stages, skipping those with cached outputs.
+    Returns {stage name: record} of the finished stages; failed stages are missing.
+    """
+    pending = upstream_closure(stages, targets)
+    records, failed, stale = {}, set(), set()
+    running = {}  # future -> (stage name, key)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            progress = True
+            while progress:
+                progress = False
+                for name in list(pending):
+                    stage = stages[name]
+                    if any(dep in failed for dep in stage.deps):
+                        print(f"[{name}] skipped: an upstream stage failed")
+                        failed.add(name)
+                    elif any(dep in stale for dep in stage.deps):
+                        print(f"[{name}] would run (upstream stage changes)")
+                        stale.add(name)
+                    elif all(dep in records for dep in stage.deps):
+                        key = stage.key(records)
+                        record = load_record(name, key) if name not in force else None
+                        if record is not None:
+                            print(f"[{name}] cached ({key[:16]})")
+                            records[name] = record
+                        elif dry_run:
+                            print(f"[{name}] would run ({key[:16]})")
+                            stale.add(name)
+                        else:
+                            print(f"[{name}] running ({key[:16]}) ...")
+                            upstream_dirs = {dep: stage_dir(dep, records[dep]['key']) for dep in stage.deps}
+                            running[pool.submit(run_stage, stage, key, upstream_dirs)] = name
+                    else:
+                        continue
+                    pending.remove(name)
+                    progress = True
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    records[name] = future.result()
+                    print(f"[{name}] finished in {records[name]['seconds']}s")
+                except Exception as e:
+                    print(f"ERROR: Stage '{name}' failed: {e}")
+                    failed.add(name)
+    return records
+
+
+def publish(record, model_dir=MODEL_DIR):
+    """Copies the export stage's files to the model directory the server loads from."""
+    source_dir = stage_dir(record['stage'], record['key'])
+    os.makedirs(model_dir, exist_ok=True)
+    for file_name in record['outputs']:
+        shutil.copy2(os.path.join(source_dir, file_name), model_dir)
+    print(f"Published {len(record['outputs'])} files from '{source_dir}' to '{model_dir}/'.")
+
+
+if __name__ == "__main__":
+    stages = build_stages()
+    parser = argparse.ArgumentParser(description="Run the generate -> validate -> train -> export pipeline with cached stages.")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help=f"Stages to bring up to date, with everything they depend on (default: all of {', '.join(stages)})")
+    parser.add_argument("--force", nargs="+", default=[], choices=list(stages), metavar="STAGE", help="Rerun these stages even if cached")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages are cached and which would run")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Stages run at the same time")
+    parser.add_argument("--adopt", nargs="+", metavar=("STAGE", "FILE"), help="Store existing files as the outputs of a stage")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.stages + (args.adopt or [])[:1] if name not in stages]
+    if unknown:
+        raise SystemExit(f"Unknown stages {unknown}, expected some of {list(stages)}.")
+    if args.adopt:
+        adopt_outputs(stages[args.adopt[0]], args.adopt[1:])
+        exit()
+
+    targets = args.stages or list(stages)
+    start = time.perf_counter()
+    records = run_pipeline(stages, targets, force=set(args.force), dry_run=args.dry_run, workers=args.workers)
+    missing = [name for name in upstream_closure(stages, targets) if name not in records]
+    if not args.dry_run and 'export' in records:
+        publish(records['export'])
+    print(f"\nPipeline finished in {time.perf_counter() - start:.1f}s: {len(records)} stages up to date"
+          + (f", {len(missing)} not: {missing}" if missing else "."))
+    if missing and not args.dry_run:
+        sys.exit(1)
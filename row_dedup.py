@@ -0,0 +1,70 @@
+from collections import Counter, defaultdict
+from feature_engineering import COUNT_COLUMNS
+
+# --- Deduplication of Generated Rows ---
+# LLM batches tend to repeat the numbers of the worked examples or to emit the same board with
+# tiny variations. Every candidate row is checked against two hash sets before it enters the
+# accumulator:
+#   - exact: the hash of the raw count tuple,
+#   - near:  the hash of a quantized version of it (number_of_tasks in buckets of
+#            TASK_BUCKET_WIDTH, every other count as its share of the board in SHARE_BUCKETS steps).
+# Only one integer hash per row and index is stored, so memory stays constant per row.
+# Near-duplicates that straddle a bucket boundary are not caught; one probe per row keeps the
+# check O(1).
+
+TASK_BUCKET_WIDTH = 5
+SHARE_BUCKETS = 10
+MAX_ROWS_PER_BUCKET = 1
+
+
+class RowDeduplicator:
+    """Rejects exact and near-duplicate count tuples and counts rejections per prompt."""
+
+    def __init__(self, count_columns=COUNT_COLUMNS, task_bucket_width=TASK_BUCKET_WIDTH,
+                 share_buckets=SHARE_BUCKETS, max_rows_per_bucket=MAX_ROWS_PER_BUCKET):
+        self.count_columns = list(count_columns)
+        self.task_bucket_width = task_bucket_width
+        self.share_buckets = share_buckets
+        self.max_rows_per_bucket = max_rows_per_bucket
+        self._exact = set()
+        self._buckets = Counter()
+        self.stats = defaultdict(Counter)
+
+    def _keys(self, counts):
+        """Exact and bucket hash of one row's count tuple (number_of_tasks first)."""
+        number_of_tasks = max(counts[0], 1)
+        bucket = (counts[0] // self.task_bucket_width,) + tuple(
+            round(count / number_of_tasks * self.share_buckets) for count in counts[1:]
+        )
+        return hash(counts), hash(bucket)
+
+    def check(self, counts, prompt):
+        """Registers a count tuple; returns None if it is new, else 'exact' or 'near'."""
+        exact_key, bucket_key = self._keys(counts)
+        if exact_key in self._exact:
+            reason = 'exact'
+        elif self._buckets[bucket_key] >= self.max_rows_per_bucket:
+            reason = 'near'
+        else:
+            self._exact.add(exact_key)
+            self._buckets[bucket_key] += 1
+            reason = None
+        self.stats[prompt][reason or 'accepted'] += 1
+        return reason
+
+    def filter(self, df, prompt):
+        """Rows of a processed DataFrame that aren't duplicates of anything seen before."""
+        if df.empty:
+            return df
+        counts = df[self.count_columns].to_numpy(dtype=int)
+        keep = [self.check(tuple(row.tolist()), prompt) is None for row in counts]
+        rejected = len(keep) - sum(keep)
+        if rejected:
+            print(f" ... rejected {rejected} duplicate row(s).")
+        return df[keep]
+
+    def print_report(self):
+        print("\n--- Duplicate Rejections per Prompt ---")
+        print(f"{'prompt':<40}{'accepted':>9}{'exact':>7}{'near':>7}")
+        for prompt, counts in sorted(self.stats.items()):
+            print(f"{prompt:<40}{counts['accepted']:>9}{counts['exact']:>7}{counts['near']:>7}")
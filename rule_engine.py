@@ -0,0 +1,192 @@
+import numpy as np
+
+# --- Server-side port of getAdaptationDecision (src/lib/ruleEngine.ts) ---
+# The frontend rules work on the full task list. Here the same cascade is evaluated
+# from the raw counts the frontend already posts to /predict, so it can be used as a
+# fallback for low-confidence model predictions without an extra round-trip.
+#
+# Two inputs of the TypeScript rules are not part of the count payload:
+# - "overdue AND critical" (Rule 1): taken from `overdue_critical` if the client sends it,
+#   otherwise approximated as "there are overdue tasks AND there are critical open tasks".
+# - "tasks due today" (Rule 4): taken from `due_today` if present, otherwise 0.
+
+OPEN_STATUSES = ["Start ausstehend", "Zu Erledigen", "In Bearbeitung", "Blockiert"]
+
+STD_DEV_THRESHOLD = 2.5      # Rule 5: max. spread of open status counts for a "balanced" board
+BACKLOG_THRESHOLD = 0.6      # Rule 6: share of open tasks that are still in the backlog
+FINISHING_THRESHOLD = 0.8    # Rule 7: share of done tasks
+FINISHING_MIN_TASKS = 5      # Rule 7: only for boards with more tasks than this
+DEFAULT_LIST_MIN_OPEN = 10   # Rule 8: more open tasks than this -> list, otherwise kanban
+
+# Ordered (name, view, status_filter, priority_filter). The order is the rule priority.
+# Multi-status filters of the TypeScript rules cannot be expressed in the single-valued
+# response format of /predict; "all open statuses" is sent as 'none' and the backlog
+# filter is narrowed to whichever backlog status holds more tasks (see evaluate_rules).
+RULES = [
+    ('no_tasks', 'list', 'none', 'none'),
+    ('all_done', 'list', 'Erledigt', 'none'),
+    ('emergency', 'list', 'none', 'Kritisch'),
+    ('overdue_warning', 'list', 'none', 'Hoch'),
+    ('blockage', 'list', 'Blockiert', 'none'),
+    ('focus_on_today', 'list', 'none', 'none'),
+    ('balanced_workflow', 'kanban', 'none', 'none'),
+    ('planning_mode', 'list', 'Zu Erledigen', 'none'),
+    ('finishing_up', 'list', 'none', 'none'),
+]
+RULE_NAMES = [rule[0] for rule in RULES] + ['default_fallback']
+
+
+def _column(counts, name, n_rows):
+    """Returns a count column as an int array, or zeros if it is missing."""
+    if name in counts:
+        return np.atleast_1d(np.asarray(counts[name], dtype=np.int64))
+    return np.zeros(n_rows, dtype=np.int64)
+
+
+def _rule_inputs(counts):
+    """Computes the per-board quantities the rules are based on."""
+    num_tasks = np.atleast_1d(np.asarray(counts['number_of_tasks'], dtype=np.int64))
+    n = len(num_tasks)
+
+    num_done = _column(counts, 'num_done', n)
+    num_pending = _column(counts, 'num_pending', n)
+    num_todo = _column(counts, 'num_todo', n)
+    num_inprogress = _column(counts, 'num_inprogress', n)
+    num_blocked = _column(counts, 'num_blocked', n)
+    num_critical_open = _column(counts, 'num_critical_open', n)
+    overdue = _column(counts, 'overdue_tasks', n)
+    due_today = _column(counts, 'due_today', n)
+
+    if 'overdue_critical' in counts:
+        overdue_critical = _column(counts, 'overdue_critical', n) > 0
+    else:
+        overdue_critical = (overdue > 0) & (num_critical_open > 0)
+
+    num_open = num_tasks - num_done
+    num_open_safe = np.where(num_open > 0, num_open, 1)
+    num_tasks_safe = np.where(num_tasks > 0, num_tasks, 1)
+
+    # Population standard deviation over the open statuses that are actually used
+    open_status_counts = np.stack([num_pending, num_todo, num_inprogress, num_blocked], axis=1)
+    used = open_status_counts > 0
+    num_used = used.sum(axis=1)
+    num_used_safe = np.where(num_used > 0, num_used, 1)
+    mean = open_status_counts.sum(axis=1) / num_used_safe
+    variance = (((open_status_counts - mean[:, None]) ** 2) * used).sum(axis=1) / num_used_safe
+    status_std = np.sqrt(variance)
+
+    conditions = [
+        num_tasks <= 0,
+        num_open <= 0,
+        overdue_critical,
+        overdue > 0,
+        num_blocked > 0,
+        due_today >= 2,
+        (num_used >= 3) & (status_std < STD_DEV_THRESHOLD),
+        (num_pending + num_todo) / num_open_safe >= BACKLOG_THRESHOLD,
+        (num_tasks > FINISHING_MIN_TASKS) & (num_done / num_tasks_safe >= FINISHING_THRESHOLD),
+    ]
+    return conditions, num_open, num_pending, num_todo
+
+
+def _rule_indices(conditions):
+    """Index into RULE_NAMES of the first matching rule, as a compact int8 array."""
+    choices = [np.int8(i) for i in range(len(RULES))]
+    return np.select(conditions, choices, default=np.int8(len(RULES))).astype(np.int8)
+
+
+def evaluate_rule_indices(counts):
+    """
+    Returns the index into RULE_NAMES of the rule that fires for each board.
+
+    This is the cheapest form of the cascade (one int8 per board) and is meant for
+    bulk evaluation of millions of boards; evaluate_rules also returns the labels.
+    """
+    conditions, _, _, _ = _rule_inputs(counts)
+    return _rule_indices(conditions)
+
+
+# Lookup tables for turning rule indices into labels (last entry: default fallback)
+_VIEW_TABLE = np.array([rule[1] for rule in RULES] + ['list'])
+_STATUS_TABLE = np.array([rule[2] for rule in RULES] + ['none'])
+_PRIORITY_TABLE = np.array([rule[3] for rule in RULES] + ['none'])
+_RULE_TABLE = np.array(RULE_NAMES)
+_DEFAULT_RULE = len(RULES)
+_PLANNING_RULE = RULE_NAMES.index('planning_mode')
+
+
+def evaluate_rules(counts):
+    """
+    Evaluates the rule cascade for many boards at once.
+
+    `counts` is any mapping of column name -> scalar or array (a dict payload or a
+    DataFrame with the raw count columns). Returns a dict of equally long numpy arrays:
+    'predicted_view', 'predicted_status_filter', 'predicted_priority_filter' and 'rule'.
+    """
+    conditions, num_open, num_pending, num_todo = _rule_inputs(counts)
+    indices = _rule_indices(conditions)
+
+    view = _VIEW_TABLE[indices]
+    default = indices == _DEFAULT_RULE
+    view = np.where(default & (num_open <= DEFAULT_LIST_MIN_OPEN), 'kanban', view)
+
+    # Planning mode shows both backlog statuses; keep the larger one
+    status_filter = _STATUS_TABLE[indices]
+    planning = indices == _PLANNING_RULE
+    status_filter = np.where(planning & (num_pending > num_todo), 'Start ausstehend', status_filter)
+
+    return {
+        'predicted_view': view,
+        'predicted_status_filter': status_filter,
+        'predicted_priority_filter': _PRIORITY_TABLE[indices],
+        'rule': _RULE_TABLE[indices],
+    }
+
+
+def counts_from_features(df):
+    """
+    Reconstructs the raw count columns from the engineered features stored in the training CSVs.
+
+    The CSVs only keep the percentages, so counts are recovered by multiplying back with
+    the (open) task totals and rounding. Columns that can't be recovered (e.g. due_today)
+    are left out and treated as 0 by the rules.
+    """
+    num_tasks = df['number_of_tasks'].to_numpy(dtype=np.float64)
+    counts = {
+        'number_of_tasks': num_tasks.astype(np.int64),
+        'overdue_tasks': df['overdue_tasks'].to_numpy(dtype=np.int64),
+    }
+    status_columns = {
+        'num_pending': 'pct_pending_status',
+        'num_todo': 'pct_todo_status',
+        'num_inprogress': 'pct_in_progress_status',
+        'num_done': 'pct_done_status',
+        'num_blocked': 'pct_blocked_status',
+    }
+    for count_col, pct_col in status_columns.items():
+        counts[count_col] = np.rint(df[pct_col].to_numpy() * num_tasks).astype(np.int64)
+
+    num_open_safe = np.maximum(counts['number_of_tasks'] - counts['num_done'], 1)
+    priority_columns = {
+        'num_critical_open': 'pct_critical_open',
+        'num_high_open': 'pct_high_open',
+        'num_medium_open': 'pct_medium_open',
+        'num_low_open': 'pct_low_open',
+    }
+    for count_col, pct_col in priority_columns.items():
+        counts[count_col] = np.rint(df[pct_col].to_numpy() * num_open_safe).astype(np.int64)
+    return counts
+
+
+def decide(payload):
+    """Evaluates the rules for a single /predict payload and returns plain Python values."""
+    decisions = evaluate_rules(payload)
+    return {key: str(values[0]) for key, values in decisions.items()}
+
+
+def label_boards(counts_df):
+    """Cheap labeler for synthetic data: returns a copy of the count DataFrame with the rule decisions appended."""
+    labeled = counts_df.copy()
+    for column, values in evaluate_rules(counts_df).items():
+        labeled[column] = values
+    return labeled
@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+from feature_engineering import engineer_features_df
+
+# --- Shadow Evaluation of Candidate Models ---
+# A candidate model set (e.g. a fresh train_model.py run copied to models/candidate) is scored
+# on a sample of the live /predict payloads before it replaces the primary models:
+# - the payload is handed over only after the primary response has been sent,
+# - the candidate runs in a separate worker process, so it doesn't compete with the request
+#   threads for the GIL, at the lowest CPU priority so it only uses time the primary path
+#   leaves idle; each worker loads the candidate models once,
+# - at most MAX_PENDING payloads wait for the pool, further samples are skipped,
+# - per target, agreement with the primary models' own predictions (before any rule fallback)
+#   and the latency of both are aggregated in memory.
+# The candidate computes its own features, so it may use a different feature manifest.
+# Workers are started with "spawn" when the evaluator is created: forking the multi-threaded
+# server (request threads, drift monitor) could copy locks held by other threads into the
+# child. A spawned worker would re-run the server's main script (app.py: global models, task
+# store, drift monitor); while the pool starts, this module stands in for __main__, so the
+# workers import nothing but shadow.py and the candidate models.
+
+TARGETS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+SAMPLE_RATE = 0.1
+WORKERS = 1
+MAX_PENDING = 32
+WORKER_NICENESS = 19
+MAX_DISAGREEMENT_PAIRS = 20  # Most frequent (primary, candidate) label pairs kept per target
+
+_candidate_models = {}
+_started = None  # Barrier all workers wait at once, so the warm-up starts every one of them
+
+
+def candidate_files(model_dir, suffix=''):
+    return {target: os.path.join(model_dir, f"model_{target}{suffix}.pkl") for target in TARGETS}
+
+
+def _init_worker(model_dir, suffix, started):
+    global _started
+    _started = started
+    if hasattr(os, 'nice'):
+        os.nice(WORKER_NICENESS)
+    for target, path in candidate_files(model_dir, suffix).items():
+        _candidate_models[target] = joblib.load(path)
+
+
+def _ready():
+    """Warm-up task; blocks until every worker runs it, so each one has to be started."""
+    _started.wait()
+    return True
+
+
+def _score_candidate(input_data):
+    """
+    Candidate labels for one payload (filters are 'none' in kanban view) and the CPU time it took;
+    wall time would mostly measure how long the low-priority worker waited for the CPU.
+    """
+    start = time.process_time()
+    features = list(_candidate_models['predicted_view'].feature_names_in_)
+    X = engineer_features_df(pd.DataFrame(input_data, index=[0]), features)[features]
+    labels = {}
+    for target, model in _candidate_models.items():
+        if target != 'predicted_view' and labels['predicted_view'] == 'kanban':
+            labels[target] = 'none'
+            continue
+        probabilities = model.predict_proba(X)[0]
+        labels[target] = str(model.classes_[int(np.argmax(probabilities))])
+    return labels, (time.process_time() - start) * 1000
+
+
+def primary_model_labels(response):
+    """
+    The primary models' argmax labels from a /predict response (not the rule fallback).
+    None for a filter model that wasn't evaluated because the rules chose kanban.
+    """
+    labels = {}
+    for target in TARGETS:
+        probabilities = response.get('probabilities', {}).get(target)
+        if target != 'predicted_view' and labels['predicted_view'] == 'kanban':
+            labels[target] = 'none'
+        else:
+            labels[target] = max(probabilities, key=probabilities.get) if probabilities else None
+    return labels
+
+
+class ShadowEvaluator:
+    """Re-scores sampled payloads with the candidate models in a process pool and aggregates agreement."""
+
+    def __init__(self, model_dir, suffix='', sample_rate=SAMPLE_RATE, workers=WORKERS):
+        self.model_dir = model_dir
+        self.sample_rate = sample_rate
+        context = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(model_dir, suffix, context.Barrier(workers)))
+        # Start (and load the models in) every worker now rather than from a request thread;
+        # the pool spawns them in submit(), where multiprocessing reads what to import from __main__
+        main_module = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            futures = [self._pool.submit(_ready) for _ in range(workers)]
+        finally:
+            sys.modules['__main__'] = main_module
+        for future in futures:
+            future.result()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {'sampled': 0, 'skipped': 0, 'scored': 0, 'errors': 0}
+        self._targets = {
+            target: {'agreed': 0, 'compared': 0, 'disagreements': {}} for target in TARGETS
+        }
+        self._latency = {'primary_ms_total': 0.0, 'candidate_ms_total': 0.0, 'candidate_ms_max': 0.0}
+
+    @classmethod
+    def from_model_dir(cls, model_dir, suffix='', **kwargs):
+        """Evaluator for the candidate models in model_dir, or None if they aren't all there."""
+        if not all(os.path.exists(path) for path in candidate_files(model_dir, suffix).values()):
+            return None
+        return cls(model_dir, suffix, **kwargs)
+
+    def should_sample(self):
+        return random.random() < self.sample_rate
+
+    def submit(self, input_data, response, primary_ms):
+        """Queues a payload for the candidate; called once the primary response has been sent."""
+        with self._lock:
+            self.stats['sampled'] += 1
+            if self._pending >= MAX_PENDING:
+                self.stats['skipped'] += 1
+                return
+            self._pending += 1
+        primary = primary_model_labels(response)
+        try:
+            future = self._pool.submit(_score_candidate, input_data)
+        except RuntimeError:  # BrokenProcessPool, or the pool was shut down
+            with self._lock:
+                self._pending -= 1
+                self.stats['errors'] += 1
+            return
+        future.add_done_callback(lambda done: self._record(done, primary, primary_ms))
+
+    def _record(self, future, primary, primary_ms):
+        with self._lock:
+            self._pending -= 1
+            if future.exception() is not None:
+                self.stats['errors'] += 1
+                return
+            candidate, candidate_ms = future.result()
+            self.stats['scored'] += 1
+            self._latency['primary_ms_total'] += primary_ms
+            self._latency['candidate_ms_total'] += candidate_ms
+            self._latency['candidate_ms_max'] = max(self._latency['candidate_ms_max'], candidate_ms)
+            for target, stats in self._targets.items():
+                if primary[target] is None:
+                    continue
+                stats['compared'] += 1
+                if primary[target] == candidate[target]:
+                    stats['agreed'] += 1
+                else:
+                    pair = f"{primary[target]} -> {candidate[target]}"
+                    if pair in stats['disagreements'] or len(stats['disagreements']) < MAX_DISAGREEMENT_PAIRS:
+                        stats['disagreements'][pair] = stats['disagreements'].get(pair, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            scored = self.stats['scored']
+            return dict(
+                self.stats,
+                pending=self._pending,
+                sample_rate=self.sample_rate,
+                candidate_dir=self.model_dir,
+                primary_latency_ms_mean=round(self._latency['primary_ms_total'] / scored, 3) if scored else None,
+                candidate_latency_ms_mean=round(self._latency['candidate_ms_total'] / scored, 3) if scored else None,
+                candidate_latency_ms_max=round(self._latency['candidate_ms_max'], 3),
+                targets={
+                    target: {
+                        'compared': stats['compared'],
+                        'agreement': round(stats['agreed'] / stats['compared'], 4) if stats['compared'] else None,
+                        'disagreements': dict(stats['disagreements']),
+                    }
+                    for target, stats in self._targets.items()
+                },
+            )
@@ -4,16 +4,95 @@ import KanbanView from "./pages/KanbanView/KanbanView";
 import ListView from "./pages/ListView/ListView";
 import { useEffect, useState, useRef, useCallback } from "react";
 import { AdaptationModes, CURRENT_ADAPTATION_MODE } from "./lib/adaptionConfig";
-import { useTasksDataStore } from "./hooks/useTasksDataStore";
+import { TASKS_API, useTasksDataStore } from "./hooks/useTasksDataStore";
 import { useCheckedPrioritiesStore } from "./hooks/useCheckedPrioritiesStore";
 import { useCheckedStatusStore } from "./hooks/useCheckedStatusStore";
 import { getAdaptationDecision } from "./lib/ruleEngine";
-import type { Priority, Status } from "./data/TasksData";
+import type { Priority, Status, Task } from "./data/TasksData";
+import {
+  COMPACT_MIMETYPE,
+  PREDICTION_ACCEPT,
+  encodeBoardPayload,
+  readPrediction,
+  type BoardPayload,
+} from "./lib/predictionWire";
+
+// Time budget for a prediction. The server answers with its rule engine if the models can't
+// make it in time; if even that response is late, the request is aborted and ignored, since a
+// stale adaptation is worse than none.
+const PREDICTION_DEADLINE_MS = 800;
+const PREDICTION_ABORT_GRACE_MS = 200;
 
 type PredictionResponse = {
   predicted_view: "kanban" | "list";
   predicted_status_filter: string;
   predicted_priority_filter: string;
+  // Per-target class probabilities and whether the model or the server-side rules decided
+  probabilities?: Record<string, Record<string, number>>;
+  confidence?: Record<string, number>;
+  source?: Record<string, "model" | "rules" | "trivial">;
+  rule?: string;
+  // Set when the server skipped the models to meet the deadline
+  shed?: "deadline" | "overload";
+};
+
+// Raw board counts for /predict, computed from the whole task list (without the task server)
+const boardPayload = (tasks: Task[], lastCreatedTask: Task | null): BoardPayload => {
+  // --- Calculate all raw counts required by the model ---
+  const now = new Date();
+  const openTasks = tasks.filter((t) => t.status !== "Erledigt");
+
+  const num_critical_open = openTasks.filter(
+    (t) => t.priority === "Kritisch"
+  ).length;
+  const num_high_open = openTasks.filter(
+    (t) => t.priority === "Hoch"
+  ).length;
+  const num_medium_open = openTasks.filter(
+    (t) => t.priority === "Mittel"
+  ).length;
+  const num_low_open = openTasks.filter(
+    (t) => t.priority === "Niedrig"
+  ).length;
+
+  const statusCounts = tasks.reduce((acc, task) => {
+    acc[task.status] = (acc[task.status] || 0) + 1;
+    return acc;
+  }, {} as Record<string, number>);
+
+  const num_pending = statusCounts["Start ausstehend"] || 0;
+  const num_todo = statusCounts["Zu Erledigen"] || 0;
+  const num_inprogress = statusCounts["In Bearbeitung"] || 0;
+  const num_done = statusCounts["Erledigt"] || 0;
+  const num_blocked = statusCounts["Blockiert"] || 0;
+
+  const overdue_tasks = tasks.filter(
+    (t) => t.status !== "Erledigt" && t.dueDate && new Date(t.dueDate) < now
+  ).length;
+
+  const due_today = openTasks.filter(
+    (t) =>
+      t.dueDate && new Date(t.dueDate).toDateString() === now.toDateString()
+  ).length;
+
+  // --- Payload structure ---
+  return {
+    number_of_tasks: tasks.length,
+    num_critical_open,
+    num_high_open,
+    num_medium_open,
+    num_low_open,
+    num_pending,
+    num_todo,
+    num_inprogress,
+    num_done,
+    num_blocked,
+    overdue_tasks,
+    due_today,
+    last_task_created_label: lastCreatedTask?.label || "none",
+    last_task_created_priority: lastCreatedTask?.priority || "none",
+    last_task_created_status: lastCreatedTask?.status || "none",
+  };
 };
 
 function App() {
@@ -24,6 +103,9 @@ function App() {
   const [isLoading, setIsLoading] = useState(true);
 
   const isInitialLoad = useRef(true);
+  const predictionController = useRef<AbortController | null>(null);
+  // Last prediction and its ETag; the server answers 304 if the prediction hasn't changed
+  const lastPrediction = useRef<{ etag: string; prediction: PredictionResponse } | null>(null);
 
   // Effect to fetch initial task data when the component mounts
   useEffect(() => {
@@ -54,8 +136,11 @@ function App() {
 
   const applyMlAdaptation = useCallback(
     async (options?: { applyViewPrediction?: boolean }) => {
-      const { tasks: currentTasks, lastCreatedTask: currentLastCreatedTask } =
-        useTasksDataStore.getState();
+      const {
+        tasks: currentTasks,
+        lastCreatedTask: currentLastCreatedTask,
+        serverBacked,
+      } = useTasksDataStore.getState();
       if (!currentTasks || currentTasks.length === 0) {
         setIsLoading(false);
         return;
@@ -67,73 +152,53 @@ function App() {
         `ML Adaptation Mode: Fetching predictions... (Apply View: ${shouldApplyView})`
       );
 
-      // --- Calculate all raw counts required by the model ---
-      const now = new Date();
-      const openTasks = currentTasks.filter((t) => t.status !== "Erledigt");
-
-      const num_critical_open = openTasks.filter(
-        (t) => t.priority === "Kritisch"
-      ).length;
-      const num_high_open = openTasks.filter(
-        (t) => t.priority === "Hoch"
-      ).length;
-      const num_medium_open = openTasks.filter(
-        (t) => t.priority === "Mittel"
-      ).length;
-      const num_low_open = openTasks.filter(
-        (t) => t.priority === "Niedrig"
-      ).length;
-
-      const statusCounts = currentTasks.reduce((acc, task) => {
-        acc[task.status] = (acc[task.status] || 0) + 1;
-        return acc;
-      }, {} as Record<string, number>);
-
-      const num_pending = statusCounts["Start ausstehend"] || 0;
-      const num_todo = statusCounts["Zu Erledigen"] || 0;
-      const num_inprogress = statusCounts["In Bearbeitung"] || 0;
-      const num_done = statusCounts["Erledigt"] || 0;
-      const num_blocked = statusCounts["Blockiert"] || 0;
-
-      const overdue_tasks = currentTasks.filter(
-        (t) => t.status !== "Erledigt" && t.dueDate && new Date(t.dueDate) < now
-      ).length;
-
-      const due_today = currentTasks.filter(
-        (t) =>
-          t.dueDate && new Date(t.dueDate).toDateString() === now.toDateString()
-      ).length;
-
-      // --- Payload structure ---
-      const featurePayload = {
-        number_of_tasks: currentTasks.length,
-        num_critical_open,
-        num_high_open,
-        num_medium_open,
-        num_low_open,
-        num_pending,
-        num_todo,
-        num_inprogress,
-        num_done,
-        num_blocked,
-        overdue_tasks,
-        last_task_created_label: currentLastCreatedTask?.label || "none",
-        last_task_created_priority: currentLastCreatedTask?.priority || "none",
-        last_task_created_status: currentLastCreatedTask?.status || "none",
-      };
+      // Only the latest prediction matters: cancel one that is still in flight
+      predictionController.current?.abort();
+      const controller = new AbortController();
+      predictionController.current = controller;
+      const abortTimer = setTimeout(
+        () => controller.abort(),
+        PREDICTION_DEADLINE_MS + PREDICTION_ABORT_GRACE_MS
+      );
 
       try {
-        const response = await fetch("http://127.0.0.1:5000/predict", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify(featurePayload),
-        });
-
-        if (!response.ok)
-          throw new Error(`HTTP error! status: ${response.status}`);
-
-        const prediction: PredictionResponse = await response.json();
-        console.log("Received prediction:", prediction);
+        // Compact int-array encoding in both directions, JSON responses as fallback (see src/lib/predictionWire.ts)
+        const headers: Record<string, string> = {
+          "Content-Type": COMPACT_MIMETYPE,
+          Accept: PREDICTION_ACCEPT,
+          "X-Request-Deadline-Ms": String(PREDICTION_DEADLINE_MS),
+        };
+        if (lastPrediction.current) {
+          headers["If-None-Match"] = lastPrediction.current.etag;
+        }
+        // With the task server, the prediction is made from the board counts it maintains;
+        // otherwise the counts are computed here and sent along
+        const response = serverBacked
+          ? await fetch(
+              `${TASKS_API}/predict?tz_offset=${new Date().getTimezoneOffset()}`,
+              { headers, signal: controller.signal }
+            )
+          : await fetch("http://127.0.0.1:5000/predict", {
+              method: "POST",
+              headers,
+              body: JSON.stringify(
+                encodeBoardPayload(boardPayload(currentTasks, currentLastCreatedTask))
+              ),
+              signal: controller.signal,
+            });
+
+        let prediction: PredictionResponse;
+        if (response.status === 304 && lastPrediction.current) {
+          prediction = lastPrediction.current.prediction;
+          console.log("Prediction unchanged:", prediction);
+        } else {
+          if (!response.ok)
+            throw new Error(`HTTP error! status: ${response.status}`);
+          prediction = await readPrediction(response);
+          const etag = response.headers.get("ETag");
+          lastPrediction.current = etag ? { etag, prediction } : null;
+          console.log("Received prediction:", prediction);
+        }
 
         if (shouldApplyView) {
           setView(prediction.predicted_view);
@@ -156,9 +221,17 @@ function App() {
           setCheckedPriorities([]);
         }
       } catch (error) {
-        console.error("Failed to fetch ML predictions:", error);
+        if (error instanceof DOMException && error.name === "AbortError") {
+          console.warn("Prediction aborted (superseded or past its deadline).");
+        } else {
+          console.error("Failed to fetch ML predictions:", error);
+        }
       } finally {
-        setIsLoading(false);
+        clearTimeout(abortTimer);
+        if (predictionController.current === controller) {
+          predictionController.current = null;
+          setIsLoading(false);
+        }
       }
     },
     [setCheckedStatus, setCheckedPriorities]
@@ -35,7 +35,6 @@ import {
 import { Loader2 } from "lucide-react";
 import { toast } from "sonner";
 import { AdaptationModes, CURRENT_ADAPTATION_MODE } from "@/lib/adaptionConfig";
-import OpenAI from "openai";
 
 // A more robust, nested rule-based logic
 const getFieldsByRule = (title: string): Partial<taskFormData> => {
@@ -147,82 +146,53 @@ const getFieldsByRule = (title: string): Partial<taskFormData> => {
   return updates;
 };
 
-// Strategy 2: AI Logic (Placeholder)
-const apiKey = import.meta.env.VITE_OPENAI_API_KEY;
+// Strategy 2: AI Logic
+// Suggestions come from the local title model of the Python service (POST /suggest),
+// which answers in a few milliseconds without calling an external LLM.
+const SUGGEST_URL = "http://127.0.0.1:5000/suggest";
 
-const openai = new OpenAI({
-  apiKey: apiKey,
-  // 2. This flag is required to acknowledge you're running this in a browser
-  dangerouslyAllowBrowser: true,
-});
+// Recent suggestions per normalized title, so retyping or undoing an edit doesn't hit the network.
+// The server additionally reuses suggestions for titles that only extend a cached prefix.
+const MAX_CACHED_SUGGESTIONS = 50;
+const suggestionCache = new Map<string, Partial<taskFormData>>();
 
 const getFieldsByAI = async (
   title: string
 ): Promise<Partial<taskFormData> | null> => {
-  if (title.length < 10) return null; // Don't run for very short titles
-
-  // Define the structure and constraints for the AI
-  const availableLabels = ["Bug", "Feature", "Dokumentation"];
-  const availablePriorities = ["Kritisch", "Hoch", "Mittel", "Niedrig"];
-  const availableStatuses = [
-    "Start ausstehend",
-    "Zu Erledigen",
-    "In Bearbeitung",
-    "Blockiert",
-    "Erledigt",
-  ];
-  const currentDate = new Date().toLocaleDateString("en-CA"); // YYYY-MM-DD format
-
-  // Construct a detailed prompt for reliable JSON output
-  const prompt = `
-    You are an expert German project management assistant. Analyze the user's task title and provide structured suggestions in JSON format.
-    The user is German, so interpret terms like "morgen" (tomorrow) or "dringend" (urgent) accordingly.
-
-    Current Date: ${currentDate}
-    Task Title: "${title}"
-
-    Instructions:
-    1.  **label**: Choose the most appropriate label from this list: ${JSON.stringify(
-      availableLabels
-    )}.
-    2.  **priority**: Choose the most appropriate priority from this list: ${JSON.stringify(
-      availablePriorities
-    )}.
-    3.  **status**: Choose a logical starting status from this list: ${JSON.stringify(
-      availableStatuses
-    )}.
-    4.  **dueDate**: If a date is mentioned (e.g., "heute", "morgen", "nächsten Freitag"), calculate the date in YYYY-MM-DD format. If no date is mentioned, return null.
-
-    Output:
-    Return ONLY a valid JSON object with the keys "label", "priority", "status", and "dueDate".
-  `;
+  const cacheKey = title.trim().toLowerCase().replace(/\s+/g, " ");
+  const cached = suggestionCache.get(cacheKey);
+  if (cached) return cached;
 
   try {
-    const completion = await openai.chat.completions.create({
-      model: "gpt-4o",
-      messages: [{ role: "user", content: prompt }],
-      response_format: { type: "json_object" }, // Enforce JSON output
+    const response = await fetch(SUGGEST_URL, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ title }),
     });
 
-    const responseContent = completion.choices[0].message.content;
+    if (!response.ok)
+      throw new Error(`HTTP error! status: ${response.status}`);
 
-    if (responseContent) {
-      const suggestions = JSON.parse(responseContent);
-      const updates: Partial<taskFormData> = {};
+    const suggestions = await response.json();
+    const updates: Partial<taskFormData> = {};
 
-      if (suggestions.label) updates.label = suggestions.label;
-      if (suggestions.priority) updates.priority = suggestions.priority;
-      if (suggestions.status) updates.status = suggestions.status;
+    if (suggestions.label) updates.label = suggestions.label;
+    if (suggestions.priority) updates.priority = suggestions.priority;
+    if (suggestions.status) updates.status = suggestions.status;
 
-      // Convert date string back to a Date object if it exists
-      if (suggestions.dueDate) {
-        updates.dueDate = new Date(suggestions.dueDate);
-      }
+    // Convert date string back to a Date object if it exists
+    if (suggestions.dueDate) {
+      updates.dueDate = new Date(suggestions.dueDate);
+    }
 
-      return updates;
+    suggestionCache.set(cacheKey, updates);
+    if (suggestionCache.size > MAX_CACHED_SUGGESTIONS) {
+      // Maps iterate in insertion order, so the first key is the oldest entry
+      suggestionCache.delete(suggestionCache.keys().next().value as string);
     }
+    return updates;
   } catch (error) {
-    console.error("Error fetching OpenAI suggestions:", error);
+    console.error("Error fetching title suggestions:", error);
     toast.error("AI-Vorschlag fehlgeschlagen.");
   }
 
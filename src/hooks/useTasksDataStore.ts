@@ -1,6 +1,12 @@
 import { create } from "zustand";
 import { type Task, tasks as initialTasks } from "../data/TasksData";
 
+// Tasks are stored by the Python service (task_store.py on the server): every change sends
+// only the changed tasks, and the server keeps the board counts that /tasks/predict serves
+// predictions from. If the server can't be reached on load, the tasks are kept in
+// localStorage instead (rewritten completely on every change).
+export const TASKS_API = "http://127.0.0.1:5000/tasks";
+
 // Define a key for localStorage
 const TASKS_STORAGE_KEY = "tasky-tasks";
 
@@ -39,15 +45,143 @@ const loadTasksFromStorage = (): Task[] | null => {
   }
 };
 
+// --- Server API ---
+type ApiTask = Omit<Task, "createdAt" | "dueDate"> & {
+  createdAt: string;
+  dueDate: string | null;
+  position: number;
+};
+
+// List position of every task as stored on the server. Positions are fractional, so moving
+// or inserting a task only changes that task's position.
+const positions = new Map<string, number>();
+
+const toApiTask = (task: Task): ApiTask => ({
+  ...task,
+  createdAt: task.createdAt.toISOString(),
+  dueDate: task.dueDate ? task.dueDate.toISOString() : null,
+  position: positions.get(task.taskId)!,
+});
+
+const fromApiTask = ({ position, ...task }: ApiTask): Task => {
+  positions.set(task.taskId, position);
+  return {
+    ...task,
+    createdAt: new Date(task.createdAt),
+    dueDate: (task.dueDate ? new Date(task.dueDate) : undefined) as Date,
+  };
+};
+
+const toApiUpdates = (updates: Partial<Task>) => ({
+  ...updates,
+  ...(updates.createdAt && { createdAt: updates.createdAt.toISOString() }),
+  ...("dueDate" in updates && { dueDate: updates.dueDate ? updates.dueDate.toISOString() : null }),
+});
+
+const api = async (path: string, method = "GET", body?: unknown) => {
+  const response = await fetch(`${TASKS_API}${path}`, {
+    method,
+    headers: body === undefined ? undefined : { "Content-Type": "application/json" },
+    body: body === undefined ? undefined : JSON.stringify(body),
+  });
+  if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+  return response.status === 204 ? null : response.json();
+};
+
+// Smallest position gap before all tasks are renumbered
+const MIN_POSITION_GAP = 1e-9;
+
+/**
+ * Gives new positions to the tasks that are out of order in `next` (moved or new tasks).
+ * Tasks in the longest run of already increasing positions keep theirs, every other task
+ * gets one between its neighbours. Returns the ids of the tasks whose position changed.
+ */
+const reposition = (next: Task[]): Set<string> => {
+  const known = next.map((task) => positions.get(task.taskId));
+
+  // Longest increasing subsequence of the known positions (patience sorting)
+  const tails: number[] = [];
+  const previous: number[] = new Array(next.length).fill(-1);
+  known.forEach((position, i) => {
+    if (position === undefined) return;
+    let lo = 0;
+    let hi = tails.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (known[tails[mid]]! < position) lo = mid + 1;
+      else hi = mid;
+    }
+    previous[i] = lo > 0 ? tails[lo - 1] : -1;
+    tails[lo] = i;
+  });
+  const keep = new Set<number>();
+  for (let i = tails.length ? tails[tails.length - 1] : -1; i !== -1; i = previous[i]) keep.add(i);
+
+  const changed = new Set<string>();
+  for (let start = 0; start < next.length; ) {
+    if (keep.has(start)) {
+      start++;
+      continue;
+    }
+    let end = start;
+    while (end < next.length && !keep.has(end)) end++;
+    const lower = start > 0 ? positions.get(next[start - 1].taskId) : undefined;
+    const upper = end < next.length ? positions.get(next[end].taskId) : undefined;
+    const count = end - start;
+    if (lower !== undefined && upper !== undefined && (upper - lower) / (count + 1) < MIN_POSITION_GAP) {
+      // Too many insertions at the same spot: renumber the whole list once
+      next.forEach((task, i) => positions.set(task.taskId, i + 1));
+      return new Set(next.map((task) => task.taskId));
+    }
+    for (let r = 0; r < count; r++) {
+      const position =
+        lower !== undefined && upper !== undefined
+          ? lower + ((upper - lower) * (r + 1)) / (count + 1)
+          : lower !== undefined
+          ? lower + r + 1
+          : upper !== undefined
+          ? upper - (count - r)
+          : r + 1;
+      positions.set(next[start + r].taskId, position);
+      changed.add(next[start + r].taskId);
+    }
+    start = end;
+  }
+  return changed;
+};
+
+// The changes between two versions of the task list, as a /tasks/batch request
+const diffTasks = (previousTasks: Task[], nextTasks: Task[]) => {
+  const previousById = new Map(previousTasks.map((task) => [task.taskId, task]));
+  const nextIds = new Set(nextTasks.map((task) => task.taskId));
+  const moved = reposition(nextTasks);
+  const deleted = previousTasks.map((task) => task.taskId).filter((taskId) => !nextIds.has(taskId));
+  deleted.forEach((taskId) => positions.delete(taskId));
+  return {
+    upsert: nextTasks
+      .filter((task) => previousById.get(task.taskId) !== task || moved.has(task.taskId))
+      .map(toApiTask),
+    delete: deleted,
+  };
+};
+
+const replaceOnServer = (tasks: Task[]) => {
+  positions.clear();
+  tasks.forEach((task, i) => positions.set(task.taskId, i + 1));
+  return api("", "PUT", tasks.map(toApiTask));
+};
+
 
 export interface useTasksDataStoreInterface {
   tasks: Task[] | null;
   selectedTask: Task | null;
   lastCreatedTask: Task | null;
   lastModifiedTaskId: string | null;
+  // Whether the tasks are stored by the server (otherwise in localStorage)
+  serverBacked: boolean;
   setSelectedTask: (task: Task | null) => void;
   setTasks: (tasks: Task[]) => void;
-  fetchTasks: () => void;
+  fetchTasks: () => Promise<void>;
   resetTasks: () => void; // Add the new reset function to the interface
   updateTasks: (
     tasks: Task[],
@@ -60,97 +194,150 @@ export interface useTasksDataStoreInterface {
   ) => Promise<{ success: boolean; message: string }>;
 }
 
-export const useTasksDataStore = create<useTasksDataStoreInterface>((set, get) => ({
-  // --- STATES ---
-  tasks: null,
-  selectedTask: null,
-  lastCreatedTask: null,
-  lastModifiedTaskId: null,
-
-  // --- ACTIONS ---
-  setTasks: (tasksProp) => {
-    set({ tasks: tasksProp });
-    saveTasksToStorage(tasksProp);
-  },
-
-  setSelectedTask: (task) => {
-    set({ selectedTask: task });
-  },
-
-  fetchTasks: () => {
-    const storedTasks = loadTasksFromStorage();
-    if (storedTasks) {
-      set({ tasks: storedTasks });
-    } else {
-      set({ tasks: initialTasks });
-      saveTasksToStorage(initialTasks);
-    }
-  },
-
-  // --- NEW: Action to reset tasks ---
-  resetTasks: () => {
+export const useTasksDataStore = create<useTasksDataStoreInterface>((set, get) => {
+  // After a failed write: reload the board from the server, or go back to the tasks before the change
+  const resync = async (previousTasks: Task[] | null) => {
     try {
-      console.log("Resetting tasks to initial state.");
-      localStorage.removeItem(TASKS_STORAGE_KEY); // 1. Clear storage
-      set({ tasks: initialTasks, lastModifiedTaskId: `reset-${Date.now()}` }); // 2. Reset state in the app
-      saveTasksToStorage(initialTasks); // 3. Save the fresh state back to storage
+      const storedTasks: ApiTask[] = await api("");
+      positions.clear();
+      set({ tasks: storedTasks.map(fromApiTask) });
     } catch (error) {
-      console.error("Failed to reset tasks:", error);
+      console.error("Failed to reload the tasks from the server:", error);
+      set({ tasks: previousTasks });
     }
-  },
+  };
 
-  updateTasks: async (
-    updatedTasksArray: Task[],
-    operation?: string,
+  /**
+   * Saves a change that is already applied to the state: on the server, or as a full rewrite of
+   * localStorage. `modifiedTaskId` (which triggers an adaptation, see App.tsx) is only set once
+   * the server has the change, so /tasks/predict never reads the board from before it.
+   */
+  const persist = async (
+    request: () => Promise<unknown>,
+    successMessage: string,
+    previousTasks: Task[] | null,
+    modifiedTaskId?: string
   ) => {
-    let successMessage = "";
-    switch (operation) {
-        case "copy":
-            successMessage = "Die Aufgabe wurde erfolgreich dupliziert.";
-            break;
-        case "delete":
-            successMessage = "Die Aufgaben wurden erfolgreich gelöscht.";
-            break;
-        case "favorite":
-            successMessage = "Die Aufgabe wurde erfolgreich favorisiert.";
-            break;
-        default:
-            successMessage = "Die Aufgaben wurden erfolgreich aktualisiert.";
-            break;
+    if (!get().serverBacked) {
+      saveTasksToStorage(get().tasks ?? []);
+      if (modifiedTaskId) set({ lastModifiedTaskId: modifiedTaskId });
+      return { success: true, message: successMessage };
+    }
+    try {
+      await request();
+      if (modifiedTaskId) set({ lastModifiedTaskId: modifiedTaskId });
+      return { success: true, message: successMessage };
+    } catch (error) {
+      console.error("Failed to save tasks on the server:", error);
+      await resync(previousTasks);
+      return { success: false, message: "Die Änderung konnte nicht gespeichert werden." };
     }
-    set({ tasks: updatedTasksArray });
-    saveTasksToStorage(updatedTasksArray);
-    return { success: true, message: successMessage };
-  },
-
-  addTask: async (task: Task) => {
-    const currentTasks = get().tasks ?? [];
-    const updatedTasks = [...currentTasks, task];
-    set({
-      tasks: updatedTasks,
-      lastCreatedTask: task,
-      lastModifiedTaskId: task.taskId,
-    });
-    saveTasksToStorage(updatedTasks);
-    return {
-      success: true,
-      message: "Aufgabe erfolgreich hinzugefügt!",
-    };
-  },
-
-  updateSingleTask: async (taskId: string, updates: Partial<Task>) => {
-    const currentTasks = get().tasks ?? [];
-    const updatedTasks = currentTasks.map((task) =>
-      task.taskId === taskId ? { ...task, ...updates } : task
-    );
-    set({
-      tasks: updatedTasks,
-      lastModifiedTaskId: taskId,
-    });
-    saveTasksToStorage(updatedTasks);
-    return {
-      success: true,
-      message: "Aufgabe erfolgreich aktualisiert!",
-    };
-  },
-}));
+  };
+
+  return {
+    // --- STATES ---
+    tasks: null,
+    selectedTask: null,
+    lastCreatedTask: null,
+    lastModifiedTaskId: null,
+    serverBacked: false,
+
+    // --- ACTIONS ---
+    setTasks: (tasksProp) => {
+      const previousTasks = get().tasks;
+      set({ tasks: tasksProp });
+      persist(() => replaceOnServer(tasksProp), "", previousTasks);
+    },
+
+    setSelectedTask: (task) => {
+      set({ selectedTask: task });
+    },
+
+    fetchTasks: async () => {
+      try {
+        const storedTasks: ApiTask[] = await api("");
+        if (storedTasks.length > 0) {
+          set({ tasks: storedTasks.map(fromApiTask), serverBacked: true });
+          return;
+        }
+        // Empty board on the server: move the tasks kept in localStorage so far (or the initial tasks) there
+        const tasksToImport = loadTasksFromStorage() ?? initialTasks;
+        await replaceOnServer(tasksToImport);
+        localStorage.removeItem(TASKS_STORAGE_KEY);
+        set({ tasks: tasksToImport, serverBacked: true });
+      } catch (error) {
+        console.warn("Task server not reachable, keeping the tasks in localStorage:", error);
+        const storedTasks = loadTasksFromStorage();
+        if (storedTasks) {
+          set({ tasks: storedTasks, serverBacked: false });
+        } else {
+          set({ tasks: initialTasks, serverBacked: false });
+          saveTasksToStorage(initialTasks);
+        }
+      }
+    },
+
+    // --- NEW: Action to reset tasks ---
+    resetTasks: () => {
+      console.log("Resetting tasks to initial state.");
+      const previousTasks = get().tasks;
+      set({ tasks: initialTasks, lastCreatedTask: null });
+      persist(() => replaceOnServer(initialTasks), "", previousTasks, `reset-${Date.now()}`);
+    },
+
+    updateTasks: async (
+      updatedTasksArray: Task[],
+      operation?: string,
+    ) => {
+      let successMessage = "";
+      switch (operation) {
+          case "copy":
+              successMessage = "Die Aufgabe wurde erfolgreich dupliziert.";
+              break;
+          case "delete":
+              successMessage = "Die Aufgaben wurden erfolgreich gelöscht.";
+              break;
+          case "favorite":
+              successMessage = "Die Aufgabe wurde erfolgreich favorisiert.";
+              break;
+          default:
+              successMessage = "Die Aufgaben wurden erfolgreich aktualisiert.";
+              break;
+      }
+      const previousTasks = get().tasks;
+      const changes = diffTasks(previousTasks ?? [], updatedTasksArray);
+      set({ tasks: updatedTasksArray });
+      return persist(() => api("/batch", "POST", changes), successMessage, previousTasks);
+    },
+
+    addTask: async (task: Task) => {
+      const currentTasks = get().tasks ?? [];
+      const updatedTasks = [...currentTasks, task];
+      reposition(updatedTasks);
+      set({
+        tasks: updatedTasks,
+        lastCreatedTask: task,
+      });
+      return persist(
+        () => api("", "POST", toApiTask(task)),
+        "Aufgabe erfolgreich hinzugefügt!",
+        currentTasks,
+        task.taskId
+      );
+    },
+
+    updateSingleTask: async (taskId: string, updates: Partial<Task>) => {
+      const currentTasks = get().tasks ?? [];
+      const updatedTasks = currentTasks.map((task) =>
+        task.taskId === taskId ? { ...task, ...updates } : task
+      );
+      set({ tasks: updatedTasks });
+      return persist(
+        () => api(`/${encodeURIComponent(taskId)}`, "PATCH", toApiUpdates(updates)),
+        "Aufgabe erfolgreich aktualisiert!",
+        currentTasks,
+        taskId
+      );
+    },
+  };
+});
@@ -0,0 +1,82 @@
+// Compact encoding of /predict requests and responses (see wire_format.py on the server).
+// Instead of a JSON object with German strings, the payload is a fixed-layout array of small
+// ints and the response an array of enum codes. The tables must match wire_format.py.
+
+export const COMPACT_MIMETYPE = "application/vnd.board-counts+json";
+// The server answers in JSON when a value has no compact code (e.g. a new class)
+export const PREDICTION_ACCEPT = `${COMPACT_MIMETYPE}, application/json;q=0.5`;
+
+const STATUSES = ["Start ausstehend", "Zu Erledigen", "In Bearbeitung", "Erledigt", "Blockiert"];
+const PRIORITIES = ["Kritisch", "Hoch", "Mittel", "Niedrig"];
+
+const COUNT_FIELDS = [
+  "number_of_tasks",
+  "num_critical_open",
+  "num_high_open",
+  "num_medium_open",
+  "num_low_open",
+  "num_pending",
+  "num_todo",
+  "num_inprogress",
+  "num_done",
+  "num_blocked",
+  "overdue_tasks",
+  "due_today",
+] as const;
+
+const ENUM_FIELDS = {
+  last_task_created_label: ["none", "Bug", "Feature", "Dokumentation"],
+  last_task_created_priority: ["none", ...PRIORITIES],
+  last_task_created_status: ["none", ...STATUSES],
+};
+
+const TARGET_CODES = {
+  predicted_view: ["list", "kanban"],
+  predicted_status_filter: ["none", ...STATUSES],
+  predicted_priority_filter: ["none", ...PRIORITIES],
+};
+const SOURCE_CODES = ["none", "model", "rules", "trivial"];
+const SHED_CODES = ["none", "deadline", "overload"];
+
+export type BoardPayload = Record<(typeof COUNT_FIELDS)[number], number> &
+  Record<keyof typeof ENUM_FIELDS, string>;
+
+export type CompactPrediction = {
+  predicted_view: "kanban" | "list";
+  predicted_status_filter: string;
+  predicted_priority_filter: string;
+  source: Record<string, "model" | "rules" | "trivial">;
+  shed?: "deadline" | "overload";
+};
+
+export const encodeBoardPayload = (payload: BoardPayload): number[] => [
+  ...COUNT_FIELDS.map((field) => payload[field]),
+  // Unknown values are sent as 'none'
+  ...Object.entries(ENUM_FIELDS).map(([field, names]) =>
+    Math.max(names.indexOf(payload[field as keyof typeof ENUM_FIELDS]), 0)
+  ),
+];
+
+export const decodePrediction = (values: number[]): CompactPrediction => {
+  const targets = Object.keys(TARGET_CODES) as (keyof typeof TARGET_CODES)[];
+  const source: CompactPrediction["source"] = {};
+  targets.forEach((target, i) => {
+    const name = SOURCE_CODES[values[targets.length + i]];
+    if (name !== "none") source[target] = name as "model" | "rules" | "trivial";
+  });
+  const shed = SHED_CODES[values[2 * targets.length]];
+  return {
+    predicted_view: TARGET_CODES.predicted_view[values[0]] as "kanban" | "list",
+    predicted_status_filter: TARGET_CODES.predicted_status_filter[values[1]],
+    predicted_priority_filter: TARGET_CODES.predicted_priority_filter[values[2]],
+    source,
+    ...(shed !== "none" && { shed: shed as "deadline" | "overload" }),
+  };
+};
+
+// Decodes a /predict response body in whichever of the two formats the server chose
+export const readPrediction = async (response: Response): Promise<CompactPrediction> => {
+  const body = await response.json();
+  const mimetype = (response.headers.get("Content-Type") ?? "").split(";")[0].trim();
+  return mimetype === COMPACT_MIMETYPE ? decodePrediction(body) : (body as CompactPrediction);
+};
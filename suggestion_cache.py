@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+# --- Prefix-Aware Suggestion Cache ---
+# The task dialog asks for suggestions while the title is being typed, so consecutive
+# requests usually extend the previous title by a few characters and get the same answer.
+# The cache keeps the last MAX_ENTRIES titles (LRU) and answers a new title from its longest
+# cached prefix as long as the added text doesn't introduce a decisive token (a keyword the
+# suggestions depend on). Concurrent requests for the same title are computed only once.
+
+MAX_ENTRIES = 2048
+MIN_PREFIX_LENGTH = 5
+
+
+def normalize_title(title):
+    return " ".join(title.lower().split())
+
+
+class _Flight:
+    """A computation in progress that other requests for the same key can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PrefixSuggestionCache:
+    """
+    Bounded LRU of title -> (decisive tokens, suggestion) with prefix reuse and single-flight.
+
+    `decisive_tokens(title)` returns the set of tokens that can change a suggestion. A cached
+    prefix is reused only if the full title has exactly the same decisive tokens.
+    """
+
+    def __init__(self, decisive_tokens, max_entries=MAX_ENTRIES, min_prefix_length=MIN_PREFIX_LENGTH):
+        self.decisive_tokens = decisive_tokens
+        self.max_entries = max_entries
+        self.min_prefix_length = min_prefix_length
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'prefix_hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def _lookup(self, key, tokens):
+        """Exact or prefix match for a normalized title; must be called with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+        # Longest cached prefix first; each probe is a single hash lookup
+        for end in range(len(key) - 1, self.min_prefix_length - 1, -1):
+            entry = self._entries.get(key[:end])
+            if entry is not None and entry[0] == tokens:
+                self._entries.move_to_end(key[:end])
+                self._store(key, tokens, entry[1])
+                self.stats['prefix_hits'] += 1
+                return entry[1]
+        return None
+
+    def _store(self, key, tokens, suggestion):
+        self._entries[key] = (tokens, suggestion)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, title, compute):
+        """Returns the cached suggestion for `title`, or calls compute(title) at most once per title."""
+        key = normalize_title(title)
+        tokens = self.decisive_tokens(key)
+
+        with self._lock:
+            cached = self._lookup(key, tokens)
+            if cached is not None:
+                return cached
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.stats['misses'] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute(title)
+            with self._lock:
+                self._store(key, tokens, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), in_flight=len(self._flights))
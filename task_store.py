@@ -0,0 +1,276 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from wire_format import STATUSES, PRIORITIES, ENUM_FIELDS
+
+# --- Server-Side Task Store ---
+# Stores the board's tasks in SQLite instead of the frontend rewriting the whole task list
+# into localStorage on every change:
+# - every insert/update/delete writes only the changed task; multi-task changes (delete
+#   selected, drag & drop) are applied with executemany in a single transaction,
+# - the counts a /predict payload needs are kept per workspace in the materialized table
+#   board_counts. Triggers update it in the same transaction as the task change, so it never
+#   disagrees with the tasks and a prediction reads one row instead of recounting the board,
+# - overdue_tasks and due_today depend on the current time and can't be materialized; they
+#   are counted from a partial index over the due dates of open tasks,
+# - WAL journal mode, so reads don't wait for writes; synchronous=NORMAL only syncs on
+#   checkpoints, which keeps committed changes safe if the server (not the OS) crashes,
+# - connections are pooled and all statements are constant SQL with parameters, so every
+#   connection's statement cache prepares each statement only once.
+# Tasks are stored per workspace (the X-Workspace-Id header, see model_registry.py) and in
+# the frontend's JSON shape (taskId, isFavorite, createdAt, dueDate), plus their list position.
+
+DEFAULT_WORKSPACE = "default"
+BUSY_TIMEOUT_S = 5.0        # How long a write waits for another writer's transaction
+MAX_TZ_OFFSET_MINUTES = 14 * 60  # UTC-12 to UTC+14, as JavaScript's getTimezoneOffset() reports them
+DONE_STATUS = 'Erledigt'
+LABELS = ENUM_FIELDS['last_task_created_label'][1:]
+
+STATUS_COLUMNS = {
+    'Start ausstehend': 'num_pending',
+    'Zu Erledigen': 'num_todo',
+    'In Bearbeitung': 'num_inprogress',
+    'Erledigt': 'num_done',
+    'Blockiert': 'num_blocked',
+}
+PRIORITY_COLUMNS = {
+    'Kritisch': 'num_critical_open',
+    'Hoch': 'num_high_open',
+    'Mittel': 'num_medium_open',
+    'Niedrig': 'num_low_open',
+}
+MATERIALIZED_COUNTS = ['number_of_tasks'] + list(PRIORITY_COLUMNS.values()) + list(STATUS_COLUMNS.values())
+LAST_CREATED_FIELDS = ['last_task_created_label', 'last_task_created_priority', 'last_task_created_status']
+
+
+def _count_update(row, sign):
+    """Trigger statement adding (+) or removing (-) a task row (NEW/OLD) to/from its board's counts."""
+    terms = [f"number_of_tasks = number_of_tasks {sign} 1"]
+    terms += [f"{column} = {column} {sign} ({row}.status = '{status}')" for status, column in STATUS_COLUMNS.items()]
+    terms += [f"{column} = {column} {sign} ({row}.status != '{DONE_STATUS}' AND {row}.priority = '{priority}')"
+              for priority, column in PRIORITY_COLUMNS.items()]
+    return f"UPDATE board_counts SET {', '.join(terms)} WHERE workspace = {row}.workspace;"
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS tasks (
+    workspace TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    label TEXT NOT NULL,
+    is_favorite INTEGER NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    due_date TEXT,
+    position REAL NOT NULL,
+    PRIMARY KEY (workspace, task_id)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_position ON tasks (workspace, position);
+CREATE INDEX IF NOT EXISTS open_tasks_by_due_date ON tasks (workspace, due_date) WHERE status != '{DONE_STATUS}';
+
+CREATE TABLE IF NOT EXISTS board_counts (
+    workspace TEXT PRIMARY KEY,
+    {', '.join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in MATERIALIZED_COUNTS)},
+    {', '.join(f"{field} TEXT NOT NULL DEFAULT 'none'" for field in LAST_CREATED_FIELDS)}
+);
+
+CREATE TRIGGER IF NOT EXISTS count_inserted_task AFTER INSERT ON tasks BEGIN
+    INSERT OR IGNORE INTO board_counts (workspace) VALUES (NEW.workspace);
+    {_count_update('NEW', '+')}
+END;
+CREATE TRIGGER IF NOT EXISTS count_deleted_task AFTER DELETE ON tasks BEGIN
+    {_count_update('OLD', '-')}
+END;
+CREATE TRIGGER IF NOT EXISTS count_updated_task AFTER UPDATE OF status, priority ON tasks BEGIN
+    {_count_update('OLD', '-')}
+    {_count_update('NEW', '+')}
+END;
+"""
+
+TASK_COLUMNS = ['task_id', 'title', 'label', 'is_favorite', 'priority', 'status', 'created_at', 'due_date', 'position']
+# A task without a position is appended to the end of its board
+UPSERT_TASK = """
+INSERT INTO tasks (workspace, task_id, title, label, is_favorite, priority, status, created_at, due_date, position)
+VALUES (:workspace, :task_id, :title, :label, :is_favorite, :priority, :status, :created_at, :due_date,
+        COALESCE(:position, (SELECT COALESCE(MAX(position), 0) + 1 FROM tasks WHERE workspace = :workspace)))
+ON CONFLICT (workspace, task_id) DO UPDATE SET
+    title = excluded.title, label = excluded.label, is_favorite = excluded.is_favorite,
+    priority = excluded.priority, status = excluded.status, created_at = excluded.created_at,
+    due_date = excluded.due_date, position = COALESCE(:position, position)
+"""
+SELECT_TASKS = f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE workspace = ? ORDER BY position"
+SELECT_TASK = f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks WHERE workspace = ? AND task_id = ?"
+DELETE_TASK = "DELETE FROM tasks WHERE workspace = ? AND task_id = ?"
+DELETE_BOARD = "DELETE FROM tasks WHERE workspace = ?"
+SET_LAST_CREATED = f"UPDATE board_counts SET {', '.join(f'{field} = ?' for field in LAST_CREATED_FIELDS)} WHERE workspace = ?"
+SELECT_COUNTS = f"SELECT {', '.join(MATERIALIZED_COUNTS + LAST_CREATED_FIELDS)} FROM board_counts WHERE workspace = ?"
+COUNT_DUE_BEFORE = f"SELECT COUNT(*) FROM tasks WHERE workspace = ? AND status != '{DONE_STATUS}' AND due_date < ?"
+COUNT_DUE_BETWEEN = f"SELECT COUNT(*) FROM tasks WHERE workspace = ? AND status != '{DONE_STATUS}' AND due_date >= ? AND due_date < ?"
+
+
+# --- Task JSON ---
+def _iso(value):
+    """A timestamp as the frontend's Date.toISOString(), in UTC, so stored dates compare as strings."""
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def _parse_date(value, field):
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"'{field}' must be an ISO 8601 timestamp")
+    return _iso(parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc))
+
+
+def task_row(data, workspace):
+    """SQL parameters for a task in the frontend's JSON shape; ValueError if a field is missing or invalid."""
+    if not isinstance(data, dict):
+        raise ValueError("A task must be an object")
+    missing = [field for field in ('taskId', 'title', 'label', 'priority', 'status', 'createdAt') if field not in data]
+    if missing:
+        raise ValueError(f"Missing task fields: {missing}")
+    if not isinstance(data['title'], str) or not data['title'].strip():
+        raise ValueError("'title' must be a non-empty string")
+    for field, allowed_values in (('label', LABELS), ('priority', PRIORITIES), ('status', STATUSES)):
+        if data[field] not in allowed_values:
+            raise ValueError(f"'{field}' must be one of {allowed_values}")
+    position = data.get('position')
+    if position is not None and (isinstance(position, bool) or not isinstance(position, (int, float))):
+        raise ValueError("'position' must be a number")
+    return {
+        'workspace': workspace,
+        'task_id': str(data['taskId']),
+        'title': data['title'],
+        'label': data['label'],
+        'is_favorite': int(bool(data.get('isFavorite', False))),
+        'priority': data['priority'],
+        'status': data['status'],
+        'created_at': _parse_date(data['createdAt'], 'createdAt'),
+        'due_date': _parse_date(data['dueDate'], 'dueDate') if data.get('dueDate') else None,
+        'position': position,
+    }
+
+
+def task_json(row):
+    return {
+        'taskId': row['task_id'],
+        'title': row['title'],
+        'label': row['label'],
+        'isFavorite': bool(row['is_favorite']),
+        'priority': row['priority'],
+        'status': row['status'],
+        'createdAt': row['created_at'],
+        'dueDate': row['due_date'],
+        'position': row['position'],
+    }
+
+
+# --- Store ---
+class TaskStore:
+    """SQLite-backed task lists per workspace with materialized board counts."""
+
+    def __init__(self, path):
+        self.path = path
+        self._idle = queue.SimpleQueue()  # Pooled connections, each with its own statement cache
+        with self._connection() as db:
+            db.executescript(SCHEMA)
+
+    @classmethod
+    def open(cls, path):
+        """The store for a database file, or None if it can't be opened."""
+        try:
+            return cls(path)
+        except sqlite3.Error as e:
+            print(f"ERROR: Could not open the task database '{path}'. Details: {e}")
+            return None
+
+    @contextmanager
+    def _connection(self):
+        try:
+            db = self._idle.get_nowait()
+        except queue.Empty:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield db
+        finally:
+            self._idle.put(db)
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction; BEGIN IMMEDIATE takes the write lock up front instead of failing on upgrade."""
+        with self._connection() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def list_tasks(self, workspace):
+        with self._connection() as db:
+            return [task_json(row) for row in db.execute(SELECT_TASKS, (workspace,))]
+
+    def add_task(self, workspace, data):
+        """Inserts (or replaces) a task and records it as the board's last created task."""
+        row = task_row(data, workspace)
+        with self._transaction() as db:
+            db.execute(UPSERT_TASK, row)
+            db.execute(SET_LAST_CREATED, (row['label'], row['priority'], row['status'], workspace))
+            return task_json(db.execute(SELECT_TASK, (workspace, row['task_id'])).fetchone())
+
+    def update_task(self, workspace, task_id, updates):
+        """Applies a partial update to a task; returns the updated task, or None if it doesn't exist."""
+        with self._transaction() as db:
+            current = db.execute(SELECT_TASK, (workspace, task_id)).fetchone()
+            if current is None:
+                return None
+            row = task_row({**task_json(current), **updates, 'taskId': task_id}, workspace)
+            db.execute(UPSERT_TASK, row)
+            return task_json(db.execute(SELECT_TASK, (workspace, task_id)).fetchone())
+
+    def delete_task(self, workspace, task_id):
+        """Deletes a task; False if it doesn't exist."""
+        with self._transaction() as db:
+            return db.execute(DELETE_TASK, (workspace, task_id)).rowcount > 0
+
+    def apply_changes(self, workspace, upserts=(), deletes=()):
+        """Inserts/updates and deletes several tasks in one transaction."""
+        rows = [task_row(data, workspace) for data in upserts]
+        with self._transaction() as db:
+            db.executemany(DELETE_TASK, [(workspace, str(task_id)) for task_id in deletes])
+            db.executemany(UPSERT_TASK, rows)
+
+    def replace_tasks(self, workspace, tasks):
+        """Replaces all tasks of a board (initial import and reset); clears the last created task."""
+        rows = [task_row(data, workspace) for data in tasks]
+        with self._transaction() as db:
+            db.execute(DELETE_BOARD, (workspace,))
+            db.executemany(UPSERT_TASK, rows)
+            db.execute(SET_LAST_CREATED, ('none', 'none', 'none', workspace))
+
+    def board_payload(self, workspace, now=None, tz_offset_minutes=0):
+        """
+        The /predict payload of a board from its materialized counts. Tasks are due today if
+        their due date falls on the current day in the client's time zone (tz_offset_minutes
+        as JavaScript's getTimezoneOffset()). ValueError for offsets beyond MAX_TZ_OFFSET_MINUTES.
+        """
+        if abs(tz_offset_minutes) > MAX_TZ_OFFSET_MINUTES:
+            raise ValueError(f"'tz_offset' must be between -{MAX_TZ_OFFSET_MINUTES} and {MAX_TZ_OFFSET_MINUTES} minutes")
+        now = now or datetime.now(timezone.utc)
+        offset = timedelta(minutes=tz_offset_minutes)
+        local_midnight = (now - offset).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start, day_end = _iso(local_midnight + offset), _iso(local_midnight + offset + timedelta(days=1))
+        with self._connection() as db:
+            counts = db.execute(SELECT_COUNTS, (workspace,)).fetchone()
+            payload = dict(counts) if counts is not None else dict.fromkeys(MATERIALIZED_COUNTS, 0)
+            payload['overdue_tasks'] = db.execute(COUNT_DUE_BEFORE, (workspace, _iso(now))).fetchone()[0]
+            payload['due_today'] = db.execute(COUNT_DUE_BETWEEN, (workspace, day_start, day_end)).fetchone()[0]
+        for field in LAST_CREATED_FIELDS:
+            payload.setdefault(field, 'none')
+        return payload
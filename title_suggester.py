@@ -0,0 +1,309 @@
+import argparse
+import os
+import re
+import time
+from datetime import date, timedelta
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split
+
+# --- Local Task-Title Suggestions ---
+# Replaces the per-keystroke gpt-4o call in the task dialog: label, priority and status are
+# predicted by linear classifiers over hashed character n-grams, the due date by a small
+# German relative-date parser. Training data comes from the keyword rules of getFieldsByRule
+# (src/components/taskDialogue/taskDialog.tsx) applied to generated titles, plus logged LLM
+# suggestions if LLM_SUGGESTIONS_FILE exists.
+
+MODEL_DIR = "models"
+MODEL_FILE = "title_suggester.pkl"
+LLM_SUGGESTIONS_FILE = "title_suggestions_llm.csv"  # columns: title,label,priority,status
+NUM_SYNTHETIC_TITLES = 30_000
+RANDOM_STATE = 42
+
+SUGGESTION_TARGETS = ['label', 'priority', 'status']
+
+# --- Keyword Definitions (same lists as getFieldsByRule) ---
+CRITICAL_KEYWORDS = ["dringend", "kritisch", "absturz", "blockiert", "notfall", "sofort", "wichtig"]
+BUG_KEYWORDS = [
+    # German
+    "bug", "fehler", "problem", "ausfall", "panne", "funktioniert nicht", "geht nicht", "kaputt", "fehlermeldung",
+    # English / Denglish
+    "fix", "urgent", "critical", "issue", "error", "failure", "hotfix", "crash",
+]
+DOC_KEYWORDS = [
+    # German
+    "doku", "dokumentation", "dokumentieren", "anleitung", "handbuch", "schreiben", "verfassen",
+    "beschreibung", "leitfaden", "protokoll", "release notes", "aktualisieren", "bericht",
+    # English / Denglish
+    "documentation", "doc", "write", "guide", "manual", "update",
+]
+
+
+def rule_fields(title):
+    """Python port of getFieldsByRule without the due date; 'none' where the rules don't set a field."""
+    lower = title.lower()
+    is_bug = any(keyword in lower for keyword in BUG_KEYWORDS)
+    is_doc = any(keyword in lower for keyword in DOC_KEYWORDS)
+    is_critical = any(keyword in lower for keyword in CRITICAL_KEYWORDS)
+
+    if is_bug:
+        if is_doc:
+            return {'label': 'Bug', 'priority': 'Niedrig', 'status': 'none'}
+        if is_critical:
+            return {'label': 'Bug', 'priority': 'Kritisch', 'status': 'Zu Erledigen'}
+        return {'label': 'Bug', 'priority': 'Hoch', 'status': 'Zu Erledigen'}
+    if is_doc:
+        return {'label': 'Dokumentation', 'priority': 'Niedrig', 'status': 'Start ausstehend'}
+    return {'label': 'Feature', 'priority': 'Hoch' if is_critical else 'Mittel', 'status': 'none'}
+
+
+def decisive_tokens(title):
+    """Rule keywords contained in a title; a title extension that adds none keeps its suggestion."""
+    lower = title.lower()
+    return frozenset(keyword for keyword in CRITICAL_KEYWORDS + BUG_KEYWORDS + DOC_KEYWORDS if keyword in lower)
+
+
+# --- German Relative-Date Parser ---
+WEEKDAYS = {
+    'montag': 0, 'dienstag': 1, 'mittwoch': 2, 'donnerstag': 3,
+    'freitag': 4, 'samstag': 5, 'sonntag': 6,
+}
+_WEEKDAY_PATTERN = "|".join(WEEKDAYS)
+_NUMBER_WORDS = {
+    'einem': 1, 'einen': 1, 'einer': 1, 'eins': 1, 'zwei': 2, 'drei': 3, 'vier': 4, 'fünf': 5,
+    'sechs': 6, 'sieben': 7, 'acht': 8, 'neun': 9, 'zehn': 10, 'vierzehn': 14,
+}
+_AMOUNT = r"(\d+|" + "|".join(_NUMBER_WORDS) + r")"
+
+
+def _amount(text):
+    return int(text) if text.isdigit() else _NUMBER_WORDS[text]
+
+
+def parse_due_date(title, today=None):
+    """
+    Extracts a due date from German phrases like "heute", "morgen", "übermorgen",
+    "(nächsten) Freitag", "in 3 Tagen", "in zwei Wochen", "nächste Woche",
+    "Ende der Woche" or "24.12.(2025)". Returns a date or None.
+    """
+    today = today or date.today()
+    lower = title.lower()
+
+    match = re.search(r"\b(\d{1,2})\.(\d{1,2})\.(\d{2,4})?", lower)
+    if match:
+        day, month = int(match.group(1)), int(match.group(2))
+        year = match.group(3)
+        year = (2000 + int(year) if len(year) == 2 else int(year)) if year else today.year
+        try:
+            parsed = date(year, month, day)
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            # Without a year, a date that already passed means next year
+            if not match.group(3) and parsed < today:
+                parsed = parsed.replace(year=parsed.year + 1)
+            return parsed
+
+    if re.search(r"\bübermorgen\b", lower):
+        return today + timedelta(days=2)
+    if re.search(r"\bheute\b", lower):
+        return today
+    # "morgen" but not "morgens"/"am Morgen" (time of day)
+    if re.search(r"(?<!am )\bmorgen\b", lower):
+        return today + timedelta(days=1)
+
+    match = re.search(r"\bin " + _AMOUNT + r" (tag|tagen|woche|wochen)\b", lower)
+    if match:
+        amount = _amount(match.group(1))
+        return today + timedelta(days=amount * (7 if match.group(2).startswith("woche") else 1))
+
+    match = re.search(r"\b(?:nächste[nmr]?\s+|kommende[nmr]?\s+|am\s+|bis\s+)?(" + _WEEKDAY_PATTERN + r")\b", lower)
+    if match:
+        # Always the next occurrence after today ("Freitag" on a Friday means next week)
+        days_ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7 or 7
+        return today + timedelta(days=days_ahead)
+
+    if re.search(r"\bende der woche\b|\bwochenende\b", lower):
+        return today + timedelta(days=(4 - today.weekday()) % 7)
+    if re.search(r"\b(nächste|kommende) woche\b", lower):
+        return today + timedelta(days=7 - today.weekday())
+    if re.search(r"\b(nächsten|kommenden) monat\b|\bende des monats\b|\bmonatsende\b", lower):
+        first_of_next = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return first_of_next - timedelta(days=1) if "ende" in lower else first_of_next
+    return None
+
+
+# --- Synthetic Training Titles ---
+SUBJECTS = [
+    "Login-Seite", "Dashboard", "API", "Export", "Benutzerverwaltung", "Rechnungsmodul", "Suchfunktion",
+    "Kalender", "Newsletter", "Datenbank", "Kanban-Board", "Filter", "Startseite", "Zahlungsabwicklung",
+    "Berechtigungen", "PDF-Export", "Benachrichtigungen", "Onboarding", "Import", "Backend", "Frontend",
+    "Mobile App", "Checkout", "Profilseite", "Passwort-Reset", "Statistiken", "Deployment", "Server",
+]
+ACTIONS = [
+    "implementieren", "erstellen", "anpassen", "überarbeiten", "prüfen", "hinzufügen", "entwickeln",
+    "optimieren", "testen", "umbauen", "einrichten", "vorbereiten", "planen", "refactoren", "erweitern",
+]
+DATE_PHRASES = ["", "", "", "heute", "morgen", "übermorgen", "bis Freitag", "nächsten Montag", "in 3 Tagen", "bis 15.10."]
+TEMPLATES = [
+    "{subject} {action}",
+    "{keyword} {subject}",
+    "{subject}: {keyword}",
+    "{keyword} im {subject} {action}",
+    "{subject} {keyword} {date}",
+    "{critical} {keyword} {subject}",
+    "{subject} {action} {date}",
+    "{critical}: {subject} {action}",
+    "{doc} für {subject} {action}",
+    "{keyword} {subject} {doc}",
+]
+
+
+def generate_titles(num_titles, seed=RANDOM_STATE):
+    """Random task titles mixing subjects, actions, rule keywords and date phrases."""
+    rng = np.random.default_rng(seed)
+    keywords = BUG_KEYWORDS + DOC_KEYWORDS + CRITICAL_KEYWORDS + [""] * 10
+
+    def pick(options):
+        return options[rng.integers(len(options))]
+
+    titles = []
+    for _ in range(num_titles):
+        title = pick(TEMPLATES).format(
+            subject=pick(SUBJECTS), action=pick(ACTIONS), keyword=pick(keywords),
+            critical=pick(CRITICAL_KEYWORDS + [""]), doc=pick(DOC_KEYWORDS + [""]), date=pick(DATE_PHRASES),
+        )
+        title = " ".join(title.split())
+        if rng.random() < 0.3:
+            title = title.capitalize()
+        titles.append(title)
+    return titles
+
+
+def build_training_set(num_titles):
+    """Rule-labeled synthetic titles plus logged LLM suggestions (if available)."""
+    titles = generate_titles(num_titles)
+    df = pd.DataFrame([rule_fields(title) for title in titles])
+    df.insert(0, 'title', titles)
+
+    if os.path.exists(LLM_SUGGESTIONS_FILE):
+        logged = pd.read_csv(LLM_SUGGESTIONS_FILE).reindex(columns=['title'] + SUGGESTION_TARGETS)
+        logged[SUGGESTION_TARGETS] = logged[SUGGESTION_TARGETS].fillna('none')
+        print(f"Adding {len(logged)} logged LLM suggestions from '{LLM_SUGGESTIONS_FILE}'.")
+        df = pd.concat([df, logged.dropna(subset=['title'])], ignore_index=True)
+    return df
+
+
+class TitleSuggester:
+    """Hashed character n-grams + one linear classifier per suggested field."""
+
+    def __init__(self, n_features=2 ** 17):
+        self.vectorizer = HashingVectorizer(
+            analyzer='char_wb', ngram_range=(2, 5), n_features=n_features,
+            alternate_sign=False, lowercase=True, norm='l2',
+        )
+        self.classifiers = {}
+
+    def fit(self, titles, targets):
+        X = self.vectorizer.transform(titles)
+        for field in SUGGESTION_TARGETS:
+            classifier = SGDClassifier(loss='log_loss', alpha=1e-6, max_iter=50, tol=1e-4, random_state=RANDOM_STATE)
+            self.classifiers[field] = classifier.fit(X, targets[field])
+        self._compile()
+        return self
+
+    def _compile(self):
+        """
+        Stacks all classifier weights into one float32 (n_features, n_classes) matrix.
+
+        A title only activates a few dozen n-grams, so scoring gathers those rows instead
+        of multiplying against the full coefficient matrices.
+        """
+        weights, intercepts, self._slices, self._classes = [], [], {}, {}
+        start = 0
+        for field, classifier in self.classifiers.items():
+            coef = classifier.coef_
+            intercept = classifier.intercept_
+            classes = classifier.classes_
+            if len(classes) == 2:
+                # Binary SGD models store a single row for the positive class
+                coef = np.vstack([-coef, coef])
+                intercept = np.r_[-intercept, intercept]
+            weights.append(coef.T)
+            intercepts.append(intercept)
+            self._slices[field] = slice(start, start + len(classes))
+            self._classes[field] = classes
+            start += len(classes)
+        self._weights = np.ascontiguousarray(np.hstack(weights), dtype=np.float32)
+        self._intercepts = np.concatenate(intercepts).astype(np.float32)
+
+    def _scores(self, title):
+        x = self.vectorizer.transform([title])
+        return x.data.astype(np.float32) @ self._weights[x.indices] + self._intercepts
+
+    def predict_fields(self, titles):
+        X = self.vectorizer.transform(titles)
+        return {field: classifier.predict(X) for field, classifier in self.classifiers.items()}
+
+    def suggest_fields(self, title):
+        """Label, priority and status for a single title; fields the model leaves open are omitted."""
+        scores = self._scores(title)
+        suggestion = {}
+        for field, columns in self._slices.items():
+            value = self._classes[field][int(np.argmax(scores[columns]))]
+            if value != 'none':
+                suggestion[field] = str(value)
+        return suggestion
+
+    def suggest(self, title, today=None, cache=None):
+        """
+        Suggestions for a single title, including the due date. With a PrefixSuggestionCache
+        the model fields are taken from the cache; the date is always parsed fresh.
+        """
+        if cache is not None:
+            suggestion = dict(cache.get_or_compute(title, self.suggest_fields))
+        else:
+            suggestion = self.suggest_fields(title)
+        due_date = parse_due_date(title, today)
+        if due_date is not None:
+            suggestion['dueDate'] = due_date.isoformat()
+        return suggestion
+
+
+def load_suggester(model_dir=MODEL_DIR):
+    """Loads the trained suggester, or returns None if it hasn't been trained yet."""
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    if not os.path.exists(model_path):
+        return None
+    return joblib.load(model_path)
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local task-title suggestion model.")
+    parser.add_argument("--titles", type=int, default=NUM_SYNTHETIC_TITLES, help="Number of synthetic titles.")
+    args = parser.parse_args()
+
+    df = build_training_set(args.titles)
+    train_df, test_df = train_test_split(df, test_size=0.2, random_state=RANDOM_STATE)
+    print(f"Training title suggester on {len(train_df)} titles...")
+    # Instantiate through the module so the pickle references title_suggester.TitleSuggester, not __main__
+    import title_suggester
+    suggester = title_suggester.TitleSuggester().fit(train_df['title'], train_df)
+
+    predictions = suggester.predict_fields(test_df['title'])
+    for field in SUGGESTION_TARGETS:
+        print(f"  {field} accuracy: {np.mean(predictions[field] == test_df[field].to_numpy()):.4f}")
+
+    start = time.perf_counter()
+    for title in test_df['title'].head(500):
+        suggester.suggest(title)
+    print(f"Latency: {(time.perf_counter() - start) / min(500, len(test_df)) * 1000:.3f} ms per suggestion")
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    model_path = os.path.join(MODEL_DIR, MODEL_FILE)
+    joblib.dump(suggester, model_path)
+    print(f"Title suggester saved to '{model_path}'")
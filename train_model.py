@@ -1,52 +1,82 @@
 import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import classification_report
 import joblib
 import os
+from model_compression import compress_pipeline, compression_report, print_compression_report
+from out_of_core import train_chunked
+from evaluation import evaluate, print_evaluation, write_report, REPORT_FILE
+from feature_engineering import load_feature_manifest, FEATURE_MANIFEST_FILE
 
 # --- Configuration ---
-MODEL_OUTPUT_DIR = "models"
+# The environment overrides below let pipeline.py train into its stage cache
+MODEL_OUTPUT_DIR = os.environ.get("MODEL_OUTPUT_DIR", "models")
 if not os.path.exists(MODEL_OUTPUT_DIR):
     os.makedirs(MODEL_OUTPUT_DIR)
 
-# --- 1. Load and Combine Datasets ---
-CLEAN_DATA_FILE = "training_data_llm_v11.csv"
-NOISY_DATA_FILE = "training_data_llm_v8_noisy.csv"
-
-print(f"Loading and combining datasets...")
-try:
-    df_clean = pd.read_csv(CLEAN_DATA_FILE)
-    df_noisy = pd.read_csv(NOISY_DATA_FILE)
-    
-    df_noisy_sample = df_noisy.sample(n=100, random_state=42)
-    df_clean_sample = df_clean.sample(n=700, random_state=42)
-
-    # Combine the two datasets
-    df_combined = pd.concat([df_clean_sample, df_noisy_sample], ignore_index=True)
-
-    # IMPORTANT: Shuffle the dataset to mix clean and noisy rows
-    df = df_combined.sample(frac=1, random_state=42).reset_index(drop=True)
+# Post-training compression: also save a pruned, reduced-precision copy of each model
+COMPRESS_MODELS = True
+# Collapse splits trained on fewer samples than this (0 = only merge leaves with equal distributions,
+# which removes next to nothing). On our data, 5 removes 15-25% of the nodes for at most one more
+# wrong test prediction per target; 10 and more cost the priority model several points.
+COMPRESSION_MIN_NODE_SAMPLES = 5
+# If pruning loses more test accuracy than this, the model is only flattened, not pruned
+COMPRESSION_MAX_ACCURACY_LOSS = 0.01
 
-    df_list = df[(df.predicted_view != 'kanban') ]
+# Out-of-core mode for datasets larger than memory: stream all rows of both data files in
+# chunks instead of sampling them into one DataFrame (see out_of_core.py)
+OUT_OF_CORE = False
+OUT_OF_CORE_CHUNK_SIZE = 100_000
 
-    print(f"Combined dataset created successfully with {len(df)} rows.")
-except FileNotFoundError as e:
-    print(f"ERROR: Could not find a data file: {e}")
-    exit()
-
-# --- Diagnostic Block to Find Rare Classes ---
-print("\n--- Analyzing Class Distribution ---")
-for col in ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']:
-    print(f"\nValue counts for '{col}':")
-    print(df[col].value_counts())
-print("------------------------------------\n")
+# --- 1. Load and Combine Datasets ---
+CLEAN_DATA_FILE = os.environ.get("CLEAN_DATA_FILE", "training_data_llm_v11.csv")
+NOISY_DATA_FILE = os.environ.get("NOISY_DATA_FILE", "training_data_llm_v8_noisy.csv")
+
+if OUT_OF_CORE:
+    # Only the header is needed here; the rows are streamed during training
+    try:
+        df = pd.read_csv(CLEAN_DATA_FILE, nrows=0)
+        pd.read_csv(NOISY_DATA_FILE, nrows=0)
+    except FileNotFoundError as e:
+        print(f"ERROR: Could not find a data file: {e}")
+        exit()
+else:
+    print(f"Loading and combining datasets...")
+    try:
+        df_clean = pd.read_csv(CLEAN_DATA_FILE)
+        df_noisy = pd.read_csv(NOISY_DATA_FILE)
+        
+        df_noisy_sample = df_noisy.sample(n=100, random_state=42)
+        df_clean_sample = df_clean.sample(n=700, random_state=42)
+
+        # Combine the two datasets
+        df_combined = pd.concat([df_clean_sample, df_noisy_sample], ignore_index=True)
+
+        # IMPORTANT: Shuffle the dataset to mix clean and noisy rows
+        df = df_combined.sample(frac=1, random_state=42).reset_index(drop=True)
+
+        df_list = df[(df.predicted_view != 'kanban') ]
+
+        print(f"Combined dataset created successfully with {len(df)} rows.")
+    except FileNotFoundError as e:
+        print(f"ERROR: Could not find a data file: {e}")
+        exit()
+
+    # --- Diagnostic Block to Find Rare Classes ---
+    print("\n--- Analyzing Class Distribution ---")
+    for col in ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']:
+        print(f"\nValue counts for '{col}':")
+        print(df[col].value_counts())
+    print("------------------------------------\n")
 
 # --- 2. Define Features and Labels ---
 TARGET_COLUMNS = ['predicted_view', 'predicted_status_filter', 'predicted_priority_filter']
+# Comma-separated subset to train, e.g. one target per process (default: all)
+TARGETS_TO_TRAIN = os.environ.get("TRAIN_TARGETS", ",".join(TARGET_COLUMNS)).split(",")
 
 # --- MODIFIED: This list now reflects the actual columns in your final CSV files. ---
 # To easily add or remove features, comment or uncomment lines in this list.
@@ -75,16 +105,29 @@ FEATURES_TO_USE = [
     #'last_action_critical_bug'
 ]
 
+# The feature manifest written by feature_selection.py replaces the hand-maintained list above
+manifest_features = load_feature_manifest(MODEL_OUTPUT_DIR)
+if manifest_features is not None:
+    print(f"Using the features from '{os.path.join(MODEL_OUTPUT_DIR, FEATURE_MANIFEST_FILE)}'.")
+    FEATURES_TO_USE = manifest_features
+
+# Models trained on fewer features than the manifest lists would be refused by app.py
+missing_features = [f for f in FEATURES_TO_USE if f not in df.columns]
+if manifest_features is not None and missing_features:
+    print(f"ERROR: The data has no columns for the manifest features {missing_features}.")
+    exit()
+
 # Filter the list to only include columns that actually exist in the loaded DataFrame
 FEATURES = [f for f in FEATURES_TO_USE if f in df.columns]
 print(f"Using the following {len(FEATURES)} features for training: {FEATURES}")
 
 
-X = df[FEATURES]
-y = df[TARGET_COLUMNS]
+if not OUT_OF_CORE:
+    X = df[FEATURES]
+    y = df[TARGET_COLUMNS]
 
-x_list = df_list[FEATURES]
-y_list = df_list[TARGET_COLUMNS]
+    x_list = df_list[FEATURES]
+    y_list = df_list[TARGET_COLUMNS]
 
 # --- 3. Preprocessing ---
 # Define all possible categorical features
@@ -108,6 +151,12 @@ preprocessor = ColumnTransformer(
     ])
 
 # --- 4. Train a Model for Each Target ---
+# Test-set evaluation per target, written to REPORT_FILE at the end (see evaluation.py)
+evaluation_reports = {}
+
+def make_classifier():
+    return RandomForestClassifier(n_estimators=70, max_depth=14,random_state=42)
+
 def train_and_save_model(target_name):
     """
     Trains a Random Forest model, prints a detailed report, and saves the model.
@@ -116,7 +165,7 @@ def train_and_save_model(target_name):
 
     model_pipeline = Pipeline(steps=[
         ('preprocessor', preprocessor),
-        ('classifier', RandomForestClassifier(n_estimators=70, max_depth=14,random_state=42))])
+        ('classifier', make_classifier())])
 
     y_target = y[target_name]
     if(target_name == 'predicted_view'):
@@ -142,21 +191,61 @@ def train_and_save_model(target_name):
     print(f"Train samples: x={len(X_train)} and y={len(y_train)}")
     print("Training model...")
     model_pipeline.fit(X_train, y_train)
-
+    evaluate_and_save_model(target_name, model_pipeline, X_test, y_test)
+
+def train_and_save_models_out_of_core():
+    """Trains all targets from chunks of the full data files (see out_of_core.py)."""
+    print(f"\n--- Out-of-core training in chunks of {OUT_OF_CORE_CHUNK_SIZE} rows ---")
+    results = train_chunked(
+        [CLEAN_DATA_FILE, NOISY_DATA_FILE], FEATURES, TARGET_COLUMNS,
+        list_only_targets=['predicted_status_filter', 'predicted_priority_filter'],
+        preprocessor=preprocessor, forest=make_classifier(), chunk_size=OUT_OF_CORE_CHUNK_SIZE
+    )
+    for target_name, (model_pipeline, X_test, y_test) in results.items():
+        if target_name not in TARGETS_TO_TRAIN:
+            continue
+        print(f"\n--- Model for: {target_name} ({model_pipeline.named_steps['classifier'].n_estimators} trees) ---")
+        evaluate_and_save_model(target_name, model_pipeline, X_test, y_test)
+
+def evaluate_and_save_model(target_name, model_pipeline, X_test, y_test):
+    """Prints the test report and saves the model (and its compressed copy)."""
     y_pred = model_pipeline.predict(X_test)
     
-    print("\nClassification Report:")
-    report = classification_report(y_test, y_pred, zero_division=0)
-    print(report)
+    evaluation_reports[target_name] = evaluate(y_test, y_pred)
+    print_evaluation(evaluation_reports[target_name])
     
     model_path = os.path.join(MODEL_OUTPUT_DIR, f"model_{target_name}.pkl")
     joblib.dump(model_pipeline, model_path)
     print(f"\nModel saved to '{model_path}'")
 
+    if COMPRESS_MODELS:
+        # Without pruning, only the float32 leaf values and thresholds may differ from the pipeline
+        flat_model = compress_pipeline(model_pipeline)
+        if not np.allclose(flat_model.predict_proba(X_test), model_pipeline.predict_proba(X_test), rtol=0, atol=1e-5):
+            print(f"ERROR: The flattened '{target_name}' model doesn't reproduce the pipeline's probabilities.")
+            exit()
+        compact_model = compress_pipeline(model_pipeline, min_node_samples=COMPRESSION_MIN_NODE_SAMPLES)
+        report = compression_report(model_pipeline, compact_model, X_test, y_test)
+        if -report['accuracy_delta'] > COMPRESSION_MAX_ACCURACY_LOSS:
+            print(f"Pruning with min_node_samples={COMPRESSION_MIN_NODE_SAMPLES} loses "
+                  f"{-report['accuracy_delta']:.4f} accuracy; saving the unpruned model.")
+            compact_model = flat_model
+            report = compression_report(model_pipeline, compact_model, X_test, y_test)
+        print_compression_report(report)
+        compact_path = os.path.join(MODEL_OUTPUT_DIR, f"model_{target_name}_compact.pkl")
+        joblib.dump(compact_model, compact_path)
+        print(f"Compressed model saved to '{compact_path}'")
+
 # --- Main Execution ---
 if __name__ == "__main__":
-    for target in TARGET_COLUMNS:
-        train_and_save_model(target)
+    if OUT_OF_CORE:
+        train_and_save_models_out_of_core()
+    else:
+        for target in TARGETS_TO_TRAIN:
+            train_and_save_model(target)
 
+    report_path = os.path.join(MODEL_OUTPUT_DIR, REPORT_FILE)
+    write_report(evaluation_reports, report_path, features=FEATURES, out_of_core=OUT_OF_CORE)
+    print(f"\nEvaluation report saved to '{report_path}'")
     print("\nAll models have been trained and saved successfully.")
     print(f"You can find your trained models in the '{MODEL_OUTPUT_DIR}/' directory.")
@@ -0,0 +1,107 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; the compact array format needs no extra package
+    msgpack = None
+
+# --- Compact Wire Format for /predict ---
+# The frontend calls /predict on every significant task change. Besides JSON, the endpoint
+# accepts and returns a compact encoding, chosen by the Content-Type / Accept headers:
+# - COMPACT_MIMETYPE: a JSON array of small ints in a fixed layout, with enum codes instead of
+#   the German label/priority/status strings. Request: the values of REQUEST_FIELDS in order
+#   (counts, then ENUM_FIELDS codes). Response: the codes of the three targets, the codes of
+#   their sources and the shed code, e.g. [0, 3, 0, 1, 1, 1, 0].
+# - MSGPACK_MIMETYPE (if msgpack is installed): the JSON payload/response as MessagePack; the
+#   request may also be the compact array.
+# The code tables must stay in sync with src/lib/predictionWire.ts; 'none' is always code 0.
+
+JSON_MIMETYPE = "application/json"
+COMPACT_MIMETYPE = "application/vnd.board-counts+json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+STATUSES = ['Start ausstehend', 'Zu Erledigen', 'In Bearbeitung', 'Erledigt', 'Blockiert']
+PRIORITIES = ['Kritisch', 'Hoch', 'Mittel', 'Niedrig']
+
+COUNT_FIELDS = [
+    'number_of_tasks', 'num_critical_open', 'num_high_open', 'num_medium_open', 'num_low_open',
+    'num_pending', 'num_todo', 'num_inprogress', 'num_done', 'num_blocked',
+    'overdue_tasks', 'due_today',
+]
+ENUM_FIELDS = {
+    'last_task_created_label': ['none', 'Bug', 'Feature', 'Dokumentation'],
+    'last_task_created_priority': ['none'] + PRIORITIES,
+    'last_task_created_status': ['none'] + STATUSES,
+}
+REQUEST_FIELDS = COUNT_FIELDS + list(ENUM_FIELDS)
+
+TARGET_CODES = {
+    'predicted_view': ['list', 'kanban'],
+    'predicted_status_filter': ['none'] + STATUSES,
+    'predicted_priority_filter': ['none'] + PRIORITIES,
+}
+SOURCE_CODES = ['none', 'model', 'rules', 'trivial']
+SHED_CODES = ['none', 'deadline', 'overload']
+
+
+def supported_mimetypes():
+    return [JSON_MIMETYPE, COMPACT_MIMETYPE] + ([MSGPACK_MIMETYPE] if msgpack is not None else [])
+
+
+def decode_compact(values):
+    """Payload dict from a compact request array; ValueError if the layout or a code is invalid."""
+    if not isinstance(values, list) or len(values) != len(REQUEST_FIELDS):
+        raise ValueError(f"Expected an array of {len(REQUEST_FIELDS)} ints ({', '.join(REQUEST_FIELDS)})")
+    if not all(isinstance(value, int) and value >= 0 for value in values):
+        raise ValueError("All values must be non-negative ints")
+    payload = dict(zip(COUNT_FIELDS, values))
+    for (field, names), code in zip(ENUM_FIELDS.items(), values[len(COUNT_FIELDS):]):
+        if code >= len(names):
+            raise ValueError(f"Unknown code {code} for '{field}'")
+        payload[field] = names[code]
+    return payload
+
+
+def decode_request(mimetype, body):
+    """
+    The /predict payload as a dict from a request body of the given mimetype (None for
+    unsupported types). Raises ValueError for malformed bodies.
+    """
+    if mimetype == COMPACT_MIMETYPE:
+        return decode_compact(json.loads(body))
+    if mimetype == MSGPACK_MIMETYPE and msgpack is not None:
+        data = msgpack.unpackb(body)
+        if isinstance(data, list):
+            return decode_compact(data)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a map or an array")
+        return data
+    return None
+
+
+def _code(names, value, field):
+    if value not in names:
+        raise ValueError(f"No code for {value!r} in '{field}'")
+    return names.index(value)
+
+
+def encode_compact(response):
+    """
+    Compact response array; targets or sources missing from the response are encoded as 'none'.
+    Raises ValueError for a value without a code (e.g. a class the code tables don't know yet).
+    """
+    sources = response.get('source', {})
+    return (
+        [_code(TARGET_CODES[target], response[target], target) for target in TARGET_CODES]
+        + [_code(SOURCE_CODES, sources.get(target, 'none'), 'source') for target in TARGET_CODES]
+        + [_code(SHED_CODES, response.get('shed') or 'none', 'shed')]
+    )
+
+
+def encode_response(response, mimetype):
+    """Response body bytes in the negotiated mimetype; ValueError if the compact format can't encode it."""
+    if mimetype == COMPACT_MIMETYPE:
+        return json.dumps(encode_compact(response), separators=(',', ':')).encode()
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(response)
+    return json.dumps(response, separators=(',', ':')).encode()